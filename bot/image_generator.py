@@ -6,9 +6,17 @@ import requests
 from django.core.files import File
 from django.core.files.temp import NamedTemporaryFile
 
+from bot.resilience import ProviderUnavailable, image_provider
+
 POLLINATIONS_BASE = "https://image.pollinations.ai/prompt"
 
 
+def _download(url: str, timeout: float) -> bytes:
+    resp = requests.get(url, timeout=timeout)
+    resp.raise_for_status()  # 5xx тоже считается отказом провайдера
+    return resp.content
+
+
 def fetch_image_for_word(word: str, translation: str | None = None) -> File | None:
     """
     Пытается получить картинку через Pollinations по слову/переводу.
@@ -26,15 +34,15 @@ def fetch_image_for_word(word: str, translation: str | None = None) -> File | No
     print(f"[Pollinations] Запрос изображения: {url}")
 
     try:
-        resp = requests.get(url, timeout=40)
-        resp.raise_for_status()
-    except requests.RequestException as e:
+        # Breaker и таймаут по наблюдаемой задержке — bot/resilience.py
+        content = image_provider.call(_download, url, image_provider.timeout())
+    except (requests.RequestException, ProviderUnavailable) as e:
         # НЕ бросаем исключение наружу, только логируем
         print(f"[Pollinations] Ошибка запроса: {e}")
         return None
 
     img_temp = NamedTemporaryFile(delete=True)
-    img_temp.write(resp.content)
+    img_temp.write(content)
     img_temp.flush()
 
     return File(img_temp, name="pollinations_image.jpg")
@@ -0,0 +1,106 @@
+# bot/media.py
+"""
+Повторное использование file_id для уже загруженных в Telegram файлов.
+
+Первая отправка картинки или озвучки загружает файл (FSInputFile) и
+запоминает выданный file_id (процессный кэш + таблица TelegramFile).
+Следующие отправки того же файла ссылаются на file_id; если Telegram
+отклонил именно file_id — файл загружается заново, а запись обновляется.
+Остальные ошибки запроса (подпись, parse_mode, ...) пробрасываются:
+file_id при них исправен.
+"""
+import os
+from pathlib import Path
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+from django.conf import settings
+
+from bot import repository
+from bot.voice import tts_cache_dir
+from vocab.cache import TTLCache
+
+# (bot_id, media_key) -> file_id
+file_ids = TTLCache(maxsize=20000, ttl=24 * 3600)
+
+# Фрагменты ответов Telegram о негодном file_id (в нижнем регистре):
+# «wrong file identifier/HTTP URL specified», «wrong remote file identifier
+# specified», «type of file mismatch», «can't use file of type ...»
+FILE_ID_ERRORS = ('file identifier', 'file_id', 'type of file mismatch', 'file of type')
+
+SEND_METHODS = {
+    'photo': 'send_photo',
+    'voice': 'send_voice',
+}
+
+
+def media_key(path) -> str:
+    """
+    Ключ файла: путь относительно MEDIA_ROOT для картинок; для озвучки —
+    имя файла в кэше TTS, то есть хэш (text, lang, tld, slow).
+    """
+    path = Path(path).resolve()
+    if path.is_relative_to(tts_cache_dir().resolve()):
+        return f"tts:{path.stem}"
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    if path.is_relative_to(media_root):
+        return f"image:{path.relative_to(media_root).as_posix()}"
+    return f"file:{path}"
+
+
+async def get_file_id(bot_id: int, key: str) -> str | None:
+    file_id = file_ids.get((bot_id, key))
+    if file_id is None:
+        file_id = await repository.fetch_file_id(bot_id, key)
+        if file_id is not None:
+            file_ids.set((bot_id, key), file_id)
+    return file_id
+
+
+async def remember_file_id(bot_id: int, key: str, file_id: str):
+    file_ids.set((bot_id, key), file_id)
+    await repository.store_file_id(bot_id, key, file_id)
+
+
+async def forget_file_id(bot_id: int, key: str):
+    file_ids.pop((bot_id, key))
+    await repository.delete_file_id(bot_id, key)
+
+
+def is_file_id_error(error: TelegramBadRequest) -> bool:
+    message = error.message.lower()
+    return any(fragment in message for fragment in FILE_ID_ERRORS)
+
+
+def _sent_file_id(kind: str, message) -> str | None:
+    if kind == 'photo' and message.photo:
+        return message.photo[-1].file_id  # самый крупный размер
+    if kind == 'voice' and message.voice:
+        return message.voice.file_id
+    return None
+
+
+async def send_media(bot, chat_id, kind: str, path, **kwargs):
+    """
+    Отправляет картинку (kind='photo') или голосовое (kind='voice') из
+    локального файла, по возможности — по сохранённому file_id.
+    kwargs передаются в send_photo/send_voice (caption, reply_markup, ...).
+    """
+    send = getattr(bot, SEND_METHODS[kind])
+    key = media_key(path)
+
+    file_id = await get_file_id(bot.id, key)
+    if file_id:
+        try:
+            return await send(chat_id, file_id, **kwargs)
+        except TelegramBadRequest as e:
+            if not is_file_id_error(e):
+                raise
+            print(f"file_id для {key} отклонён ({e}), загружаем файл заново")
+            await forget_file_id(bot.id, key)
+
+    message = await send(chat_id, FSInputFile(path, filename=os.path.basename(path)), **kwargs)
+    file_id = _sent_file_id(kind, message)
+    if file_id:
+        await remember_file_id(bot.id, key, file_id)
+    return message
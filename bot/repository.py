@@ -0,0 +1,132 @@
+# bot/repository.py
+"""
+Доступ бота к БД через родной async API Django ORM (aget, acreate,
+afirst, async for, asave).
+
+Обработчики бота не вызывают ORM напрямую: все запросы собраны здесь,
+и в корутинах не остаётся синхронных обращений к БД. Сложная
+синхронная логика с транзакциями (words.services.ingest_word, запись
+оценок сессии в apply_grades) и сетевые вызовы по-прежнему выполняются
+в потоке.
+
+Сравнение с прежним путём через sync_to_async — management-команда
+benchmark_bot_orm.
+"""
+import asyncio
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from vocab import scheduling
+from vocab.models import Card, Repetition, TelegramFile, TelegramUser, UserSettings
+from vocab.scheduling import REPETITION_FIELDS, SM2Params, schedule_repetitions
+from words.models import Word
+
+
+# --- Пользователи и настройки ---
+
+async def fetch_user(telegram_id) -> TelegramUser | None:
+    return await TelegramUser.objects.filter(telegram_id=str(telegram_id)).afirst()
+
+
+async def get_or_create_user(telegram_id, username) -> tuple[TelegramUser, bool]:
+    return await TelegramUser.objects.aget_or_create(
+        telegram_id=str(telegram_id),
+        defaults={'username': username},
+    )
+
+
+async def fetch_settings(user_id: int) -> UserSettings:
+    """Настройки пользователя (создаются при первом обращении)."""
+    settings, _ = await UserSettings.objects.aget_or_create(user_id=user_id)
+    return settings
+
+
+async def save_settings(settings: UserSettings, *fields):
+    await settings.asave(update_fields=[*fields, 'updated'] if fields else None)
+
+
+# --- Слова и карточки ---
+
+async def quiz_words(user: TelegramUser) -> list[Word]:
+    """Слова пользователя для теста (только нужные поля)."""
+    return [word async for word in Word.objects.filter(user=user).only('id', 'text', 'translation', 'image')]
+
+
+async def get_card(card_id: int) -> Card:
+    return await Card.objects.aget(id=card_id)
+
+
+async def get_repetition(card_id: int) -> Repetition:
+    return await Repetition.objects.select_related('card').aget(card_id=card_id)
+
+
+async def schedule_review(repetition: Repetition, quality: int, settings: UserSettings) -> Repetition:
+    """
+    Оценка вне сессии повторения: SM-2 считается в памяти по переданным
+    настройкам, запись — одним UPDATE.
+    """
+    schedule_repetitions(
+        [repetition], [quality],
+        settings_by_owner={repetition.owner_id or repetition.card.owner_id: SM2Params.from_settings(settings)},
+        commit=False,
+    )
+    await repetition.asave(update_fields=REPETITION_FIELDS)
+    return repetition
+
+
+async def due_repetitions(user: TelegramUser, limit: int) -> list[Repetition]:
+    """Карточки к повторению, самые просроченные первыми."""
+    queryset = (
+        Repetition.objects
+        .filter(owner=user, next_review__lte=timezone.now())
+        .select_related('card')
+        .order_by('next_review')[:limit]
+    )
+    return [repetition async for repetition in queryset]
+
+
+async def apply_grades(grades: list[dict], settings_by_owner: dict) -> list[Repetition]:
+    """
+    Оценки сессии повторения [{card_id, quality, answered_at}] поверх
+    актуальных строк: vocab.scheduling.apply_grades под select_for_update
+    (порядок по времени ответа, устаревшие оценки пропускаются).
+    Транзакция синхронная — выполняется в потоке.
+    """
+    return await asyncio.to_thread(_apply_grades, grades, settings_by_owner)
+
+
+def _apply_grades(grades, settings_by_owner):
+    close_old_connections()
+    try:
+        with transaction.atomic():
+            repetitions = (
+                Repetition.objects.select_for_update()
+                .select_related('card')
+                .filter(card_id__in={g['card_id'] for g in grades})
+            )
+            by_card = {repetition.card_id: repetition for repetition in repetitions}
+            # Карточку могли удалить, пока оценка ждала записи
+            grades = [g for g in grades if g['card_id'] in by_card]
+            return scheduling.apply_grades(by_card, grades, settings_by_owner=settings_by_owner)
+    finally:
+        close_old_connections()
+
+
+# --- file_id загруженных в Telegram файлов ---
+
+async def fetch_file_id(bot_id: int, key: str) -> str | None:
+    return await (
+        TelegramFile.objects
+        .filter(bot_id=bot_id, media_key=key)
+        .values_list('file_id', flat=True)
+        .afirst()
+    )
+
+
+async def store_file_id(bot_id: int, key: str, file_id: str):
+    await TelegramFile.objects.aupdate_or_create(bot_id=bot_id, media_key=key, defaults={'file_id': file_id})
+
+
+async def delete_file_id(bot_id: int, key: str):
+    await TelegramFile.objects.filter(bot_id=bot_id, media_key=key).adelete()
@@ -0,0 +1,259 @@
+# bot/resilience.py
+"""
+Общий слой защиты вызовов внешних сервисов (Google Translate, gTTS,
+Pollinations, Google Speech Recognition).
+
+Для каждого провайдера:
+  • circuit breaker — после FAILURE_THRESHOLD ошибок подряд вызовы сразу
+    получают ProviderUnavailable, через reset_timeout пропускается один
+    пробный вызов;
+  • таймаут по наблюдаемой задержке — p95 последних вызовов с запасом,
+    в пределах [min_timeout, max_timeout];
+  • hedged-вызов (только для идемпотентных) — если ответа нет дольше p95
+    или первая попытка упала, параллельно запускается вторая, берётся
+    первый успешный ответ;
+  • свой пул потоков на max_workers — зависший провайдер занимает только
+    свои потоки; когда все заняты, новый вызов сразу получает
+    ProviderUnavailable, а не ждёт в очереди.
+Пока breaker открыт, провайдер считается деградировавшим: бот отвечает
+сразу, без соответствующего медиа.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 5
+LATENCY_WINDOW = 100      # сколько последних задержек помним
+MIN_SAMPLES = 10          # до этого таймаут = max_timeout
+TIMEOUT_FACTOR = 3        # таймаут = p95 * TIMEOUT_FACTOR
+MAX_WORKERS = 8           # одновременных вызовов одного провайдера
+
+# Все созданные провайдеры: имя -> Provider
+providers: dict = {}
+
+
+class ProviderUnavailable(Exception):
+    """Провайдер деградировал (breaker открыт) или не ответил за таймаут."""
+
+    def __init__(self, provider: str, reason: str = 'circuit open'):
+        super().__init__(f"{provider}: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """closed -> (ошибки подряд) -> open -> (reset_timeout) -> half_open -> closed/open."""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True  # один пробный вызов
+                return True
+            return False
+
+    def release_trial(self):
+        """Пробный вызов так и не был сделан — следующий может попробовать."""
+        with self._lock:
+            self._trial_running = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == 'open' and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning("%s: circuit opened after %s failures", self.name, self.failures)
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных вызовов."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            if len(self.samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class Provider:
+    """
+    Внешний сервис: provider.call(fn, *args, **kwargs) выполняет fn в своём
+    пуле потоков с таймаутом, breaker'ом и (при hedge=True) hedged-повтором.
+    Вызовы, которые не вернулись по таймауту, держат поток, пока не
+    закончатся; в пуле не больше max_workers выполняющихся вызовов.
+    neutral_errors — ошибки «на стороне запроса» (например, речь не
+    распознана): пробрасываются, но не считаются отказом сервиса.
+    """
+
+    def __init__(self, name: str, min_timeout: float, max_timeout: float, hedge: bool = False,
+                 reset_timeout: float = 30, neutral_errors: tuple = (), max_workers: int = MAX_WORKERS):
+        self.name = name
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedge = hedge
+        self.neutral_errors = neutral_errors
+        self.breaker = CircuitBreaker(name, reset_timeout=reset_timeout)
+        self.latency = LatencyTracker()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'provider-{name}')
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedged = 0
+        self.saturated = 0
+        providers[name] = self
+
+    def timeout(self) -> float:
+        p95 = self.latency.percentile(0.95)
+        if p95 is None:
+            return self.max_timeout
+        return min(max(p95 * TIMEOUT_FACTOR, self.min_timeout), self.max_timeout)
+
+    def hedge_delay(self) -> float:
+        p95 = self.latency.percentile(0.95)
+        return p95 if p95 is not None else self.max_timeout / 3
+
+    def is_degraded(self) -> bool:
+        return self.breaker.is_open()
+
+    def in_flight(self) -> int:
+        return self.max_workers - self._slots._value
+
+    def _submit(self, fn, *args, **kwargs):
+        """Запуск в пуле провайдера; None — все потоки заняты (слот освобождается по завершении fn)."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise ProviderUnavailable(self.name)
+        future = self._submit(fn, *args, **kwargs)
+        if future is None:
+            # Не отказ сервиса: breaker не трогаем, но пробный вызов half_open отпускаем
+            self.breaker.release_trial()
+            self.saturated += 1
+            raise ProviderUnavailable(self.name, f"{self.max_workers} calls in flight")
+        self.calls += 1
+
+        started = time.monotonic()
+        deadline = started + self.timeout()
+        hedge_at = started + self.hedge_delay() if self.hedge else None
+        pending = {future}
+        attempts = 1
+        last_error = None
+
+        while True:
+            can_hedge = hedge_at is not None and attempts < 2
+            wake_at = min(deadline, hedge_at) if can_hedge else deadline
+            done, pending = wait(pending, timeout=max(wake_at - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except self.neutral_errors:
+                    self.breaker.record_success()
+                    raise
+                except Exception as e:
+                    last_error = e
+                    continue
+                self.latency.add(time.monotonic() - started)
+                self.breaker.record_success()
+                return result
+
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if can_hedge and (not pending or now >= hedge_at):
+                # Ответа нет дольше обычного или попытка упала — дублируем запрос
+                attempts += 1
+                future = self._submit(fn, *args, **kwargs)
+                if future is not None:
+                    pending.add(future)
+                    self.hedged += 1
+                continue
+            if not pending:
+                break
+
+        self.failures += 1
+        self.breaker.record_failure()
+        if pending:
+            logger.warning("%s: no response in %.1f s", self.name, deadline - started)
+            raise ProviderUnavailable(self.name, f"timeout {deadline - started:.1f} s")
+        raise last_error
+
+    def stats(self) -> dict:
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            'state': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'hedged': self.hedged,
+            'saturated': self.saturated,
+            'in_flight': self.in_flight(),
+            'p50': round(p50, 3) if p50 is not None else None,
+            'p95': round(p95, 3) if p95 is not None else None,
+            'timeout': round(self.timeout(), 2),
+        }
+
+
+translate_provider = Provider('translate', min_timeout=2, max_timeout=10, hedge=True)
+tts_provider = Provider('tts', min_timeout=3, max_timeout=15, hedge=True)
+image_provider = Provider('images', min_timeout=10, max_timeout=40, reset_timeout=120)
+# speech_provider объявлен в bot/speech_recognition_helper.py (нужны ошибки speech_recognition)
+
+
+def provider_stats() -> dict:
+    return {name: provider.stats() for name, provider in providers.items()}
+
+
+async def report_provider_stats(interval: float = 60):
+    """Периодически пишет состояние провайдеров в лог (фоновая задача бота)."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Providers: %s", provider_stats())
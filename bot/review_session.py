@@ -0,0 +1,263 @@
+# bot/review_session.py
+"""
+Сессия повторения в боте.
+
+При /review очередь из N карточек загружается одним запросом. Пока
+пользователь смотрит текущую карточку, картинки и озвучка следующих
+готовятся в фоне (озвучка перевода — отдельно: она нужна только
+после «Показать ответ» и не задерживает показ карточки). Оценки считаются в памяти и сохраняются пачками,
+поэтому шаг сессии не читает БД; притихшие сессии сохраняет и
+закрывает sweep_sessions. Оценка любой
+карточки, которую держит сессия (не только текущей), идёт через неё —
+иначе копия в сессии устарела бы и перезаписала оценку при сохранении.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from django.utils import timezone
+
+from bot import repository
+from bot.user_cache import get_settings
+from bot.voice import synthesize_text_to_mp3
+from vocab.image_store import telegram_image_path
+from vocab.models import Repetition
+from vocab.scheduling import SM2Params, schedule_repetitions
+
+logger = logging.getLogger(__name__)
+
+SESSION_SIZE = 20   # сколько карточек берём за один запрос
+PREFETCH_AHEAD = 2  # для скольких карточек вперёд готовим картинки и озвучку
+FLUSH_EVERY = 5     # сколько оценок копим до записи в БД
+FLUSH_RETRIES = 3   # попыток bulk_update, затем — по одной
+FLUSH_BACKOFF = 0.5  # секунд перед второй попыткой, дальше вдвое больше
+SESSION_IDLE_FLUSH = 30     # секунд без оценок — накопленные пишутся в БД
+SESSION_IDLE_TIMEOUT = 900  # секунд без действий — сессия закрывается
+SWEEP_INTERVAL = 10
+
+
+def detect_lang(text: str) -> str:
+    return 'ru' if any('а' <= c <= 'я' or c == 'ё' for c in text.lower()) else 'en'
+
+
+@dataclass
+class ReviewAssets:
+    """Заранее подготовленные медиа для карточки."""
+    photo: str | None = None  # путь к картинке; отправляется через bot.media.send_media
+    word_audio: str | None = None  # путь в кэше озвучки, не удаляется
+
+
+def _image_path(card) -> str | None:
+    if not card.image:
+        return None
+    path = telegram_image_path(card.image.name)
+    if not os.path.exists(path):
+        logger.warning("Image file of card %s is missing: %s", card.id, path)
+        return None
+    return path
+
+
+def _synthesize(text: str) -> str | None:
+    try:
+        return synthesize_text_to_mp3(text, lang=detect_lang(text))
+    except Exception:
+        logger.exception("TTS failed for %r", text)
+        return None
+
+
+async def _load_assets(card) -> ReviewAssets:
+    photo, word_audio = await asyncio.gather(
+        asyncio.to_thread(_image_path, card),
+        asyncio.to_thread(_synthesize, card.word),
+    )
+    return ReviewAssets(photo=photo, word_audio=word_audio)
+
+
+async def _load_translation_audio(card) -> str | None:
+    return await asyncio.to_thread(_synthesize, card.translation)
+
+
+class ReviewSession:
+    """Очередь карточек одного пользователя на время повторения."""
+
+    def __init__(self, telegram_user, repetitions, settings_by_owner):
+        self.telegram_user = telegram_user
+        self.queue = deque(repetitions)
+        self.settings_by_owner = settings_by_owner
+        self.pending: list[dict] = []  # оценки {card_id, quality, answered_at}, ещё не записанные
+        self._graded: dict[int, Repetition] = {}  # card_id -> уже оценённая копия в сессии
+        self.last_activity = time.monotonic()
+        self._assets: dict[int, asyncio.Task] = {}
+        self._translation_audio: dict[int, asyncio.Task] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    async def start(cls, telegram_user, size: int = SESSION_SIZE) -> 'ReviewSession':
+        repetitions = await repository.due_repetitions(telegram_user, size)
+        settings = await get_settings(telegram_user.id)
+        session = cls(telegram_user, repetitions, {telegram_user.id: SM2Params.from_settings(settings)})
+        session.prefetch()
+        return session
+
+    @property
+    def current(self) -> Repetition | None:
+        return self.queue[0] if self.queue else None
+
+    @property
+    def remaining(self) -> int:
+        return len(self.queue)
+
+    def prefetch(self):
+        """Запускает подготовку медиа для текущей и следующих карточек."""
+        for repetition in list(self.queue)[:PREFETCH_AHEAD + 1]:
+            card = repetition.card
+            if card.id not in self._assets:
+                self._assets[card.id] = asyncio.create_task(_load_assets(card))
+                self._translation_audio[card.id] = asyncio.create_task(_load_translation_audio(card))
+
+    async def assets(self, card_id: int) -> ReviewAssets:
+        self.last_activity = time.monotonic()
+        task = self._assets.get(card_id)
+        if task is None:
+            return ReviewAssets()
+        return await task
+
+    async def translation_audio(self, card_id: int) -> str | None:
+        """Путь к озвучке перевода (для «Показать ответ»)."""
+        self.last_activity = time.monotonic()
+        task = self._translation_audio.get(card_id)
+        if task is None:
+            return None
+        return await task
+
+    async def grade(self, card_id: int, quality: int) -> Repetition | None:
+        """
+        Оценка карточки сессии: обычно текущей, но и любой другой из
+        очереди или уже оценённых (кнопки старых сообщений). Пересчёт
+        SM-2 — в памяти (для ответа пользователю), запись в БД — пачкой
+        раз в FLUSH_EVERY оценок или после SESSION_IDLE_FLUSH без оценок.
+        None — карточки в сессии нет, её оценивают напрямую в БД.
+        """
+        repetition = self._take(card_id)
+        if repetition is None:
+            return None
+        answered_at = timezone.now()
+        schedule_repetitions(
+            [repetition], [quality],
+            now=answered_at,
+            settings_by_owner=self.settings_by_owner,
+            commit=False,
+        )
+        self._graded[card_id] = repetition
+        self.pending.append({'card_id': card_id, 'quality': quality, 'answered_at': answered_at})
+        self.last_activity = time.monotonic()
+        self._drop_assets(card_id)
+
+        if len(self.pending) >= FLUSH_EVERY:
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        self.prefetch()
+        return repetition
+
+    def _take(self, card_id: int) -> Repetition | None:
+        """Копия карточки в сессии; из очереди она убирается."""
+        for repetition in self.queue:
+            if repetition.card_id == card_id:
+                self.queue.remove(repetition)
+                return repetition
+        return self._graded.get(card_id)
+
+    async def flush(self):
+        """
+        Записывает накопленные оценки поверх актуальных строк БД
+        (repository.apply_grades): оценка, данная раньше последнего
+        изменения карточки (например, повторения на сайте), пропускается,
+        более поздняя применяется к свежему состоянию. При ошибке — повтор
+        с нарастающей паузой, затем по одной; что не удалось записать,
+        остаётся в pending до следующего flush.
+        """
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            failed = await self._save(batch)
+            if failed:
+                self.pending = failed + self.pending
+
+    async def _save(self, batch: list[dict]) -> list[dict]:
+        delay = FLUSH_BACKOFF
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                await repository.apply_grades(batch, self.settings_by_owner)
+                return []
+            except Exception:
+                logger.exception("Saving %s grades failed (attempt %s of %s)", len(batch), attempt, FLUSH_RETRIES)
+            if attempt < FLUSH_RETRIES:
+                await asyncio.sleep(delay)
+                delay *= 2
+        # Пачка не записывается — сохраняем по одной, чтобы одна плохая строка не держала остальные
+        failed = []
+        for grade in batch:
+            try:
+                await repository.apply_grades([grade], self.settings_by_owner)
+            except Exception:
+                logger.exception("Saving grade for card %s failed", grade['card_id'])
+                failed.append(grade)
+        return failed
+
+    async def close(self):
+        """Сохраняет оставшиеся оценки и освобождает подготовленные медиа."""
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+        if self.pending:
+            logger.error(
+                "Review session of %s closed with unsaved grades for cards %s",
+                self.telegram_user.telegram_id, [g['card_id'] for g in self.pending],
+            )
+        for card_id in list(self._assets):
+            self._drop_assets(card_id)
+
+    def _drop_assets(self, card_id: int):
+        # Файлы озвучки остаются в общем кэше — достаточно забыть задачу
+        self._assets.pop(card_id, None)
+        self._translation_audio.pop(card_id, None)
+
+
+# Активные сессии: telegram_id -> ReviewSession
+review_sessions: dict[int, ReviewSession] = {}
+
+
+async def end_session(telegram_id: int):
+    session = review_sessions.pop(telegram_id, None)
+    if session is not None:
+        await session.close()
+
+
+async def sweep_sessions(interval: float = SWEEP_INTERVAL):
+    """
+    Фоновая задача бота: оценки притихшей сессии (SESSION_IDLE_FLUSH без
+    действий) пишутся в БД, брошенная (SESSION_IDLE_TIMEOUT) закрывается
+    и забывается. Так при падении процесса теряется не больше
+    SESSION_IDLE_FLUSH секунд оценок, а review_sessions не растёт
+    с каждым, кто когда-либо повторял.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        for telegram_id, session in list(review_sessions.items()):
+            idle = now - session.last_activity
+            try:
+                if idle >= SESSION_IDLE_TIMEOUT:
+                    # Пока ждали другие сессии, пользователь мог начать новую
+                    if review_sessions.get(telegram_id) is session:
+                        await end_session(telegram_id)
+                elif idle >= SESSION_IDLE_FLUSH and session.pending:
+                    await session.flush()
+            except Exception:
+                logger.exception("Review session sweep failed for %s", telegram_id)
@@ -0,0 +1,279 @@
+# bot/send_scheduler.py
+"""
+Планировщик исходящих запросов к Telegram.
+
+Подключается к сессии Bot как request-middleware, поэтому через него
+проходят все отправки (send_message, answer_voice, answer_photo, правки
+сообщений и т.д.). Соблюдает лимиты Telegram:
+  • общий token bucket на бота (~30 сообщений/с);
+  • свой bucket на каждый чат (~1 сообщение/с, в группах ~20/мин).
+Внутри чата порядок сообщений сохраняется, разные чаты идут параллельно.
+На ответ 429 чат ставится на паузу на retry_after и запрос повторяется.
+
+Общий лимит делят все отправители: процессы бота и задачи Celery
+(рассылка, готовые картинки). С TELEGRAM_RATE_REDIS это один token
+bucket в Redis; без него каждому достаётся фиксированная доля
+(см. global_bucket).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30          # сообщений в секунду на бота
+CHAT_RATE = 1.0           # сообщений в секунду в личный чат
+CHAT_BURST = 3            # короткий всплеск в личном чате
+GROUP_RATE = 20 / 60      # сообщений в секунду в группу
+MAX_RETRIES = 3
+REDIS_RETRY_INTERVAL = 10  # секунд на локальном лимите после ошибки Redis
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        # Меньше одного токена bucket не накопит никогда — acquire() зависнет
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:  # ожидающие обслуживаются по очереди
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def time_to_full(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return max(self.paused_until - now, 0) + (self.capacity - self.tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """
+    Token bucket в Redis, общий для всех процессов. Пополнение и списание —
+    один Lua-скрипт по часам Redis. Если Redis недоступен, запрос
+    проходит через локальный bucket (fallback), а не блокируется.
+    """
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], 60)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, rate: float, capacity: float, fallback: TokenBucket,
+                 key: str = 'telegram:global_bucket'):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.key = key
+        self.fallback = fallback
+        self._script = self.redis.register_script(self.SCRIPT)
+        self._retry_at = 0.0
+
+    async def acquire(self):
+        while True:
+            if time.monotonic() < self._retry_at:
+                return await self.fallback.acquire()
+            try:
+                wait = float(await self._script(keys=[self.key], args=[self.rate, self.capacity]))
+            except Exception as e:
+                # Не стучимся в недоступный Redis на каждое сообщение
+                logger.warning("Redis rate limiter unavailable (%s), using local bucket", e)
+                self._retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+                return await self.fallback.acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def global_bucket(role: str = 'bot', workers: int = 1):
+    """
+    Общий лимит для отправителя. role: 'bot' (делится на workers процессов
+    супервизора) или 'celery'. С TELEGRAM_RATE_REDIS все делят один bucket
+    в Redis на GLOBAL_RATE, иначе — локальный bucket на свою долю.
+    """
+    rate = send_budget(role, workers)
+    local = TokenBucket(rate, rate)
+    url = _setting('TELEGRAM_RATE_REDIS', None)
+    if url:
+        return RedisTokenBucket(url, GLOBAL_RATE, GLOBAL_RATE, fallback=local)
+    return local
+
+
+def send_budget(role: str = 'bot', workers: int = 1) -> float:
+    """Доля GLOBAL_RATE (сообщений/с) для одного процесса без общего Redis-лимита."""
+    celery_share = _setting('TELEGRAM_CELERY_SHARE', 0.2)
+    if role == 'celery':
+        return GLOBAL_RATE * celery_share
+    return GLOBAL_RATE * (1 - celery_share) / max(workers, 1)
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default) if settings.configured else default
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Request-middleware для aiogram: bot.session.middleware(SendScheduler()).
+    Запросы без chat_id (answer_callback_query, get_file, ...) проходят сразу.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 chat_burst: float = CHAT_BURST, group_rate: float = GROUP_RATE,
+                 max_retries: int = MAX_RETRIES, global_bucket=None):
+        # global_bucket — общий лимит из global_bucket(); иначе свой на global_rate
+        self.global_bucket = global_bucket or TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._queues: dict[int | str, deque] = {}
+        self._buckets: dict[int | str, TokenBucket] = {}
+        self._workers: dict[int | str, asyncio.Task] = {}
+        self._wakeups: dict[int | str, asyncio.Event] = {}
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(chat_id, deque()).append((make_request, bot, method, future))
+        if chat_id in self._workers:
+            self._wakeups[chat_id].set()
+        else:
+            self._wakeups[chat_id] = asyncio.Event()
+            self._workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id))
+        return await future
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательные id и @username — группы и каналы
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = (TokenBucket(self.group_rate, 1) if is_group
+                      else TokenBucket(self.chat_rate, self.chat_burst))
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    async def _chat_worker(self, chat_id):
+        """Отправляет сообщения одного чата строго по очереди."""
+        queue = self._queues[chat_id]
+        wakeup = self._wakeups[chat_id]
+        bucket = self._bucket(chat_id)
+        try:
+            while True:
+                while queue:
+                    make_request, bot, method, future = queue.popleft()
+                    if future.cancelled():
+                        continue
+                    try:
+                        result = await self._send(bucket, make_request, bot, method)
+                    except Exception as e:
+                        if not future.cancelled():
+                            future.set_exception(e)
+                    else:
+                        if not future.cancelled():
+                            future.set_result(result)
+                # Очередь пуста: ждём новое сообщение, но не дольше, чем до полного
+                # bucket — после этого его можно забыть без потери лимита.
+                # Новое сообщение будит воркер сразу, паузу между отправками
+                # выдерживает bucket.acquire()
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=bucket.time_to_full())
+                except asyncio.TimeoutError:
+                    if not queue:
+                        break
+        finally:
+            self._workers.pop(chat_id, None)
+            self._wakeups.pop(chat_id, None)
+            self._buckets.pop(chat_id, None)
+            if queue:
+                # Воркер отменён при остановке — сообщаем ожидающим
+                for *_, future in queue:
+                    if not future.done():
+                        future.cancel()
+            self._queues.pop(chat_id, None)
+
+    async def _send(self, bucket: TokenBucket, make_request, bot, method):
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.retried += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    raise
+                logger.warning("Telegram flood control for chat %s: retry after %s s",
+                               getattr(method, 'chat_id', None), e.retry_after)
+                bucket.pause(e.retry_after)
+                continue
+            except Exception:
+                self.failed += 1
+                raise
+            self.sent += 1
+            return result
+
+    def stats(self) -> dict:
+        """Метрики очереди для логов/мониторинга."""
+        depths = [len(q) for q in self._queues.values()]
+        return {
+            'queued': sum(depths),
+            'max_chat_depth': max(depths, default=0),
+            'active_chats': len(self._workers),
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+        }
+
+    async def report_stats(self, interval: float = 60):
+        """Периодически пишет метрики в лог (запускать как фоновую задачу)."""
+        while True:
+            await asyncio.sleep(interval)
+            logger.info("Send scheduler: %s", self.stats())
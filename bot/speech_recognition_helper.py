@@ -2,12 +2,18 @@
 """
 Модуль для распознавания речи из голосовых сообщений Telegram
 """
+import asyncio
 import os
 import shutil
 import subprocess
 import tempfile
 import speech_recognition as sr
 
+from bot.resilience import Provider, ProviderUnavailable
+
+# Нераспознанная речь — не отказ сервиса, breaker её не считает
+speech_provider = Provider('speech', min_timeout=3, max_timeout=20, neutral_errors=(sr.UnknownValueError,))
+
 def convert_ogg_to_wav_ffmpeg(ogg_path: str, wav_path: str) -> bool:
     """
     Конвертирует OGG в WAV используя ffmpeg
@@ -36,6 +42,11 @@ async def recognize_speech_from_ogg(ogg_file_path: str, language: str = "ru-RU")
     Returns:
         Распознанный текст
     """
+    # Конвертация и запрос в Google блокирующие — выполняем в потоке
+    return await asyncio.to_thread(_recognize_speech, ogg_file_path, language)
+
+
+def _recognize_speech(ogg_file_path: str, language: str) -> str:
     recognizer = sr.Recognizer()
     wav_path = None
     try:
@@ -57,16 +68,18 @@ async def recognize_speech_from_ogg(ogg_file_path: str, language: str = "ru-RU")
             audio_data = recognizer.record(source)
             # Пробуем распознать с указанным языком
             try:
-                text = recognizer.recognize_google(audio_data, language=language)
+                text = speech_provider.call(recognizer.recognize_google, audio_data, language=language)
                 return text
             except sr.UnknownValueError:
                 # Если не удалось распознать с первым языком, пробуем другой
                 alternate_lang = "en-US" if language == "ru-RU" else "ru-RU"
                 try:
-                    text = recognizer.recognize_google(audio_data, language=alternate_lang)
+                    text = speech_provider.call(recognizer.recognize_google, audio_data, language=alternate_lang)
                     return text
                 except sr.UnknownValueError:
                     raise Exception("Не удалось распознать речь. Попробуйте говорить четче.")
+            except ProviderUnavailable:
+                raise Exception("Распознавание речи временно недоступно. Напишите слово текстом.")
             except sr.RequestError:
                 raise Exception("Ошибка сервиса распознавания речи. Попробуйте позже.")
     finally:
@@ -0,0 +1,172 @@
+# bot/state_store.py
+"""
+Хранилище состояний диалога бота (вместо словаря user_states).
+
+Состояние — JSON-совместимое значение (строка или словарь) с TTL, ключ —
+telegram_id. Реализации:
+  • MemoryStateStore — в памяти процесса, LRU с ограничением размера
+    (один процесс, тесты);
+  • SQLiteStateStore — файл SQLite, общий для процессов на одной машине,
+    переживает перезапуск;
+  • RedisStateStore — Redis, общий для процессов на разных машинах.
+Выбор — переменная окружения BOT_STATE_STORE (см. make_state_store).
+pop() атомарен во всех реализациях: состояние забирает ровно один воркер.
+"""
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from vocab.cache import TTLCache
+
+STATE_TTL = 3600          # секунд; брошенный диалог забывается через час
+MEMORY_MAX_STATES = 10000
+PURGE_INTERVAL = 300      # как часто SQLite чистит просроченные записи
+
+
+class StateStore(abc.ABC):
+    """Интерфейс: get / set / pop по telegram_id."""
+
+    @abc.abstractmethod
+    async def get(self, user_id: int, default=None):
+        ...
+
+    @abc.abstractmethod
+    async def set(self, user_id: int, state, ttl: float | None = None):
+        ...
+
+    @abc.abstractmethod
+    async def pop(self, user_id: int, default=None):
+        """Забирает и удаляет состояние одной операцией."""
+
+    async def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self, maxsize: int = MEMORY_MAX_STATES, ttl: float = STATE_TTL):
+        # TTL у TTLCache общий — срок каждой записи храним рядом со значением,
+        # а память ограничивает maxsize (вытесняются давно не использованные)
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=float('inf'))
+
+    async def get(self, user_id, default=None):
+        item = self._cache.get(user_id)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    async def set(self, user_id, state, ttl=None):
+        self._cache.set(user_id, (time.monotonic() + (ttl or self.ttl), state))
+
+    async def pop(self, user_id, default=None):
+        item = self._cache.pop(user_id)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, path: str, ttl: float = STATE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bot_state ('
+                ' user_id INTEGER PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS bot_state_expires ON bot_state (expires_at)')
+
+    def _connect(self):
+        # Соединение на операцию: вызовы идут из разных потоков; autocommit
+        return closing(sqlite3.connect(self.path, timeout=10, isolation_level=None))
+
+    def _get(self, user_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value FROM bot_state WHERE user_id = ? AND expires_at > ?', (user_id, time.time())
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _set(self, user_id, state, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO bot_state (user_id, value, expires_at) VALUES (?, ?, ?)'
+                ' ON CONFLICT(user_id) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at',
+                (user_id, json.dumps(state, ensure_ascii=False), now + (ttl or self.ttl)),
+            )
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute('DELETE FROM bot_state WHERE expires_at <= ?', (now,))
+
+    def _pop(self, user_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'DELETE FROM bot_state WHERE user_id = ? RETURNING value, expires_at', (user_id,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    async def get(self, user_id, default=None):
+        value = await asyncio.to_thread(self._get, user_id)
+        return default if value is None else value
+
+    async def set(self, user_id, state, ttl=None):
+        await asyncio.to_thread(self._set, user_id, state, ttl)
+
+    async def pop(self, user_id, default=None):
+        value = await asyncio.to_thread(self._pop, user_id)
+        return default if value is None else value
+
+
+class RedisStateStore(StateStore):
+    def __init__(self, url: str, ttl: float = STATE_TTL, prefix: str = 'bot_state:'):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def get(self, user_id, default=None):
+        raw = await self.redis.get(self._key(user_id))
+        return default if raw is None else json.loads(raw)
+
+    async def set(self, user_id, state, ttl=None):
+        await self.redis.set(self._key(user_id), json.dumps(state, ensure_ascii=False), ex=int(ttl or self.ttl))
+
+    async def pop(self, user_id, default=None):
+        raw = await self.redis.getdel(self._key(user_id))
+        return default if raw is None else json.loads(raw)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def make_state_store(url: str | None = None, default_path: str = 'bot_state.sqlite3') -> StateStore:
+    """
+    BOT_STATE_STORE:
+      memory                      — в памяти процесса;
+      sqlite:///path/to/file.db   — SQLite (по умолчанию default_path);
+      redis://host:6379/1         — Redis.
+    """
+    url = url or os.getenv('BOT_STATE_STORE') or f"sqlite:///{default_path}"
+    if url == 'memory':
+        return MemoryStateStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStateStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisStateStore(url)
+    raise ValueError(f"Неизвестный BOT_STATE_STORE: {url}")
@@ -0,0 +1,300 @@
+# bot/supervisor.py
+"""
+Супервизор: бот в нескольких процессах.
+
+Запуск: python -m bot.supervisor (BOT_WORKERS — число воркеров, по
+умолчанию число ядер, но не больше лимита отправки бота в сообщениях/с;
+BOT_MODE — polling или webhook, как у бота).
+
+Обновления от Telegram принимает только супервизор (getUpdates или
+webhook-сервер из bot/webhook.py) и раздаёт их воркерам по
+telegram_id % BOT_WORKERS — все обновления пользователя попадают в один
+процесс и обрабатываются по порядку, поэтому состояние диалога и сессии
+повторения остаются локальными для воркера. Блокирующие вызовы (gTTS,
+картинки, ffmpeg, ORM) разных воркеров больше не делят один event loop.
+
+  • упавший воркер перезапускается (с нарастающей паузой, если падает
+    сразу после старта); его очередь сохраняется в супервизоре;
+  • SIGTERM/SIGINT: супервизор перестаёт принимать обновления, воркеры
+    дорабатывают свои очереди и завершаются (graceful drain), через
+    DRAIN_TIMEOUT оставшиеся убиваются.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import time
+
+from aiogram.types import Update
+
+from bot.send_scheduler import send_budget
+from bot.webhook import routing_key
+
+logger = logging.getLogger(__name__)
+
+WORKER_QUEUE_SIZE = 500   # обновлений в очереди одного воркера
+WORKER_LANES = 8          # параллельных «дорожек» внутри воркера
+DRAIN_TIMEOUT = 30        # секунд на доработку очередей при остановке
+POLL_TIMEOUT = 30         # long polling getUpdates
+MONITOR_INTERVAL = 1
+MAX_RESTART_DELAY = 60
+STABLE_UPTIME = 60        # воркер, проживший дольше, считается стабильным
+
+
+# --- Воркер (дочерний процесс) ---
+
+def _worker_process(index: int, updates):
+    # Останавливает воркеры супервизор — через маркер конца очереди
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_worker_main(index, updates))
+
+
+async def _worker_main(index: int, updates):
+    from bot import telegram_bot
+    from bot.resilience import report_provider_stats
+    from bot.review_session import sweep_sessions
+
+    lanes = [asyncio.Queue(maxsize=WORKER_QUEUE_SIZE) for _ in range(WORKER_LANES)]
+    tasks = [asyncio.create_task(_run_lane(telegram_bot, lane)) for lane in lanes]
+    tasks.append(asyncio.create_task(telegram_bot.send_scheduler.report_stats()))
+    tasks.append(asyncio.create_task(report_provider_stats()))
+    tasks.append(asyncio.create_task(sweep_sessions()))
+    loop = asyncio.get_running_loop()
+    print(f"🤖 Worker {index} started (pid {os.getpid()})")
+    try:
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            # Внутри воркера порядок тоже сохраняется: один пользователь — одна дорожка
+            await lanes[routing_key(data) % len(lanes)].put(data)
+        await asyncio.gather(*(lane.join() for lane in lanes))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await telegram_bot.shutdown()
+        await telegram_bot.bot.session.close()
+        print(f"🛑 Worker {index} stopped")
+
+
+async def _run_lane(telegram_bot, lane: asyncio.Queue):
+    while True:
+        data = await lane.get()
+        try:
+            update = Update.model_validate(data, context={'bot': telegram_bot.bot})
+            await telegram_bot.dp.feed_update(telegram_bot.bot, update)
+        except Exception:
+            logger.exception("Update %s failed", data.get('update_id'))
+        finally:
+            lane.task_done()
+
+
+# --- Супервизор ---
+
+class Supervisor:
+    """
+    Держит N процессов-воркеров и их очереди. Снаружи выглядит как
+    Dispatcher (feed_update, resolve_used_update_types), поэтому его можно
+    передать в run_webhook вместо dp.
+    """
+
+    def __init__(self, dp, workers: int, queue_size: int = WORKER_QUEUE_SIZE):
+        self.dp = dp
+        self._ctx = multiprocessing.get_context('spawn')
+        self.queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes: list = [None] * workers
+        self.started_at = [0.0] * workers
+        self.restart_at = [0.0] * workers
+        self.crashes = [0] * workers
+        self.restarts = 0
+        self.dispatched = 0
+        self.stopping = False
+
+    def resolve_used_update_types(self):
+        return self.dp.resolve_used_update_types()
+
+    async def feed_update(self, bot, update: Update):
+        await self.dispatch(update.model_dump(mode='json', by_alias=True, exclude_none=True))
+
+    async def dispatch(self, data: dict):
+        """Кладёт обновление в очередь воркера; если очередь полна — ждёт (backpressure)."""
+        updates = self.queues[routing_key(data) % len(self.queues)]
+        try:
+            updates.put_nowait(data)
+        except queue_module.Full:
+            await asyncio.to_thread(updates.put, data)
+        self.dispatched += 1
+
+    def start_worker(self, index: int):
+        process = self._ctx.Process(
+            target=_worker_process, args=(index, self.queues[index]),
+            name=f"bot-worker-{index}", daemon=False,
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+
+    def start(self):
+        # Воркеры делят лимит отправки Telegram (см. SendScheduler в telegram_bot)
+        os.environ['BOT_WORKER_COUNT'] = str(len(self.queues))
+        for index in range(len(self.queues)):
+            self.start_worker(index)
+
+    async def monitor(self):
+        """Перезапускает упавшие воркеры."""
+        while not self.stopping:
+            now = time.monotonic()
+            for index, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                if not self.restart_at[index]:
+                    # Падает сразу после старта — увеличиваем паузу, чтобы не крутиться в цикле
+                    if now - self.started_at[index] < STABLE_UPTIME:
+                        self.crashes[index] += 1
+                    else:
+                        self.crashes[index] = 1
+                    delay = min(2 ** (self.crashes[index] - 1), MAX_RESTART_DELAY)
+                    self.restart_at[index] = now + delay
+                    logger.warning("Worker %s exited with code %s, restart in %s s",
+                                   index, process.exitcode, delay)
+                elif now >= self.restart_at[index]:
+                    self.restart_at[index] = 0.0
+                    self.restarts += 1
+                    self._replace_queue(index)
+                    self.start_worker(index)
+            await asyncio.sleep(MONITOR_INTERVAL)
+
+    def _replace_queue(self, index: int):
+        """
+        Новая очередь для перезапускаемого воркера: если он погиб внутри
+        get(), блокировка старой очереди осталась захваченной навсегда.
+        Всё, что удаётся забрать из старой очереди, переносится.
+        """
+        old = self.queues[index]
+        self.queues[index] = self._ctx.Queue(maxsize=old._maxsize)
+        moved = 0
+        try:
+            while True:
+                self.queues[index].put_nowait(old.get_nowait())
+                moved += 1
+        except (queue_module.Empty, queue_module.Full):
+            pass
+        lost = _qsize(old)
+        if lost:
+            logger.warning("Worker %s: %s queued updates lost", index, lost)
+        elif moved:
+            logger.info("Worker %s: %s queued updates moved to the new queue", index, moved)
+        old.close()
+
+    async def stop(self):
+        """Graceful drain: маркер конца в каждую очередь, ждём воркеры, остальных убиваем."""
+        self.stopping = True
+        for updates, process in zip(self.queues, self.processes):
+            if process.is_alive():
+                try:
+                    await asyncio.to_thread(updates.put, None, True, DRAIN_TIMEOUT)
+                except queue_module.Full:
+                    pass
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        for index, process in enumerate(self.processes):
+            await asyncio.to_thread(process.join, max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning("Worker %s did not drain in %s s, killing", index, DRAIN_TIMEOUT)
+                process.kill()
+                await asyncio.to_thread(process.join)
+
+    def stats(self) -> dict:
+        return {
+            'workers': len(self.processes),
+            'alive': sum(1 for p in self.processes if p is not None and p.is_alive()),
+            'dispatched': self.dispatched,
+            'restarts': self.restarts,
+        }
+
+
+def _qsize(updates) -> int:
+    try:
+        return updates.qsize()
+    except NotImplementedError:  # macOS
+        return 0
+
+
+async def poll_updates(supervisor: Supervisor, bot):
+    """Long polling: getUpdates в супервизоре, разбор — в воркерах."""
+    await bot.delete_webhook(drop_pending_updates=False)
+    allowed_updates = supervisor.resolve_used_update_types()
+    offset = None
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed_updates)
+            except Exception as e:
+                logger.warning("getUpdates failed: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await supervisor.feed_update(bot, update)
+                offset = update.update_id + 1
+    finally:
+        if offset is not None:
+            # Подтверждаем переданные воркерам обновления, иначе после перезапуска придут снова
+            try:
+                await bot.get_updates(offset=offset, timeout=0, limit=1)
+            except Exception as e:
+                logger.warning("Could not confirm offset %s: %s", offset, e)
+
+
+def default_workers() -> int:
+    """
+    BOT_WORKERS или число ядер, но не больше доли лимита отправки бота:
+    она делится между воркерами, и каждому должно достаться не меньше
+    1 сообщения/с.
+    """
+    workers = int(os.getenv('BOT_WORKERS') or os.cpu_count() or 1)
+    limit = max(int(send_budget('bot')), 1)
+    if workers > limit:
+        logger.warning("BOT_WORKERS=%s exceeds the send budget, using %s workers", workers, limit)
+        workers = limit
+    return max(workers, 1)
+
+
+async def run_supervisor():
+    from bot.telegram_bot import bot, dp
+    from bot.webhook import run_webhook
+
+    workers = default_workers()
+    mode = os.getenv('BOT_MODE', 'polling')
+    supervisor = Supervisor(dp, workers)
+    supervisor.start()
+    print(f"🤖 Supervisor started: {workers} workers ({mode})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    if mode == 'webhook':
+        receiver = asyncio.create_task(run_webhook(supervisor, bot))
+    else:
+        receiver = asyncio.create_task(poll_updates(supervisor, bot))
+    monitor = asyncio.create_task(supervisor.monitor())
+    try:
+        await asyncio.wait([asyncio.create_task(stop.wait()), receiver], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Сначала перестаём принимать (webhook дорабатывает свою очередь), затем останавливаем воркеры
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+        monitor.cancel()
+        await supervisor.stop()
+        await bot.session.close()
+        print(f"🛑 Supervisor stopped: {supervisor.stats()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[supervisor] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_supervisor())
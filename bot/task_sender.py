@@ -0,0 +1,50 @@
+# bot/task_sender.py
+"""
+Отправка в Telegram из задач Celery.
+
+Один Bot, планировщик отправки и event loop на процесс воркера Celery:
+соединения и лимиты живут между задачами, а не создаются заново на
+каждую картинку. Общий лимит — доля Celery из bot.send_scheduler
+(или общий Redis-bucket, если задан TELEGRAM_RATE_REDIS).
+"""
+import asyncio
+import atexit
+import os
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from django.conf import settings
+
+from bot.send_scheduler import SendScheduler, global_bucket
+
+
+class TaskSender:
+    def __init__(self):
+        self.loop = None
+        self.bot = None
+        self.scheduler = None
+
+    def run(self, make_coro):
+        """Выполняет make_coro(bot) в event loop процесса. Без BOT_TOKEN — ValueError."""
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        if self.bot is None:
+            token = os.getenv('BOT_TOKEN')
+            if not token:
+                raise ValueError("BOT_TOKEN не задан")
+            self.scheduler = SendScheduler(global_bucket=global_bucket('celery'))
+            self.bot = Bot(token=token, session=AiohttpSession(limit=getattr(settings, 'NOTIFY_CONCURRENCY', 20)))
+            self.bot.session.middleware(self.scheduler)
+        return self.loop.run_until_complete(make_coro(self.bot))
+
+    def close(self):
+        if self.loop is None or self.loop.is_closed():
+            return
+        if self.bot is not None:
+            self.loop.run_until_complete(self.bot.session.close())
+        self.loop.close()
+        self.bot = None
+
+
+sender = TaskSender()
+atexit.register(sender.close)
@@ -10,10 +10,9 @@ from aiogram import Bot, Dispatcher, types
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import FSInputFile
+from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.types import Message
-from asgiref.sync import sync_to_async
 from dotenv import load_dotenv
 
 # Загружаем .env
@@ -27,13 +26,22 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vocab.settings")
 import django
 django.setup()
 # Django / модели (импорты после django.setup)
+from django.db import close_old_connections
 from django.utils import timezone
-# Если вы используете напрямую библиотеку:
-from bot.image_generator import fetch_image_for_word
-from vocab.models import TelegramUser, Card, Repetition, UserSettings
-from words.models import Word
+from vocab.models import TelegramUser
+from vocab.image_store import telegram_image_path
+from vocab.translation import translate
+from words.services import ingest_word
 # Наши утилиты (локальные модули)
 from bot.voice import synthesize_text_to_mp3
+from bot import repository
+from bot.media import send_media
+from bot.review_session import ReviewSession, review_sessions, end_session, sweep_sessions
+from bot.resilience import ProviderUnavailable, image_provider, report_provider_stats
+from bot.send_scheduler import SendScheduler, global_bucket
+from bot.state_store import make_state_store
+from bot.user_cache import get_settings, get_user, get_user_with_settings, register_user, save_settings
+from bot.webhook import run_webhook
 from bot.speech_recognition_helper import detect_language_from_text
 from bot.speech_recognition_helper import recognize_speech_from_ogg
 # Получаем токен
@@ -41,8 +49,15 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден в .env")
 bot = Bot(token=BOT_TOKEN)
+# Все исходящие запросы идут через планировщик с лимитами Telegram
+# Лимит Telegram общий на бота — делим его с процессами супервизора и Celery
+send_scheduler = SendScheduler(global_bucket=global_bucket('bot', int(os.getenv('BOT_WORKER_COUNT', 1))))
+bot.session.middleware(send_scheduler)
 # Aiogram storage / dispatcher / router
-storage = MemoryStorage()
+# Состояния диалогов: BOT_STATE_STORE=memory | sqlite:///path | redis://... (bot/state_store.py)
+state_store = make_state_store(default_path=os.path.join(PROJECT_ROOT, 'bot_state.sqlite3'))
+STATE_STORE_URL = os.getenv('BOT_STATE_STORE', '')
+storage = RedisStorage.from_url(STATE_STORE_URL) if STATE_STORE_URL.startswith('redis') else MemoryStorage()
 dp = Dispatcher(storage=storage)
 router = Router()
 dp.include_router(router)
@@ -51,8 +66,9 @@ SETTINGS_URL = "http://127.0.0.1:8000/settings/"
 LOGIN_URL = "http://127.0.0.1:8000/bot-login"
 SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')  # При хостинге: https://yoursite.com
 
-# Состояния пользователей
-user_states: dict = {}
+# Таймауты шагов обработки нового слова (секунды)
+TTS_TIMEOUT = 15
+SAVE_TIMEOUT = 20
 
 # ================== КНОПКИ / МЕНЮ ==================
 def make_settings_keyboard(current_gender: str) -> InlineKeyboardMarkup:
@@ -106,9 +122,8 @@ async def handle_word_input(message: Message, text: str):
         await message.answer("Пожалуйста, введите слово.", reply_markup=main_menu_kb)
         return
     # Проверяем регистрацию пользователя
-    try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=message.from_user.id)
-    except TelegramUser.DoesNotExist:
+    telegram_user = await get_user(message.from_user.id)
+    if telegram_user is None:
         await message.answer(
             "Вы не зарегистрированы. Используйте /start для регистрации.",
             reply_markup=main_menu_kb
@@ -129,16 +144,47 @@ async def handle_word_input(message: Message, text: str):
             src_lang = "en"
             dest_lang = "ru"
         word_text = raw_text
-        from deep_translator import GoogleTranslator
-        word_translation = GoogleTranslator(source=src_lang, target=dest_lang).translate(word_text)
+        word_translation = await asyncio.to_thread(_with_db, translate, word_text, source=src_lang, target=dest_lang)
         if not word_translation or not word_translation.strip():
             raise Exception("Пустой перевод")
+    except ProviderUnavailable:
+        await processing_msg.edit_text(
+            "🌐 Сервис перевода временно недоступен. Попробуйте чуть позже.",
+            reply_markup=main_menu_kb
+        )
+        return
     except Exception as e:
         await processing_msg.edit_text(
             f"⚠️ Не удалось перевести слово: {str(e)[:50]}...\n\nПопробуйте с другим словом.",
             reply_markup=main_menu_kb
         )
         return
+    # Озвучка оригинала, озвучка перевода и сохранение (оно же ставит картинку в очередь)
+    # не зависят друг от друга — запускаем сразу, ответы отправляем по мере готовности
+    orig_lang = 'ru' if detected_lang == 'ru' else 'en'
+    trans_lang = 'ru' if detected_lang != 'ru' else 'en'
+    # Деградация: Pollinations недоступен — сохраняем слово без картинки
+    with_image = not image_provider.is_degraded()
+    jobs = [
+        asyncio.create_task(_with_timeout(
+            'orig', asyncio.to_thread(synthesize_text_to_mp3, word_text, lang=orig_lang), TTS_TIMEOUT
+        )),
+        asyncio.create_task(_with_timeout(
+            'trans', asyncio.to_thread(synthesize_text_to_mp3, word_translation, lang=trans_lang), TTS_TIMEOUT
+        )),
+        asyncio.create_task(_with_timeout('save', asyncio.to_thread(
+            _with_db,
+            ingest_word,
+            telegram_user,
+            word_text,
+            word_translation,
+            source_lang=orig_lang,
+            next_review=timezone.now() + timedelta(hours=2),
+            # Картинка генерируется фоновой задачей, бот пришлёт её, когда она будет готова
+            with_image=with_image,
+            notify_chat_id=message.chat.id,
+        ), SAVE_TIMEOUT)),
+    ]
     # Отправляем результат с переводом
     result_text = (
         f"✅ Перевод готов!\n\n"
@@ -146,84 +192,88 @@ async def handle_word_input(message: Message, text: str):
         f"🌍 Язык: {detected_lang.upper()}"
     )
     await processing_msg.edit_text(result_text, reply_markup=main_menu_kb)
-    # Озвучиваем оригинал
-    try:
-        orig_lang = 'ru' if detected_lang == 'ru' else 'en'
-        audio_path_orig = synthesize_text_to_mp3(word_text, lang=orig_lang)
-        voice_file_orig = types.FSInputFile(path=audio_path_orig)
-        await message.answer_voice(
-            voice=voice_file_orig,
-            caption=f"🔊 Оригинал: {word_text} ({orig_lang.upper()})"
-        )
-        if os.path.exists(audio_path_orig):
-            os.remove(audio_path_orig)
-    except Exception as audio_error:
-        await message.answer(f"⚠️ Ошибка озвучивания оригинала: {str(audio_error)[:30]}...")
-    # Озвучиваем перевод
-    try:
-        trans_lang = 'ru' if detected_lang != 'ru' else 'en'
-        audio_path_trans = synthesize_text_to_mp3(word_translation, lang=trans_lang)
-        voice_file_trans = types.FSInputFile(path=audio_path_trans)
-        await message.answer_voice(
-            voice=voice_file_trans,
-            caption=f"🔊 Перевод: {word_translation} ({trans_lang.upper()})"
-        )
-        if os.path.exists(audio_path_trans):
-            os.remove(audio_path_trans)
-    except Exception as audio_error:
-        await message.answer(f"⚠️ Ошибка озвучивания перевода: {str(audio_error)[:30]}...")
 
-    # Сохраняем в БД и генерируем картинку
+    tts_unavailable_sent = False
+    for next_done in asyncio.as_completed(jobs):
+        name, result, error = await next_done
+        try:
+            if name in ('orig', 'trans') and isinstance(error, ProviderUnavailable):
+                # Озвучка деградировала — одно короткое сообщение вместо двух ошибок
+                if not tts_unavailable_sent:
+                    tts_unavailable_sent = True
+                    await message.answer("🔇 Озвучка временно недоступна.")
+            elif name == 'orig':
+                if error:
+                    await message.answer(f"⚠️ Ошибка озвучивания оригинала: {str(error)[:30]}...")
+                else:
+                    await send_media(
+                        bot, message.chat.id, 'voice', result,
+                        caption=f"🔊 Оригинал: {word_text} ({orig_lang.upper()})"
+                    )
+            elif name == 'trans':
+                if error:
+                    await message.answer(f"⚠️ Ошибка озвучивания перевода: {str(error)[:30]}...")
+                else:
+                    await send_media(
+                        bot, message.chat.id, 'voice', result,
+                        caption=f"🔊 Перевод: {word_translation} ({trans_lang.upper()})"
+                    )
+            elif error:
+                print(f"Ошибка сохранения: {error}")
+            else:
+                word_obj, created = result
+                if not created:
+                    # Слово уже есть у пользователя — просто сообщаем
+                    await message.answer(
+                        f"⚠️ Слово '{word_text}' уже есть в вашем словаре.\n"
+                        f"Перевод: {word_obj.translation}",
+                        reply_markup=main_menu_kb
+                    )
+                elif with_image:
+                    await message.answer("🖼 Картинка для слова готовится — пришлю, как только она будет готова.")
+                else:
+                    await message.answer("🖼 Картинки временно недоступны — слово сохранено без картинки.")
+        except Exception as send_error:
+            print(f"Ошибка отправки ({name}): {send_error}")
+
+
+def _with_db(fn, *args, **kwargs):
+    """
+    Синхронный вызов с ORM для asyncio.to_thread. В пуле потоков, а не в
+    общем потоке sync_to_async (thread_sensitive): перевод и сохранение
+    разных пользователей идут параллельно, а зависший вызов не держит
+    остальных. Соединение с БД у потока своё — устаревшее закрываем до и
+    после, как Django делает вокруг запроса.
+    """
+    close_old_connections()
     try:
-        source_lang = 'ru' if detected_lang == 'ru' else 'en'
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
 
-        # ✅ ГЛАВНОЕ ИСПРАВЛЕНИЕ: СНАЧАЛА ПРОВЕРЯЕМ ДУБЛИКАТЫ ПО ТЕКСТУ
-        existing_word = Word.objects.filter(text=word_text).first()
 
-        if existing_word:
-            # Слово уже есть — просто сообщаем пользователю
-            await message.answer(
-                f"⚠️ Слово '{word_text}' уже существует в базе.\n"
-                f"Перевод: {existing_word.translation}",
-                reply_markup=main_menu_kb
-            )
-        else:
-            # Создаём новое слово с ПРИВИЗКОЙ К ПОЛЬЗОВАТЕЛЮ
-            word_obj = await sync_to_async(Word.objects.create)(
-                user=telegram_user,
-                text=word_text,
-                translation=word_translation,
-                source_lang=source_lang,
-                next_review=timezone.now() + timedelta(hours=2),
-            )
+async def _with_timeout(name: str, awaitable, timeout: float):
+    """
+    Ждёт шаг обработки слова не дольше timeout. Возвращает (name, result, error),
+    чтобы as_completed знал, какой шаг завершился. Поток после таймаута
+    доработает сам (озвучка всё равно попадёт в кэш).
+    """
+    try:
+        return name, await asyncio.wait_for(awaitable, timeout), None
+    except asyncio.TimeoutError:
+        return name, None, TimeoutError(f"таймаут {timeout:.0f} с")
+    except Exception as e:
+        return name, None, e
 
-            # Генерируем и сохраняем картинку
-            django_file = fetch_image_for_word(word_text, word_translation)
-            if django_file:
-                await sync_to_async(word_obj.image.save)(
-                    django_file.name,
-                    django_file,
-                    save=True,
-                )
-                try:
-                    photo = types.FSInputFile(path=word_obj.image.path)
-                    await message.answer_photo(
-                        photo=photo,
-                        caption="🖼 Картинка для этого слова",
-                    )
-                except Exception as send_err:
-                    print(f"Error sending photo: {send_err}")
-            else:
-                print("Pollinations не смог вернуть картинку, продолжаем без неё.")
 
-    except Exception as db_error:
-        print(f"Ошибка сохранения: {db_error}")
 # ================== ТЕСТ (QUIZ) ==================
 async def start_quiz(message: Message):
     """Начинает тестирование."""
     try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=message.from_user.id)
-        words = await sync_to_async(list)(Word.objects.filter(user=telegram_user))
+        telegram_user = await get_user(message.from_user.id)
+        if telegram_user is None:
+            raise TelegramUser.DoesNotExist
+        words = await repository.quiz_words(telegram_user)
         if len(words) < 1:
             await bot.send_message(
                 message.chat.id,
@@ -245,11 +295,11 @@ async def start_quiz(message: Message):
         def has_cyrillic(text: str) -> bool:
             return any('а' <= c <= 'я' or c in 'ёЁ' for c in text.lower())
         word_lang = 'ru' if has_cyrillic(random_word.text) else 'en'
-        user_states[message.from_user.id] = {
+        await state_store.set(message.from_user.id, {
             "state": "waiting_for_answer",
             "correct_answer": random_word.translation.lower().strip(),
             "word": random_word.text
-        }
+        })
         await bot.send_message(
             message.chat.id,
             f"🧠 Тест начался!\n\n"
@@ -258,26 +308,24 @@ async def start_quiz(message: Message):
             "Напишите перевод:"
         )
         try:
-            audio_path = synthesize_text_to_mp3(random_word.text, lang=word_lang)
-            voice_file = types.FSInputFile(path=audio_path)
-            await bot.send_voice(
-                message.chat.id,
-                voice=voice_file,
+            audio_path = await asyncio.to_thread(synthesize_text_to_mp3, random_word.text, lang=word_lang)
+            await send_media(
+                bot, message.chat.id, 'voice', audio_path,
                 caption=f"🔊 Прослушайте: {random_word.text}"
             )
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
         except Exception as audio_error:
             await bot.send_message(
                 message.chat.id,
                 f"⚠️ Ошибка озвучивания: {str(audio_error)[:30]}..."
             )
-            # card — это объект Card
-            if card.image:
-                photo = FSInputFile(card.image.path)
-                await message.answer_photo(photo=photo, caption=card.word)
+            # Без озвучки показываем слово картинкой (random_word — объект Word)
+            if random_word.image:
+                await send_media(
+                    bot, message.chat.id, 'photo', telegram_image_path(random_word.image.name),
+                    caption=random_word.text
+                )
             else:
-                await message.answer(card.word)
+                await message.answer(random_word.text)
 
     except TelegramUser.DoesNotExist:
         await bot.send_message(
@@ -287,20 +335,23 @@ async def start_quiz(message: Message):
         )
 
 async def handle_quiz_answer(message: Message, text: str):
-    user_state = user_states.get(message.from_user.id, {})
-    state_type = user_state.get("state")
+    # pop атомарен: ответ засчитывается один раз, даже если ботов несколько
+    user_state = await state_store.pop(message.from_user.id, {})
+    state_type = user_state.get("state") if isinstance(user_state, dict) else None
     if state_type not in ["waiting_for_answer", "waiting_for_review_answer"]:
+        if user_state:
+            await state_store.set(message.from_user.id, user_state)
         return
     correct_answer = user_state.get("correct_answer", "")
     original_word = user_state.get("word", "")
     card_id = user_state.get("card_id")
-    user_states.pop(message.from_user.id, None)
     user_answer = text.lower().strip()
     quality = 5 if user_answer == correct_answer else 1
     if card_id:
         try:
-            card = await sync_to_async(Card.objects.select_related('repetition').get)(id=card_id)
-            await sync_to_async(card.repetition.schedule_review)(quality)
+            repetition = await repository.get_repetition(card_id)
+            settings = await get_settings(repetition.card.owner_id)
+            await repository.schedule_review(repetition, quality, settings)
             print(f"✅ Статистика обновлена для карточки {card_id}")
         except Exception as e:
             print(f"❌ Ошибка обновления повторения: {e}")
@@ -329,7 +380,7 @@ async def handle_quiz_answer(message: Message, text: str):
 @router.callback_query(lambda c: c.data == 'enter_word')
 async def process_enter_word_callback(callback_query: types.CallbackQuery):
     await callback_query.answer()
-    user_states[callback_query.from_user.id] = "waiting_for_word"
+    await state_store.set(callback_query.from_user.id, "waiting_for_word")
     await bot.send_message(
         callback_query.from_user.id,
         "📝 Напишите или 🎤 произнесите слово:\n\n"
@@ -376,20 +427,14 @@ async def process_settings_callback(callback_query: types.CallbackQuery):
         await callback_query.answer()
     except Exception:
         pass
-    try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(
-            telegram_id=callback_query.from_user.id
-        )
-    except TelegramUser.DoesNotExist:
+    telegram_user, settings = await get_user_with_settings(callback_query.from_user.id)
+    if telegram_user is None:
         await bot.send_message(
             callback_query.from_user.id,
             "Вы не зарегистрированы. Используйте /start.",
             reply_markup=main_menu_kb
         )
         return
-    settings, _ = await sync_to_async(UserSettings.objects.get_or_create)(
-        user=telegram_user
-    )
     kb = make_settings_keyboard(settings.voice_gender)
     text = (
         "⚙️ Настройки озвучки\n\n"
@@ -410,14 +455,16 @@ async def process_voice_choice(callback_query: types.CallbackQuery):
         pass
     gender = "female" if callback_query.data == "voice_female" else "male"
     try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(
-            telegram_id=callback_query.from_user.id
-        )
-        settings, _ = await sync_to_async(UserSettings.objects.get_or_create)(
-            user=telegram_user
-        )
+        telegram_user, settings = await get_user_with_settings(callback_query.from_user.id)
+        if telegram_user is None:
+            await bot.send_message(
+                callback_query.from_user.id,
+                "Вы не зарегистрированы. Используйте /start.",
+                reply_markup=main_menu_kb
+            )
+            return
         settings.voice_gender = gender
-        await sync_to_async(settings.save)()
+        await save_settings(settings, 'voice_gender')
         kb = make_settings_keyboard(settings.voice_gender)
         try:
             await bot.edit_message_text(
@@ -454,6 +501,14 @@ async def process_back_to_menu(callback_query: types.CallbackQuery):
         reply_markup=main_menu_kb
     )
 
+QUALITY_NAMES = {
+    1: "Совсем не помнил",
+    2: "С трудом",
+    3: "Хорошо",
+    4: "Отлично"
+}
+
+
 @router.callback_query(lambda c: c.data.startswith("review_q"))
 async def process_review_quality(callback_query: types.CallbackQuery):
     """Обработка оценки повторения."""
@@ -464,60 +519,73 @@ async def process_review_quality(callback_query: types.CallbackQuery):
     parts = callback_query.data.split('_')
     quality = int(parts[1][1])  # q1/q2/q3/q4
     card_id = int(parts[2])
+    telegram_id = callback_query.from_user.id
     try:
-        card = await sync_to_async(Card.objects.select_related('repetition').get)(id=card_id)
-        repetition = card.repetition
-        await sync_to_async(repetition.schedule_review)(quality)
-        quality_names = {
-            1: "Совсем не помнил",
-            2: "С трудом",
-            3: "Хорошо",
-            4: "Отлично"
-        }
-        result_text = f"✅ Оценка сохранена: {quality_names[quality]}\n\n"
+        # Активная сессия: оценка считается в памяти, следующая карточка уже готова
+        session = review_sessions.get(telegram_id)
+        repetition = await session.grade(card_id, quality) if session else None
+        if repetition is None:
+            repetition = await repository.get_repetition(card_id)
+            settings = await get_settings(repetition.card.owner_id)
+            await repository.schedule_review(repetition, quality, settings)
+        result_text = f"✅ Оценка сохранена: {QUALITY_NAMES[quality]}\n"
         next_review = repetition.next_review
         result_text += f"📅 Следующее повторение: {next_review.strftime('%d.%m.%Y %H:%M')}"
+        if session and session.current is not None:
+            await send_review_card(callback_query.message, session, header=result_text)
+            return
+        if session:
+            await end_session(telegram_id)
+            result_text += "\n\n🎉 Все карточки на сейчас повторены!"
         await callback_query.bot.send_message(
-            chat_id=callback_query.from_user.id,
+            chat_id=telegram_id,
             text=result_text,
             reply_markup=main_menu_kb
         )
     except Exception as e:
         await callback_query.bot.send_message(
-            chat_id=callback_query.from_user.id,
+            chat_id=telegram_id,
             text=f"⚠️ Ошибка сохранения: {str(e)[:100]}",
             reply_markup=main_menu_kb
         )
 
+def make_quality_keyboard(card_id: int) -> InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text="1 — Совсем не помнил", callback_data=f"review_q1_{card_id}")],
+        [types.InlineKeyboardButton(text="2 — С трудом", callback_data=f"review_q2_{card_id}")],
+        [types.InlineKeyboardButton(text="3 — Хорошо", callback_data=f"review_q3_{card_id}")],
+        [types.InlineKeyboardButton(text="4 — Отлично", callback_data=f"review_q4_{card_id}")],
+    ])
+
 @router.callback_query(lambda c: c.data.startswith("show_answer_"))
 async def process_show_answer_callback(callback_query: types.CallbackQuery):
     await callback_query.answer("Обрабатываю...")
     card_id = int(callback_query.data.split('_')[2])
-    card = await sync_to_async(Card.objects.get)(id=card_id)
-    telegram_user = await sync_to_async(TelegramUser.objects.get)(
-        telegram_id=callback_query.from_user.id
-    )
-    user_settings, _ = await sync_to_async(UserSettings.objects.get_or_create)(
-        user=telegram_user
-    )
+    session = review_sessions.get(callback_query.from_user.id)
+    if session and session.current and session.current.card_id == card_id:
+        # Карточка и озвучка уже в памяти сессии — без запросов к БД
+        card = session.current.card
+        translation_text = (
+            "💡 Перевод: **%s**\n\nОцените, насколько легко вы вспомнили:" % card.translation
+        )
+        await callback_query.message.answer(translation_text, reply_markup=make_quality_keyboard(card.id))
+        audio_path = await session.translation_audio(card.id)
+        if audio_path:
+            try:
+                await send_media(bot, callback_query.message.chat.id, 'voice', audio_path)
+            except Exception as e:
+                print(f"Ошибка озвучки: {e}")
+        return
+    card = await repository.get_card(card_id)
     lang = 'ru' if any('a' <= c <= 'z' for c in card.word.lower()) else 'en'
     translation_text = (
         "💡 Перевод: **%s**\n\nОцените, насколько легко вы вспомнили:" % card.translation
     )
-    quality_kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="1 — Совсем не помнил", callback_data=f"review_q1_{card.id}")],
-        [types.InlineKeyboardButton(text="2 — С трудом", callback_data=f"review_q2_{card.id}")],
-        [types.InlineKeyboardButton(text="3 — Хорошо", callback_data=f"review_q3_{card.id}")],
-        [types.InlineKeyboardButton(text="4 — Отлично", callback_data=f"review_q4_{card.id}")],
-    ])
-    await callback_query.message.answer(translation_text, reply_markup=quality_kb)
+    await callback_query.message.answer(translation_text, reply_markup=make_quality_keyboard(card.id))
     try:
-        gender = user_settings.voice_gender  # пока просто читаем; можно учитывать в synthesize_text_to_mp3
-        audio_path = synthesize_text_to_mp3(card.translation, lang=lang)
+        audio_path = await asyncio.to_thread(synthesize_text_to_mp3, card.translation, lang=lang)
         if os.path.exists(audio_path):
-            voice_file = FSInputFile(audio_path)
-            await callback_query.message.answer_voice(voice=voice_file)
-            os.remove(audio_path)
+            await send_media(bot, callback_query.message.chat.id, 'voice', audio_path)
     except Exception as e:
         print(f"Ошибка озвучки: {e}")
 
@@ -526,11 +594,9 @@ async def pronounce_callback(callback: types.CallbackQuery):
     text_to_speak = callback.data.split("_", 1)[1]
     try:
         lang = 'en' if any('a' <= c <= 'z' for c in text_to_speak.lower()) else 'ru'
-        audio_path = synthesize_text_to_mp3(text_to_speak, lang=lang)
+        audio_path = await asyncio.to_thread(synthesize_text_to_mp3, text_to_speak, lang=lang)
         if audio_path and os.path.exists(audio_path):
-            voice_file = types.FSInputFile(path=audio_path)
-            await callback.message.answer_voice(voice=voice_file, caption=f"🔊 {text_to_speak}")
-            os.remove(audio_path)
+            await send_media(bot, callback.message.chat.id, 'voice', audio_path, caption=f"🔊 {text_to_speak}")
             await callback.answer()
     except Exception as e:
         await callback.answer(f"Ошибка озвучки: {str(e)[:30]}", show_alert=True)
@@ -541,12 +607,8 @@ async def start_handler(message: Message):
     """Обработчик команды /start."""
     user_name = message.from_user.first_name or message.from_user.username or "Пользователь"
     try:
-        user, created = await sync_to_async(TelegramUser.objects.get_or_create)(
-            telegram_id=message.from_user.id,
-            defaults={
-                'username': message.from_user.username or user_name
-            }
-        )
+        # Регистрация заодно прогревает кэш пользователя и настроек
+        user, created = await register_user(message.from_user.id, message.from_user.username or user_name)
         if created:
             prefix = f"Привет, {user_name}! Добро пожаловать в VocabBot! 🎓\n\n"
         else:
@@ -574,16 +636,10 @@ async def start_handler(message: Message):
 @router.message(Command(commands=["settings"]))
 async def cmd_settings(message: Message):
     """Команда /settings — выбор голоса и ссылка на веб-настройки."""
-    try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(
-            telegram_id=message.from_user.id
-        )
-    except TelegramUser.DoesNotExist:
+    telegram_user, settings = await get_user_with_settings(message.from_user.id)
+    if telegram_user is None:
         await message.answer("Вы не зарегистрированы. Используйте /start.", reply_markup=main_menu_kb)
         return
-    settings, _ = await sync_to_async(UserSettings.objects.get_or_create)(
-        user=telegram_user
-    )
     kb = make_settings_keyboard(settings.voice_gender)
     text = (
         "⚙️ Настройки озвучки\n\n"
@@ -592,37 +648,20 @@ async def cmd_settings(message: Message):
     )
     await message.answer(text, reply_markup=kb)
 
-@router.message(Command(commands=["review"]))
-async def review_handler(message: Message):
-    """
-    Обработчик команды /review и кнопки 'Повторение'.
-    Показывает только слово, ответ скрыт за кнопкой.
-    """
-    try:
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=message.from_user.id)
-    except TelegramUser.DoesNotExist:
-        await message.answer("Вы не зарегистрированы. Используйте /start.", reply_markup=main_menu_kb)
-        return
-    due_repetitions = await sync_to_async(list)(
-        Repetition.objects.filter(
-            card__owner=telegram_user,
-            next_review__lte=timezone.now()
-        ).select_related('card').order_by('next_review')[:1]
-    )
-    if not due_repetitions:
-        await message.answer("Нет слов для повторения. Молодец!", reply_markup=main_menu_kb)
-        return
-    repetition = due_repetitions[0]
-    card = repetition.card
+async def send_review_card(message: Message, session: ReviewSession, header: str = ""):
+    """Показывает текущую карточку сессии: слово (с картинкой) и произношение."""
+    card = session.current.card
     show_kb = types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(text="👁 Показать перевод", callback_data=f"show_answer_{card.id}")]
     ])
-    caption = f"🧠 Повторение:\n\n📖 Переведите слово:\n\n**{card.word}**"
-    if card.image:
+    caption = f"🧠 Повторение ({session.remaining} в очереди):\n\n📖 Переведите слово:\n\n**{card.word}**"
+    if header:
+        caption = f"{header}\n\n{caption}"
+    assets = await session.assets(card.id)
+    if assets.photo:
         try:
-            photo = types.FSInputFile(path=card.image.path)
-            await message.answer_photo(
-                photo=photo,
+            await send_media(
+                bot, message.chat.id, 'photo', assets.photo,
                 caption=caption,
                 reply_markup=show_kb
             )
@@ -631,21 +670,37 @@ async def review_handler(message: Message):
             await message.answer(caption, reply_markup=show_kb)
     else:
         await message.answer(caption, reply_markup=show_kb)
-    try:
-        lang = 'ru' if any('а' <= c <= 'я' for c in card.word.lower()) else 'en'
-        audio_path = synthesize_text_to_mp3(card.word, lang=lang)
-        voice_file = types.FSInputFile(path=audio_path)
-        await message.answer_voice(voice=voice_file, caption="🔊 Произношение")
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-    except Exception as e:
-        print(f"Ошибка озвучки: {e}")
+    if assets.word_audio:
+        try:
+            await send_media(bot, message.chat.id, 'voice', assets.word_audio, caption="🔊 Произношение")
+        except Exception as e:
+            print(f"Ошибка озвучки: {e}")
+
+@router.message(Command(commands=["review"]))
+async def review_handler(message: Message):
+    """
+    Обработчик команды /review и кнопки 'Повторение'.
+    Загружает очередь карточек одним запросом и показывает первую;
+    ответ скрыт за кнопкой.
+    """
+    telegram_user = await get_user(message.from_user.id)
+    if telegram_user is None:
+        await message.answer("Вы не зарегистрированы. Используйте /start.", reply_markup=main_menu_kb)
+        return
+    # Новая сессия заменяет старую (её оценки сохраняются)
+    await end_session(message.from_user.id)
+    session = await ReviewSession.start(telegram_user)
+    if session.current is None:
+        await message.answer("Нет слов для повторения. Молодец!", reply_markup=main_menu_kb)
+        return
+    review_sessions[message.from_user.id] = session
+    await send_review_card(message, session)
 
 # ================== VOICE / TEXT HANDLERS ==================
 @router.message(lambda message: message.voice is not None)
 async def handle_voice_message(message: Message):
     """Обработка голосовых сообщений."""
-    user_state = user_states.get(message.from_user.id)
+    user_state = await state_store.get(message.from_user.id)
     valid_states = ["waiting_for_word"]
     valid_dict_states = ["waiting_for_answer", "waiting_for_review_answer"]
     is_valid = user_state in valid_states or (
@@ -674,7 +729,7 @@ async def handle_voice_message(message: Message):
             os.remove(temp_path)
         await processing_msg.edit_text(f"✅ Распознано: **{recognized_text}**")
         if user_state == "waiting_for_word":
-            user_states.pop(message.from_user.id, None)
+            await state_store.pop(message.from_user.id)
             await handle_word_input(message, recognized_text)
         elif isinstance(user_state, dict) and user_state.get("state") in ["waiting_for_answer", "waiting_for_review_answer"]:
             await handle_quiz_answer(message, recognized_text)
@@ -691,9 +746,9 @@ async def handle_message(message: Message):
         await message.answer("Пожалуйста, отправьте текстовое сообщение.", reply_markup=main_menu_kb)
         return
     text = message.text.strip()
-    user_state = user_states.get(message.from_user.id)
+    user_state = await state_store.get(message.from_user.id)
     if user_state == "waiting_for_word":
-        user_states.pop(message.from_user.id, None)
+        await state_store.pop(message.from_user.id)
         await handle_word_input(message, text)
         return
     elif isinstance(user_state, dict) and user_state.get("state") == "waiting_for_answer":
@@ -713,12 +768,35 @@ async def handle_message(message: Message):
 
 # ================== MAIN ==================
 async def main():
-    print("🤖 Bot is starting...")
+    # BOT_MODE=polling (разработка, один процесс) или webhook (несколько процессов за балансировщиком)
+    mode = os.getenv('BOT_MODE', 'polling')
+    print(f"🤖 Bot is starting ({mode})...")
+    stats_task = asyncio.create_task(send_scheduler.report_stats())
+    providers_task = asyncio.create_task(report_provider_stats())
+    sweep_task = asyncio.create_task(sweep_sessions())
     try:
-        await dp.start_polling(bot, skip_updates=True)
+        if mode == 'webhook':
+            await run_webhook(dp, bot)
+        else:
+            # getUpdates не работает при активном webhook; накопленные обновления сохраняем
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
     except asyncio.CancelledError:
-        print("⚠️ Polling cancelled.")
+        print("⚠️ Bot cancelled.")
         return
+    finally:
+        stats_task.cancel()
+        providers_task.cancel()
+        sweep_task.cancel()
+        await shutdown()
+
+
+async def shutdown():
+    """Завершение процесса бота (и воркера супервизора)."""
+    # Не теряем оценки, накопленные в незавершённых сессиях повторения
+    for telegram_id in list(review_sessions):
+        await end_session(telegram_id)
+    await state_store.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
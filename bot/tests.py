@@ -0,0 +1,395 @@
+# bot/tests.py
+import asyncio
+import os
+import tempfile
+import time
+import types
+from datetime import timedelta
+from unittest import mock
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+
+from bot import media, review_session
+from bot.review_session import ReviewAssets, ReviewSession, review_sessions, sweep_sessions
+from bot.send_scheduler import SendScheduler, TokenBucket
+from bot.state_store import MemoryStateStore, SQLiteStateStore, make_state_store
+from vocab.models import Card, Repetition, TelegramUser
+from vocab.scheduling import SM2Params
+from words.models import Word
+
+
+class TokenBucketTests(SimpleTestCase):
+    async def test_capacity_below_one_token_does_not_hang(self):
+        # Доля воркера при большом числе процессов: 30 / 31 сообщения в секунду
+        bucket = TokenBucket(rate=30 / 31, capacity=30 / 31)
+        self.assertEqual(bucket.capacity, 1.0)
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), timeout=0.5)
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    async def test_fractional_rate_spacing(self):
+        bucket = TokenBucket(rate=12.5, capacity=0.5)
+        await bucket.acquire()
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+        # Два токена по 1 / 12.5 = 0.08 с
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    async def test_burst_up_to_capacity(self):
+        bucket = TokenBucket(rate=1.5, capacity=3.5)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertAlmostEqual(bucket.tokens, 0.5, delta=0.05)
+
+    def test_time_to_full(self):
+        bucket = TokenBucket(rate=0.5, capacity=2)
+        bucket.tokens = 1
+        self.assertAlmostEqual(bucket.time_to_full(), 2, delta=0.05)
+
+
+class FakeTelegram:
+    """make_request для SendScheduler: запоминает (chat_id, text, время отправки)."""
+
+    def __init__(self, delays=None, flood=None):
+        self.sent = []
+        self.delays = delays or {}
+        self.flood = dict(flood or {})  # text -> сколько раз ответить 429
+
+    async def __call__(self, bot, method):
+        await asyncio.sleep(self.delays.get(method.text, 0))
+        if self.flood.get(method.text):
+            self.flood[method.text] -= 1
+            raise TelegramRetryAfter(method, 'Flood control exceeded', retry_after=1)
+        self.sent.append((getattr(method, 'chat_id', None), method.text, time.monotonic()))
+        return method.text
+
+
+def message(chat_id, text):
+    return types.SimpleNamespace(chat_id=chat_id, text=text)
+
+
+class SendSchedulerTests(SimpleTestCase):
+    async def test_per_chat_order_kept(self):
+        telegram = FakeTelegram(delays={'a1': 0.05, 'a3': 0.02})
+        scheduler = SendScheduler(chat_rate=100, chat_burst=5)
+        texts = ['a1', 'a2', 'a3', 'a4']
+        results = await asyncio.gather(
+            *(scheduler(telegram, None, message(1, text)) for text in texts),
+            scheduler(telegram, None, message(2, 'b1')),
+        )
+
+        self.assertEqual(results, texts + ['b1'])
+        self.assertEqual([text for chat, text, _ in telegram.sent if chat == 1], texts)
+        # Другой чат не ждёт медленную первую отправку первого
+        self.assertEqual(telegram.sent[0][1], 'b1')
+
+    async def test_burst_not_delayed_by_idle_worker(self):
+        telegram = FakeTelegram()
+        scheduler = SendScheduler()  # CHAT_BURST = 3 сообщения подряд
+        started = time.monotonic()
+        await scheduler(telegram, None, message(1, 'first'))
+        # Воркер чата ещё жив и ждёт пополнения bucket — новые сообщения должны его будить
+        await asyncio.sleep(0.1)
+        await asyncio.gather(scheduler(telegram, None, message(1, 'second')),
+                             scheduler(telegram, None, message(1, 'third')))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual([text for _, text, _ in telegram.sent], ['first', 'second', 'third'])
+
+    async def test_rate_applies_after_burst(self):
+        telegram = FakeTelegram()
+        scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+        await asyncio.gather(*(scheduler(telegram, None, message(1, str(i))) for i in range(3)))
+
+        times = [t for *_, t in telegram.sent]
+        self.assertGreaterEqual(times[2] - times[0], 0.09)
+
+    async def test_retry_after_pauses_chat_and_retries(self):
+        telegram = FakeTelegram(flood={'x': 1})
+        scheduler = SendScheduler(chat_rate=100)
+        started = time.monotonic()
+        result = await scheduler(telegram, None, message(1, 'x'))
+
+        self.assertEqual(result, 'x')
+        self.assertGreaterEqual(time.monotonic() - started, 0.95)
+        self.assertEqual(scheduler.stats()['retried'], 1)
+        self.assertEqual(scheduler.stats()['sent'], 1)
+
+    async def test_retry_after_gives_up_after_max_retries(self):
+        telegram = FakeTelegram(flood={'x': 5})
+        scheduler = SendScheduler(chat_rate=100, max_retries=0)
+        # Не assertRaises: он чистит кадры traceback, а в нём приостановленный воркер чата
+        try:
+            await scheduler(telegram, None, message(1, 'x'))
+        except TelegramRetryAfter:
+            pass
+        else:
+            self.fail("TelegramRetryAfter not raised")
+        self.assertEqual(scheduler.stats()['failed'], 1)
+
+    async def test_requests_without_chat_pass_through(self):
+        telegram = FakeTelegram()
+        scheduler = SendScheduler()
+        result = await scheduler(telegram, None, types.SimpleNamespace(text='get_me'))
+
+        self.assertEqual(result, 'get_me')
+        self.assertEqual(scheduler.stats()['active_chats'], 0)
+
+
+async def no_assets(card):
+    return ReviewAssets()
+
+
+async def no_audio(card):
+    return None
+
+
+@mock.patch.object(review_session, '_load_assets', no_assets)
+@mock.patch.object(review_session, '_load_translation_audio', no_audio)
+class ReviewSessionTests(TransactionTestCase):
+    # Оценки пишутся в потоке (repository.apply_grades) — нужен закоммиченный тестовый набор
+    def setUp(self):
+        self.user = TelegramUser.objects.create(telegram_id='2001', username='reviewer')
+        self.cards = [Card.objects.create(owner=self.user, word=f"w{i}", translation=f"с{i}") for i in range(3)]
+        self.repetitions = list(Repetition.objects.select_related('card').filter(owner=self.user).order_by('card_id'))
+
+    def tearDown(self):
+        review_sessions.clear()
+
+    def make_session(self):
+        return ReviewSession(self.user, self.repetitions, {self.user.id: SM2Params()})
+
+    async def test_grade_of_non_current_card_goes_through_session(self):
+        session = self.make_session()
+        third = self.cards[2].id
+        repetition = await session.grade(third, 4)
+
+        self.assertEqual(repetition.card_id, third)
+        self.assertEqual([r.card_id for r in session.queue], [c.id for c in self.cards[:2]])
+        self.assertEqual(len(session.pending), 1)
+
+    async def test_card_assets_do_not_wait_for_translation_audio(self):
+        async def slow_audio(card):
+            await asyncio.sleep(0.5)
+            return f"{card.translation}.mp3"
+
+        with mock.patch.object(review_session, '_load_translation_audio', slow_audio):
+            session = self.make_session()
+            session.prefetch()
+            card = session.current.card
+            await asyncio.wait_for(session.assets(card.id), timeout=0.2)
+            self.assertEqual(await session.translation_audio(card.id), f"{card.translation}.mp3")
+        await session.close()
+
+    async def test_idle_session_flushed_then_closed(self):
+        session = self.make_session()
+        review_sessions[2001] = session
+        await session.grade(self.cards[0].id, 4)
+        sweeper = asyncio.create_task(sweep_sessions(interval=0.01))
+        try:
+            with mock.patch.object(review_session, 'SESSION_IDLE_FLUSH', 0):
+                await asyncio.sleep(0.3)
+            saved = await Repetition.objects.aget(card_id=self.cards[0].id)
+            self.assertEqual(saved.review_count, 1)
+            self.assertEqual(session.pending, [])
+            self.assertIn(2001, review_sessions)
+
+            with mock.patch.object(review_session, 'SESSION_IDLE_TIMEOUT', 0):
+                await asyncio.sleep(0.1)
+            self.assertNotIn(2001, review_sessions)
+        finally:
+            sweeper.cancel()
+
+    async def test_flush_skips_grade_older_than_concurrent_review(self):
+        session = self.make_session()
+        card_id = self.cards[0].id
+        await session.grade(card_id, 5)
+        # Тем временем карточку повторили на сайте
+        later = timezone.now() + timedelta(minutes=1)
+        await Repetition.objects.filter(card_id=card_id).aupdate(updated=later, review_count=7)
+        await session.flush()
+
+        saved = await Repetition.objects.aget(card_id=card_id)
+        self.assertEqual(saved.review_count, 7)
+        self.assertEqual(saved.updated, later)
+        self.assertEqual(session.pending, [])
+
+    async def test_failed_flush_keeps_grades(self):
+        session = self.make_session()
+        await session.grade(self.cards[0].id, 4)
+        broken = mock.AsyncMock(side_effect=RuntimeError('db down'))
+        with mock.patch.object(review_session, 'FLUSH_BACKOFF', 0), \
+                mock.patch.object(review_session.repository, 'apply_grades', broken):
+            await session.flush()
+        self.assertEqual([g['card_id'] for g in session.pending], [self.cards[0].id])
+
+        await session.close()
+        saved = await Repetition.objects.aget(card_id=self.cards[0].id)
+        self.assertEqual(saved.review_count, 1)
+
+
+class SendMediaTests(SimpleTestCase):
+    def setUp(self):
+        self.forget = mock.AsyncMock()
+        for name, patch in (('get_file_id', mock.AsyncMock(return_value='cached-id')),
+                            ('forget_file_id', self.forget),
+                            ('remember_file_id', mock.AsyncMock())):
+            patcher = mock.patch.object(media, name, patch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def telegram(self, error):
+        uploaded = types.SimpleNamespace(photo=[types.SimpleNamespace(file_id='new-id')], voice=None)
+
+        async def send_photo(chat_id, photo, **kwargs):
+            if photo == 'cached-id':
+                raise TelegramBadRequest(None, error)
+            return uploaded
+        return types.SimpleNamespace(id=1, send_photo=send_photo), uploaded
+
+    async def test_rejected_file_id_forgotten_and_file_uploaded(self):
+        bot, uploaded = self.telegram('Bad Request: wrong file identifier/HTTP URL specified')
+        result = await media.send_media(bot, 1, 'photo', __file__)
+
+        self.assertIs(result, uploaded)
+        self.forget.assert_awaited_once()
+
+    async def test_other_bad_request_keeps_file_id(self):
+        bot, _ = self.telegram("Bad Request: can't parse entities: unsupported start tag")
+        with self.assertRaises(TelegramBadRequest):
+            await media.send_media(bot, 1, 'photo', __file__, caption='<b', parse_mode='HTML')
+        self.forget.assert_not_awaited()
+
+
+def import_telegram_bot():
+    # Модуль бота при импорте требует токен и создаёт хранилище состояний
+    with mock.patch.dict(os.environ, {'BOT_TOKEN': '123456:TEST', 'BOT_STATE_STORE': 'memory'}):
+        from bot import telegram_bot
+    return telegram_bot
+
+
+class StartQuizTests(SimpleTestCase):
+    def setUp(self):
+        self.telegram_bot = import_telegram_bot()
+        self.send_media = mock.AsyncMock()
+        patches = {
+            'bot': mock.Mock(send_message=mock.AsyncMock()),
+            'get_user': mock.AsyncMock(return_value=types.SimpleNamespace(id=1)),
+            'state_store': MemoryStateStore(),
+            'send_media': self.send_media,
+            'synthesize_text_to_mp3': mock.Mock(side_effect=RuntimeError('TTS down')),
+        }
+        for name, value in patches.items():
+            patcher = mock.patch.object(self.telegram_bot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.message = types.SimpleNamespace(
+            from_user=types.SimpleNamespace(id=7), chat=types.SimpleNamespace(id=7), answer=mock.AsyncMock(),
+        )
+
+    async def start_quiz(self, word):
+        with mock.patch.object(self.telegram_bot.repository, 'quiz_words', mock.AsyncMock(return_value=[word])):
+            await self.telegram_bot.start_quiz(self.message)
+
+    async def test_word_image_sent_when_tts_fails(self):
+        await self.start_quiz(Word(text='cat', translation='кошка', image='words/cat.jpg'))
+
+        self.send_media.assert_awaited_once_with(
+            self.telegram_bot.bot, 7, 'photo', self.telegram_bot.telegram_image_path('words/cat.jpg'), caption='cat',
+        )
+        self.message.answer.assert_not_awaited()
+
+    async def test_word_text_sent_when_tts_fails_without_image(self):
+        await self.start_quiz(Word(text='cat', translation='кошка'))
+
+        self.send_media.assert_not_awaited()
+        self.message.answer.assert_awaited_once_with('cat')
+
+
+class StateStoreContract:
+    """Общие проверки реализаций StateStore; make_store задаёт подкласс."""
+
+    def make_store(self, **kwargs):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    async def test_round_trip(self):
+        state = {'state': 'waiting_for_answer', 'word': 'ёж', 'attempts': [1, 2]}
+        self.assertEqual(await self.store.get(1, 'missing'), 'missing')
+        await self.store.set(1, state)
+        await self.store.set(2, 'waiting_for_word')
+
+        self.assertEqual(await self.store.get(1), state)
+        self.assertEqual(await self.store.get(2), 'waiting_for_word')
+
+    async def test_set_overwrites(self):
+        await self.store.set(1, {'step': 1})
+        await self.store.set(1, {'step': 2})
+        self.assertEqual(await self.store.get(1), {'step': 2})
+
+    async def test_pop_takes_state_once(self):
+        await self.store.set(1, {'state': 'waiting_for_answer'})
+        self.assertEqual(await self.store.pop(1), {'state': 'waiting_for_answer'})
+        self.assertEqual(await self.store.pop(1, {}), {})
+        self.assertIsNone(await self.store.get(1))
+
+    async def test_expired_state_forgotten(self):
+        await self.store.set(1, 'short', ttl=0.05)
+        await self.store.set(2, 'long')
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(await self.store.get(1, 'gone'), 'gone')
+        self.assertEqual(await self.store.pop(1, 'gone'), 'gone')
+        self.assertEqual(await self.store.get(2), 'long')
+
+    async def test_concurrent_pop_single_winner(self):
+        await self.store.set(1, 'answer')
+        results = await asyncio.gather(*(self.store.pop(1) for _ in range(5)))
+        self.assertEqual([r for r in results if r is not None], ['answer'])
+
+
+class MemoryStateStoreTests(StateStoreContract, SimpleTestCase):
+    def make_store(self, **kwargs):
+        return MemoryStateStore(**kwargs)
+
+    async def test_least_recently_used_evicted(self):
+        store = self.make_store(maxsize=2)
+        await store.set(1, 'a')
+        await store.set(2, 'b')
+        await store.get(1)
+        await store.set(3, 'c')
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(await store.get(2))
+        self.assertEqual(await store.get(1), 'a')
+
+
+class SQLiteStateStoreTests(StateStoreContract, SimpleTestCase):
+    def make_store(self, **kwargs):
+        if not hasattr(self, 'path'):
+            tmp = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp.cleanup)
+            self.path = os.path.join(tmp.name, 'state.sqlite3')
+        return SQLiteStateStore(self.path, **kwargs)
+
+    async def test_state_survives_reopen(self):
+        await self.store.set(1, {'state': 'waiting_for_word'})
+        await self.store.close()
+
+        reopened = self.make_store()
+        self.assertEqual(await reopened.pop(1), {'state': 'waiting_for_word'})
+        await reopened.close()
+
+    async def test_made_from_url(self):
+        store = make_state_store(f"sqlite:///{self.path}")
+        self.assertIsInstance(store, SQLiteStateStore)
+        await store.set(1, 'via url')
+        self.assertEqual(await self.store.get(1), 'via url')
+        self.assertIsInstance(make_state_store('memory'), MemoryStateStore)
@@ -0,0 +1,54 @@
+# bot/user_cache.py
+"""
+Асинхронный доступ бота к TelegramUser и UserSettings по telegram_id.
+
+Попадание в кэш (vocab/cache.py) обходится без запроса к БД, на промахе
+— один запрос через bot/repository.py. /start прогревает кэш, сигналы
+моделей сбрасывают его при изменениях в этом же процессе. Сайт и
+админка работают в других процессах: их изменения бот видит не позже
+TTL (USER_SETTINGS_CACHE_TTL / TELEGRAM_USER_CACHE_TTL, 30 секунд).
+"""
+from bot import repository
+from vocab.cache import telegram_user_cache, user_settings_cache
+
+
+async def get_user(telegram_id):
+    """TelegramUser или None, если пользователь не зарегистрирован."""
+    key = str(telegram_id)
+    user = telegram_user_cache.get(key)
+    if user is None:
+        user = await repository.fetch_user(telegram_id)
+        if user is not None:
+            telegram_user_cache.set(key, user)
+    return user
+
+
+async def get_settings(user_id: int):
+    """UserSettings для TelegramUser.id (создаются при первом обращении)."""
+    settings = user_settings_cache.get(user_id)
+    if settings is None:
+        settings = await repository.fetch_settings(user_id)
+        user_settings_cache.set(user_id, settings)
+    return settings
+
+
+async def get_user_with_settings(telegram_id):
+    """(TelegramUser, UserSettings); (None, None) — не зарегистрирован."""
+    user = await get_user(telegram_id)
+    if user is None:
+        return None, None
+    return user, await get_settings(user.id)
+
+
+async def register_user(telegram_id, username):
+    """Регистрация по /start: (TelegramUser, created), кэш прогревается."""
+    user, created = await repository.get_or_create_user(telegram_id, username)
+    telegram_user_cache.set(str(telegram_id), user)
+    await get_settings(user.id)
+    return user, created
+
+
+async def save_settings(settings, *fields):
+    """Сохраняет настройки и оставляет в кэше актуальный объект."""
+    await repository.save_settings(settings, *fields)
+    user_settings_cache.set(settings.user_id, settings)
@@ -1,34 +1,127 @@
 # bot/voice.py
+"""
+Озвучка через gTTS с общим дисковым кэшем.
+
+Файл кэша адресуется хэшем (text, lang, tld, slow), поэтому веб и бот
+находят одну и ту же запись. Запись атомарная (временный файл +
+os.replace), при превышении TTS_CACHE_MAX_BYTES удаляются файлы,
+к которым дольше всего не обращались (mtime обновляется при попадании).
+"""
+import hashlib
+import json
+import os
 import tempfile
+import threading
 import time
+from pathlib import Path
+
+from django.conf import settings
 from gtts import gTTS
 
+from bot.resilience import tts_provider
+
+EVICT_INTERVAL = 60  # не чаще раза в минуту обходим кэш для вытеснения
+
+_evict_lock = threading.Lock()
+_last_evict = 0.0
+
+
+def tts_cache_dir() -> Path:
+    return Path(getattr(settings, 'TTS_CACHE_DIR', Path(settings.BASE_DIR) / 'tts_cache'))
+
+
+def tts_cache_key(text: str, lang: str = "en", tld: str = "com", slow: bool = False) -> str:
+    payload = json.dumps([text, lang, tld, bool(slow)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def tts_cache_path(key: str) -> Path:
+    # Шардирование по первым символам хэша, чтобы не держать все файлы в одном каталоге
+    return tts_cache_dir() / key[:2] / key[2:4] / f"{key}.mp3"
+
+
 def synthesize_text_to_mp3(
     text: str,
     lang: str = "en",
     tld: str = "com",
     slow: bool = False,
-    retries: int = 2,
-    delay: float = 1.5,
 ) -> str:
     """
-    Генерирует MP3-файл озвучки текста и возвращает путь к файлу.
-    Делает несколько попыток при сетевых ошибках.
+    Возвращает путь к MP3-файлу озвучки текста из кэша, при промахе
+    генерирует его через gTTS (tts_provider: таймаут, hedged-повтор,
+    при деградации — сразу ProviderUnavailable).
+    Файл принадлежит кэшу — удалять его после отправки не нужно.
     """
-    last_err = None
-    for attempt in range(retries + 1):
+    path = tts_cache_path(tts_cache_key(text, lang, tld, slow))
+    try:
+        os.utime(path)  # попадание: отмечаем использование для LRU
+        return str(path)
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        tts_provider.call(_write_tts, text, lang, tld, slow, path)
+    except Exception as e:
+        # Лёгкий лог в консоль, чтобы видеть, что была ошибка
+        print(f"TTS error: {e}")
+        raise
+    _maybe_evict()
+    return str(path)
+
+
+def _write_tts(text: str, lang: str, tld: str, slow: bool, path: Path):
+    """
+    Одна попытка синтеза: пишет во временный файл и атомарно переносит в кэш.
+    У каждой (в том числе hedged) попытки свой временный файл.
+    """
+    tmp_name = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".part", delete=False) as tf:
+            tmp_name = tf.name
+            gTTS(text=text, lang=lang, tld=tld, slow=slow).write_to_fp(tf)
+        os.replace(tmp_name, path)
+    finally:
+        if tmp_name and os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+def _maybe_evict():
+    global _last_evict
+    now = time.monotonic()
+    if now - _last_evict < EVICT_INTERVAL or not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_evict = now
+        evict_tts_cache(getattr(settings, 'TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    finally:
+        _evict_lock.release()
+
+
+def evict_tts_cache(max_bytes: int) -> int:
+    """Удаляет давно не использованные файлы, пока кэш больше max_bytes. Возвращает число удалённых."""
+    entries = []
+    total = 0
+    for path in tts_cache_dir().glob('*/*/*.mp3'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
         try:
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tf:
-                tts = gTTS(text=text, lang=lang, tld=tld, slow=slow)
-                tts.save(tf.name)
-                return tf.name
-        except Exception as e:
-            last_err = e
-            # Лёгкий лог в консоль, чтобы видеть, что была ошибка и ретрай
-            print(f"TTS error on attempt {attempt + 1}: {e}")
-            time.sleep(delay)
-    # Если все попытки не удались — отдадим ошибку наверх
-    raise last_err
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
 
 # Доступные акценты (по сути "голоса" gTTS) для разных языков.
 VOICE_OPTIONS = {
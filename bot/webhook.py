@@ -0,0 +1,234 @@
+# bot/webhook.py
+"""
+Режим webhook: aiohttp-приложение принимает обновления от Telegram.
+
+Запрос обрабатывается так:
+  1. проверяется секрет (X-Telegram-Bot-Api-Secret-Token);
+  2. повтор update_id отбрасывается (Telegram повторяет доставку при
+     таймауте или ошибке; за балансировщиком повтор может прийти в
+     другой процесс — тогда нужен общий Redis-дедупликатор);
+  3. обновление кладётся в ограниченную очередь и Telegram сразу
+     получает 200. Если очередь полна — 503, Telegram повторит позже;
+  4. пул воркеров разбирает очереди через dp.feed_update. У каждого
+     воркера своя очередь, обновления одного пользователя всегда идут
+     в одну и ту же — порядок внутри диалога сохраняется.
+При остановке воркеры дорабатывают очередь (graceful drain).
+
+Доставка — не больше одного раза: Telegram получил 200 ещё до разбора,
+поэтому обновление, на котором упал обработчик (или которое не успели
+разобрать за DRAIN_TIMEOUT), повторно не придёт. Отметку дедупликатора
+в этом случае снимать бессмысленно — её некому использовать; такие
+обновления считаются в failed и пишутся в лог. Обработчик, которому
+нужна гарантия, сохраняет результат сам и отвечает пользователю об
+ошибке (как process_review_quality).
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+
+from aiogram.types import Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+DEDUPE_WINDOW = 10000     # сколько последних update_id помним в памяти
+DEDUPE_TTL = 3600         # секунд для Redis
+DRAIN_TIMEOUT = 30        # сколько ждём разбор очереди при остановке
+
+
+class MemoryDeduplicator:
+    """Последние DEDUPE_WINDOW update_id в памяти процесса."""
+
+    def __init__(self, window: int = DEDUPE_WINDOW):
+        self._order = deque()
+        self._seen = set()
+        self.window = window
+
+    async def claim(self, update_id: int) -> bool:
+        """True — обновление новое и теперь закреплено за нами."""
+        if update_id in self._seen:
+            return False
+        self._seen.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.window:
+            self._seen.discard(self._order.popleft())
+        return True
+
+    async def release(self, update_id: int):
+        """Снять отметку (обновление не принято, Telegram пришлёт его снова)."""
+        self._seen.discard(update_id)
+
+    async def close(self):
+        pass
+
+
+class RedisDeduplicator:
+    """update_id в Redis (SET NX EX) — общий для всех процессов за балансировщиком."""
+
+    def __init__(self, url: str, ttl: int = DEDUPE_TTL, prefix: str = 'bot_update:'):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def claim(self, update_id: int) -> bool:
+        return bool(await self.redis.set(f"{self.prefix}{update_id}", 1, nx=True, ex=self.ttl))
+
+    async def release(self, update_id: int):
+        await self.redis.delete(f"{self.prefix}{update_id}")
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def routing_key(data: dict) -> int:
+    """id пользователя из обновления (message, callback_query, ...), иначе update_id."""
+    for value in data.values():
+        if isinstance(value, dict):
+            sender = value.get('from') or value.get('chat') or {}
+            if isinstance(sender, dict) and 'id' in sender:
+                return int(sender['id'])
+    return int(data['update_id'])
+
+
+class WebhookServer:
+    def __init__(self, dp, bot, secret: str | None = None, queue_size: int = 1000,
+                 workers: int = 8, deduplicator=None):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.queues = [asyncio.Queue(maxsize=max(queue_size // workers, 1)) for _ in range(workers)]
+        self.deduplicator = deduplicator or MemoryDeduplicator()
+        self._workers: list[asyncio.Task] = []
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and request.headers.get(SECRET_HEADER) != self.secret:
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+            update_id = int(data['update_id'])
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+
+        self.received += 1
+        queue = self.queues[routing_key(data) % len(self.queues)]
+        if queue.full():
+            # Не отмечаем как полученное — Telegram доставит его повторно
+            self.rejected += 1
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        if not await self.deduplicator.claim(update_id):
+            self.duplicates += 1
+            return web.Response()
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            await self.deduplicator.release(update_id)
+            self.rejected += 1
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        return web.Response()
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            data = await queue.get()
+            try:
+                update = Update.model_validate(data, context={'bot': self.bot})
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception:
+                # Telegram уже получил 200 — обновление потеряно (см. docstring модуля)
+                self.failed += 1
+                logger.exception("Update %s failed and will not be redelivered", data.get('update_id'))
+            finally:
+                queue.task_done()
+
+    async def start_workers(self, app=None):
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    async def drain(self, app=None):
+        """Дорабатывает принятые обновления и останавливает воркеры."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook drain timed out, %s updates dropped", self.stats()['queued'])
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self.deduplicator.close()
+
+    def stats(self) -> dict:
+        return {
+            'queued': sum(q.qsize() for q in self.queues),
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+
+    def make_app(self, path: str) -> web.Application:
+        app = web.Application()
+        app.router.add_post(path, self.handle_update)
+        app.router.add_get('/healthz', self.health)
+        app.on_startup.append(self.start_workers)
+        app.on_shutdown.append(self.drain)
+        return app
+
+
+async def run_webhook(dp, bot):
+    """
+    Запускает webhook-сервер по переменным окружения:
+      WEBHOOK_BASE_URL    — публичный адрес (https://bot.example.com), обязателен;
+      WEBHOOK_PATH        — путь (/telegram/webhook);
+      WEBHOOK_SECRET      — секрет для заголовка Telegram;
+      WEBHOOK_HOST/PORT   — где слушать (0.0.0.0:8080);
+      WEBHOOK_QUEUE_SIZE  — размер очереди обновлений (1000);
+      WEBHOOK_WORKERS     — число воркеров (8);
+      WEBHOOK_DEDUPE_REDIS — Redis для общей дедупликации между процессами.
+    Регистрацию webhook выполняет процесс с WEBHOOK_REGISTER=1 (по умолчанию да).
+    """
+    base_url = os.getenv('WEBHOOK_BASE_URL')
+    if not base_url:
+        raise ValueError("WEBHOOK_BASE_URL не задан")
+    path = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    secret = os.getenv('WEBHOOK_SECRET') or None
+    redis_url = os.getenv('WEBHOOK_DEDUPE_REDIS')
+
+    server = WebhookServer(
+        dp, bot,
+        secret=secret,
+        queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000)),
+        workers=int(os.getenv('WEBHOOK_WORKERS', 8)),
+        deduplicator=RedisDeduplicator(redis_url) if redis_url else MemoryDeduplicator(),
+    )
+    app = server.make_app(path)
+
+    if os.getenv('WEBHOOK_REGISTER', '1') == '1':
+        # Накопившиеся обновления не сбрасываем — их доставят на webhook
+        await bot.set_webhook(
+            base_url.rstrip('/') + path,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False,
+        )
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, os.getenv('WEBHOOK_HOST', '0.0.0.0'), int(os.getenv('WEBHOOK_PORT', 8080)))
+    await site.start()
+    logger.info("Webhook server listening, path %s", path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        logger.info("Webhook server stopped: %s", server.stats())
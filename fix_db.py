@@ -22,13 +22,15 @@ def fix():
 
         # Присваиваем ВСЕ карточки в базе вам
         total_cards = Card.objects.all().update(owner=tg_user)
+        # update() не вызывает сигналы — денормализованного владельца правим сами
+        Repetition.objects.all().update(owner=tg_user)
 
         # Создаем записи о повторении для каждой карточки, если их нет
         created_reps = 0
         for card in Card.objects.all():
             _, created = Repetition.objects.get_or_create(
                 card=card,
-                defaults={'next_review': timezone.now()}
+                defaults={'owner': tg_user, 'next_review': timezone.now()}
             )
             if created:
                 created_reps += 1
@@ -1,7 +1,8 @@
 # vocab/admin.py
 from django.contrib import admin
+from django.db import transaction
 from words.models import Word
-from .models import TelegramUser, Card, Repetition, UserSettings
+from .models import TelegramUser, Card, Repetition, UserSettings, CachedTranslation, TelegramFile, ImageAsset
 
 # Регистрируем модели
 @admin.register(TelegramUser)
@@ -14,6 +15,14 @@ class WordAdmin(admin.ModelAdmin):
     list_display = ['id', 'text', 'translation', 'user']
     list_filter = ['user']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change and obj.user_id:
+            # Тот же путь, что у ingest_word: карточка + картинка в фоне
+            from words.services import enqueue_word_image, ensure_card
+            ensure_card(obj)
+            transaction.on_commit(lambda: enqueue_word_image(obj.id))
+
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
     list_display = ['id', 'word', 'translation', 'owner', 'difficulty']
@@ -26,4 +35,21 @@ class RepetitionAdmin(admin.ModelAdmin):
 
 @admin.register(UserSettings)
 class UserSettingsAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'first_interval', 'voice_gender']
\ No newline at end of file
+    list_display = ['id', 'user', 'first_interval', 'voice_gender']
+
+@admin.register(CachedTranslation)
+class CachedTranslationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'text', 'translation', 'source_lang', 'target_lang', 'hits', 'created']
+    search_fields = ['text', 'translation']
+
+
+@admin.register(TelegramFile)
+class TelegramFileAdmin(admin.ModelAdmin):
+    list_display = ['id', 'bot_id', 'media_key', 'file_id', 'updated']
+    search_fields = ['media_key']
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ['id', 'prompt', 'file', 'ref_count', 'created']
+    search_fields = ['prompt']
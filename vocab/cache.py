@@ -0,0 +1,122 @@
+# vocab/cache.py
+"""
+Процессные кэши с ограничением по времени жизни (TTL) и размеру (LRU).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с TTL.
+    Записи старше ttl секунд считаются отсутствующими, при переполнении
+    вытесняется давно не использованная запись.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+# === КЭШ НАСТРОЕК ПОЛЬЗОВАТЕЛЯ ===
+
+user_settings_cache = TTLCache(
+    maxsize=getattr(settings, 'USER_SETTINGS_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'USER_SETTINGS_CACHE_TTL', 30),
+)
+
+
+def get_user_settings(user_id: int):
+    """UserSettings для TelegramUser.id: из кэша, иначе из БД (с созданием)."""
+    return get_user_settings_many([user_id])[user_id]
+
+
+def get_user_settings_many(user_ids) -> dict:
+    """
+    UserSettings для набора TelegramUser.id.
+    Промахи читаются одним запросом, отсутствующие настройки создаются пачкой.
+    """
+    from vocab.models import UserSettings
+
+    result = {}
+    missing_ids = set()
+    for user_id in set(user_ids):
+        cached = user_settings_cache.get(user_id)
+        if cached is None:
+            missing_ids.add(user_id)
+        else:
+            result[user_id] = cached
+
+    if missing_ids:
+        found = {s.user_id: s for s in UserSettings.objects.filter(user_id__in=missing_ids)}
+        new = [UserSettings(user_id=user_id) for user_id in missing_ids if user_id not in found]
+        if new:
+            UserSettings.objects.bulk_create(new, ignore_conflicts=True)
+            # С ignore_conflicts pk не заполняется — перечитываем, чтобы объекты можно было сохранять
+            found.update({
+                s.user_id: s for s in UserSettings.objects.filter(user_id__in=[n.user_id for n in new])
+            })
+        for user_id, settings_obj in found.items():
+            user_settings_cache.set(user_id, settings_obj)
+        result.update(found)
+    return result
+
+
+def invalidate_user_settings(user_id: int):
+    user_settings_cache.pop(user_id)
+
+
+# === КЭШ ПОЛЬЗОВАТЕЛЕЙ TELEGRAM ===
+
+telegram_user_cache = TTLCache(
+    maxsize=getattr(settings, 'TELEGRAM_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TELEGRAM_USER_CACHE_TTL', 30),
+)
+
+
+def invalidate_telegram_user(telegram_id):
+    telegram_user_cache.pop(str(telegram_id))
@@ -0,0 +1,251 @@
+# vocab/image_store.py
+"""
+Общее хранилище картинок слов.
+
+Картинка ищется по нормализованному промпту (слово + перевод), поэтому
+одно и то же слово у разных пользователей запрашивается в Pollinations
+один раз. Файл лежит по хэшу содержимого в шардированных каталогах
+(images/ab/cd/<sha256>.jpg); Word и Card ссылаются на ImageAsset, а
+ref_count считает эти ссылки. Когда ссылок не остаётся, запись
+удаляется, а файл — позже, сборщиком мусора (collect_garbage, задача
+vocab.tasks.collect_image_garbage): он удаляет только файлы без записей,
+которые не трогали дольше IMAGE_GC_GRACE_SECONDS. Немедленное удаление
+гонялось с store_image: тот же файл мог снова понадобиться (слово
+удалили и тут же добавили), store_image видел его на месте и не писал
+заново, а удаление приходило следом.
+
+При сохранении из оригинала один раз строятся уменьшенные копии
+(VARIANTS): WebP для страниц (srcset) и JPEG для отправки в Telegram.
+Построенные копии записываются в ImageAsset.variants; шаблоны ссылаются
+только на них (vocab/templatetags/image_tags.py), а для остальных отдают
+оригинал.
+"""
+import hashlib
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from vocab.models import ImageAsset
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'images'
+
+# Производные картинки: имя -> (максимальная сторона, формат)
+VARIANTS = {
+    'thumb': (160, 'WEBP'),      # список слов (80px, 2x)
+    'small': (320, 'WEBP'),
+    'medium': (640, 'WEBP'),     # карточка повторения
+    'telegram': (640, 'JPEG'),   # отправка в боте
+}
+# Ширины для srcset на страницах
+SRCSET_VARIANTS = ('thumb', 'small', 'medium')
+
+GC_GRACE_SECONDS = getattr(settings, 'IMAGE_GC_GRACE_SECONDS', 3600)
+
+
+def normalize_prompt(word: str, translation: str | None = None) -> str:
+    prompt = ' '.join(word.split()).casefold()
+    translation = ' '.join((translation or '').split()).casefold()
+    return f"{prompt} ({translation})" if translation else prompt
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def image_name(content_hash: str, ext: str = 'jpg') -> str:
+    return f"{IMAGE_DIR}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{ext}"
+
+
+def variant_name(name: str, variant: str) -> str:
+    """images/ab/cd/<hash>.jpg -> images/ab/cd/<hash>.<variant>.webp"""
+    ext = 'jpg' if VARIANTS[variant][1] == 'JPEG' else 'webp'
+    return f"{os.path.splitext(name)[0]}.{variant}.{ext}"
+
+
+def is_stored_image(name) -> bool:
+    """Картинка из общего хранилища (у неё есть производные)."""
+    return bool(name) and str(name).startswith(f"{IMAGE_DIR}/")
+
+
+def build_variants(name: str, data: bytes | None = None) -> list[str]:
+    """
+    Строит недостающие производные для картинки хранилища.
+    Возвращает производные, которые есть после сборки (их записывают в
+    ImageAsset.variants); битая картинка — только уже существующие.
+    """
+    from PIL import Image
+
+    existing = [v for v in VARIANTS if default_storage.exists(variant_name(name, v))]
+    missing = [v for v in VARIANTS if v not in existing]
+    if not missing:
+        return existing
+    try:
+        if data is None:
+            with default_storage.open(name, 'rb') as f:
+                data = f.read()
+        with Image.open(io.BytesIO(data)) as original:
+            original = original.convert('RGB')
+    except (OSError, ValueError) as e:
+        logger.warning("Не удалось прочитать картинку %s: %s", name, e)
+        return existing
+
+    for variant in missing:
+        size, fmt = VARIANTS[variant]
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)  # не увеличивает маленькие
+        buffer = io.BytesIO()
+        if fmt == 'JPEG':
+            image.save(buffer, fmt, quality=82, optimize=True, progressive=True)
+        else:
+            image.save(buffer, fmt, quality=80, method=4)
+        default_storage.save(variant_name(name, variant), ContentFile(buffer.getvalue()))
+    return [v for v in VARIANTS if v in existing or v in missing]
+
+
+def save_variants(name: str, variants: list[str]):
+    """Записывает построенные производные во все записи с этим файлом."""
+    ImageAsset.objects.filter(file=name).update(variants=variants)
+
+
+def telegram_image_path(name: str) -> str:
+    """Путь к файлу для отправки в Telegram: уменьшенный JPEG, если он есть."""
+    if is_stored_image(name):
+        path = default_storage.path(variant_name(name, 'telegram'))
+        if os.path.exists(path):
+            return path
+    return default_storage.path(name)
+
+
+def find_image(word: str, translation: str | None = None) -> ImageAsset | None:
+    """Готовая картинка для промпта, если её файл на месте."""
+    asset = ImageAsset.objects.filter(prompt_key=prompt_key(normalize_prompt(word, translation))).first()
+    if asset is not None and default_storage.exists(asset.file):
+        return asset
+    return None
+
+
+def store_image(word: str, translation: str | None, data: bytes) -> ImageAsset:
+    """
+    Сохраняет загруженную картинку в хранилище (файл пишется, только если
+    такого содержимого ещё нет) и возвращает запись для промпта.
+    """
+    prompt = normalize_prompt(word, translation)
+    content_hash = hashlib.sha256(data).hexdigest()
+    name = image_name(content_hash)
+    if default_storage.exists(name):
+        # Файл снова нужен — свежая отметка времени уберегает его от сборщика мусора
+        _touch(name)
+    else:
+        name = default_storage.save(name, ContentFile(data))
+    variants = build_variants(name, data)
+
+    asset, created = ImageAsset.objects.get_or_create(
+        prompt_key=prompt_key(prompt),
+        defaults={'prompt': prompt[:600], 'content_hash': content_hash, 'file': name, 'variants': variants},
+    )
+    # Если параллельная задача успела раньше, наш файл лишний — его уберёт сборщик мусора
+    if not created and asset.file != name and not default_storage.exists(asset.file):
+        asset.content_hash, asset.file, asset.variants = content_hash, name, variants
+        asset.save(update_fields=['content_hash', 'file', 'variants'])
+    elif not created and asset.file == name and asset.variants != variants:
+        asset.variants = variants
+        asset.save(update_fields=['variants'])
+    if asset.file == name and not default_storage.exists(name):
+        # Сборщик мусора удалил файл, пока записи на него ещё не было
+        default_storage.save(name, ContentFile(data))
+        save_variants(name, build_variants(name, data))
+    return asset
+
+
+def get_or_fetch_image(word: str, translation: str | None = None) -> ImageAsset | None:
+    """Картинка из хранилища; при промахе — запрос в Pollinations (медленно, вне транзакций)."""
+    asset = find_image(word, translation)
+    if asset is not None:
+        return asset
+
+    from bot.image_generator import fetch_image_for_word
+
+    django_file = fetch_image_for_word(word, translation)
+    if django_file is None:
+        return None
+    django_file.seek(0)
+    return store_image(word, translation, django_file.read())
+
+
+def link_image(asset: ImageAsset, *querysets) -> int | None:
+    """
+    Привязывает картинку к объектам querysets (Word/Card: поля image и
+    image_asset) и добавляет ссылки. Возвращает число привязанных объектов,
+    None — если запись успели удалить (последняя ссылка снята параллельно).
+    """
+    with transaction.atomic():
+        if not ImageAsset.objects.select_for_update().filter(pk=asset.pk).exists():
+            return None
+        linked = sum(qs.update(image=asset.file, image_asset=asset) for qs in querysets)
+        if linked:
+            ImageAsset.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') + linked)
+    return linked
+
+
+def release_image(asset_id: int, count: int = 1):
+    """Снимает ссылки; без ссылок запись удаляется (файл уберёт collect_garbage)."""
+    with transaction.atomic():
+        ImageAsset.objects.filter(pk=asset_id, ref_count__gte=count).update(ref_count=F('ref_count') - count)
+        ImageAsset.objects.filter(pk=asset_id, ref_count=0).delete()
+
+
+def _touch(name: str):
+    try:
+        os.utime(default_storage.path(name))
+    except (NotImplementedError, OSError) as e:
+        logger.warning("Не удалось обновить время картинки %s: %s", name, e)
+
+
+def collect_garbage(grace: float = GC_GRACE_SECONDS) -> int:
+    """
+    Удаляет файлы хранилища (оригинал и производные), на которые нет
+    ImageAsset и которые не менялись дольше grace секунд. Возвращает
+    число удалённых файлов.
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    removed = 0
+    for level1 in _listdirs(IMAGE_DIR):
+        for level2 in _listdirs(f"{IMAGE_DIR}/{level1}"):
+            directory = f"{IMAGE_DIR}/{level1}/{level2}"
+            _, files = default_storage.listdir(directory)
+            groups = {}  # <hash> -> файлы: оригинал и производные
+            for filename in files:
+                groups.setdefault(filename.split('.', 1)[0], []).append(f"{directory}/{filename}")
+            used = set(ImageAsset.objects.filter(file__startswith=f"{directory}/").values_list('file', flat=True))
+            for names in groups.values():
+                if used.intersection(names):
+                    continue
+                if max(default_storage.get_modified_time(n) for n in names) > cutoff:
+                    continue
+                # Повторная проверка прямо перед удалением: запись могла появиться только что
+                if ImageAsset.objects.filter(file__in=names).exists():
+                    continue
+                try:
+                    for n in names:
+                        default_storage.delete(n)
+                        removed += 1
+                except OSError as e:
+                    logger.warning("Не удалось удалить картинку %s: %s", names[0], e)
+    return removed
+
+
+def _listdirs(path: str) -> list[str]:
+    try:
+        return default_storage.listdir(path)[0]
+    except FileNotFoundError:
+        return []
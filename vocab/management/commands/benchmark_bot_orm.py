@@ -0,0 +1,198 @@
+# vocab/management/commands/benchmark_bot_orm.py
+"""
+Микробенчмарк доступа бота к БД.
+
+Сравнивает для типичных обращений обработчиков (пользователь +
+настройки, слова для теста, оценка карточки) три способа:
+  • sync     — синхронный ORM прямо в корутине (так был написан поиск
+               слова в handle_word_input): блокирует event loop;
+  • wrapped  — прежний путь через sync_to_async;
+  • native   — bot/repository.py на родном async API ORM.
+Для каждого выводятся задержка вызова (p50/p95), пропускная способность
+и задержка event loop (насколько опаздывает таймер с шагом --tick-ms,
+пока идут запросы) — её чувствуют все остальные пользователи бота.
+
+Данные создаются у временного пользователя и удаляются в конце.
+
+Пример:
+    python manage.py benchmark_bot_orm --concurrency 20 --iterations 50 > bench_output.txt
+"""
+import asyncio
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from bot import repository
+from vocab.models import Card, TelegramUser, UserSettings
+from words.models import Word
+
+MODES = ('sync', 'wrapped', 'native')
+
+
+# === СЦЕНАРИИ: (sync, wrapped, native) ===
+
+def _user_settings_sync(telegram_id):
+    user = TelegramUser.objects.get(telegram_id=telegram_id)
+    UserSettings.objects.get_or_create(user=user)
+
+
+async def user_settings_wrapped(telegram_id, card_id):
+    user = await sync_to_async(TelegramUser.objects.get)(telegram_id=telegram_id)
+    await sync_to_async(UserSettings.objects.get_or_create)(user=user)
+
+
+async def user_settings_native(telegram_id, card_id):
+    user = await repository.fetch_user(telegram_id)
+    await repository.fetch_settings(user.id)
+
+
+async def user_settings_sync(telegram_id, card_id):
+    _user_settings_sync(telegram_id)
+
+
+def _quiz_words_sync(telegram_id):
+    return list(Word.objects.filter(user__telegram_id=telegram_id))
+
+
+async def quiz_words_wrapped(telegram_id, card_id):
+    await sync_to_async(_quiz_words_sync)(telegram_id)
+
+
+async def quiz_words_native(telegram_id, card_id):
+    user = await repository.fetch_user(telegram_id)
+    await repository.quiz_words(user)
+
+
+async def quiz_words_sync(telegram_id, card_id):
+    _quiz_words_sync(telegram_id)
+
+
+def _grade_sync(card_id):
+    card = Card.objects.select_related('repetition').get(id=card_id)
+    card.repetition.schedule_review(4)
+
+
+async def grade_wrapped(telegram_id, card_id):
+    await sync_to_async(_grade_sync)(card_id)
+
+
+async def grade_native(telegram_id, card_id):
+    repetition = await repository.get_repetition(card_id)
+    settings = await repository.fetch_settings(repetition.owner_id)
+    await repository.schedule_review(repetition, 4, settings)
+
+
+async def grade_sync(telegram_id, card_id):
+    _grade_sync(card_id)
+
+
+SCENARIOS = {
+    'user_settings': {'sync': user_settings_sync, 'wrapped': user_settings_wrapped, 'native': user_settings_native},
+    'quiz_words': {'sync': quiz_words_sync, 'wrapped': quiz_words_wrapped, 'native': quiz_words_native},
+    'grade': {'sync': grade_sync, 'wrapped': grade_wrapped, 'native': grade_native},
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else 0.0
+
+
+async def measure_lag(tick: float, lags: list, stop: asyncio.Event):
+    """Опоздание таймера: сколько event loop был занят сверх tick."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - started - tick)
+
+
+async def run_scenario(fn, telegram_id, card_ids, concurrency, iterations, tick):
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(tick, lags, stop))
+
+    async def worker(index):
+        card_id = card_ids[index % len(card_ids)]
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await fn(telegram_id, card_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    return {
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'lag_p95': percentile(lags, 0.95),
+        'lag_max': max(lags, default=0.0),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержки доступа бота к БД: sync в корутине, sync_to_async и родной async ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=10, help='Одновременных «обработчиков»')
+        parser.add_argument('--iterations', type=int, default=30, help='Вызовов на обработчик')
+        parser.add_argument('--words', type=int, default=50, help='Слов и карточек у тестового пользователя')
+        parser.add_argument('--tick-ms', type=float, default=5.0, help='Шаг таймера для задержки event loop')
+        parser.add_argument('--modes', default=','.join(MODES), help=f"Через запятую из {', '.join(MODES)}")
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip() in MODES]
+        user, card_ids = self.create_fixtures(options['words'])
+        try:
+            results = asyncio.run(self.run_all(user.telegram_id, card_ids, modes, options))
+        finally:
+            user.delete()
+        self.report(results, options)
+
+    def create_fixtures(self, count):
+        user = TelegramUser.objects.create(telegram_id=f"bench-{os.getpid()}-{time.time_ns()}", username='bench')
+        UserSettings.objects.get_or_create(user=user)
+        Word.objects.bulk_create([
+            Word(user=user, text=f"word{i}", translation=f"слово{i}") for i in range(count)
+        ])
+        # Через create — сигнал создаёт Repetition, как при обычном добавлении
+        card_ids = [
+            Card.objects.create(owner=user, word=f"word{i}", translation=f"слово{i}").id
+            for i in range(count)
+        ]
+        return user, card_ids
+
+    async def run_all(self, telegram_id, card_ids, modes, options):
+        results = []
+        tick = options['tick_ms'] / 1000
+        for name, variants in SCENARIOS.items():
+            for mode in modes:
+                if mode == 'sync':
+                    # Синхронный ORM из корутины Django запрещает — снимаем запрет только на замер
+                    os.environ['DJANGO_ALLOW_ASYNC_UNSAFE'] = 'true'
+                try:
+                    stats = await run_scenario(
+                        variants[mode], telegram_id, card_ids,
+                        options['concurrency'], options['iterations'], tick,
+                    )
+                finally:
+                    os.environ.pop('DJANGO_ALLOW_ASYNC_UNSAFE', None)
+                results.append((name, mode, stats))
+        return results
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"concurrency={options['concurrency']} iterations={options['iterations']} "
+            f"words={options['words']} tick={options['tick_ms']}ms"
+        )
+        self.stdout.write(f"{'scenario':<14}{'mode':<9}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}"
+                          f"{'lag p95 ms':>12}{'lag max ms':>12}")
+        for name, mode, s in results:
+            self.stdout.write(
+                f"{name:<14}{mode:<9}{s['p50'] * 1000:>9.2f}{s['p95'] * 1000:>9.2f}{s['rps']:>9.0f}"
+                f"{s['lag_p95'] * 1000:>12.2f}{s['lag_max'] * 1000:>12.2f}"
+            )
@@ -0,0 +1,30 @@
+# vocab/management/commands/build_image_variants.py
+"""
+Строит недостающие производные (WebP/JPEG) для картинок общего хранилища,
+сохранённых до появления производных, и записывает построенные в
+ImageAsset.variants.
+
+    python manage.py build_image_variants
+"""
+from django.core.management.base import BaseCommand
+
+from vocab.image_store import build_variants, save_variants
+from vocab.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные копии картинок из общего хранилища"
+
+    def handle(self, *args, **options):
+        rows = ImageAsset.objects.values_list('file', 'variants').order_by('file')
+        updated = 0
+        last_name = None
+        for name, variants in rows.iterator():
+            if name == last_name:
+                continue
+            last_name = name
+            built = build_variants(name)
+            if set(built) != set(variants or ()):
+                save_variants(name, built)
+                updated += 1
+        self.stdout.write(self.style.SUCCESS(f"Обновлено картинок: {updated}"))
@@ -0,0 +1,210 @@
+# vocab/management/commands/simulate_review_load.py
+"""
+Прогноз нагрузки планировщика повторений.
+
+Снимает текущее состояние Repetition в компактные массивы NumPy и
+моделирует N дней повторений с заданным распределением оценок.
+Выводит по дням число повторений (сообщения в Telegram) и число
+пользователей с карточками к повторению (уведомления).
+
+Примеры:
+    python manage.py simulate_review_load --days 90
+    python manage.py simulate_review_load --synthetic 1000000 --users 20000 --new-cards-per-day 5000
+"""
+import csv
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vocab.models import Repetition, UserSettings
+from vocab.scheduling import SM2Params, sm2_next_state
+
+DEFAULT_QUALITY_DIST = '1:0.1,2:0.1,3:0.3,4:0.3,5:0.2'
+CHUNK_SIZE = 50000
+PARAM_FIELDS = ('first_interval', 'second_interval', 'interval_multiplier', 'max_interval', 'min_easiness')
+
+
+def parse_quality_dist(value: str):
+    """'1:0.1,3:0.5,5:0.4' -> (массив оценок, массив вероятностей)."""
+    try:
+        pairs = [item.split(':') for item in value.split(',') if item.strip()]
+        qualities = np.array([int(q) for q, _ in pairs], dtype=np.int64)
+        weights = np.array([float(w) for _, w in pairs], dtype=np.float64)
+    except ValueError:
+        raise CommandError(f"Неверный формат --quality-dist: {value!r} (ожидается '3:0.5,5:0.5')")
+    if not len(qualities) or (qualities < 0).any() or (qualities > 5).any() or weights.sum() <= 0:
+        raise CommandError("Оценки должны быть от 0 до 5, сумма весов — положительной")
+    return qualities, weights / weights.sum()
+
+
+class Command(BaseCommand):
+    help = 'Моделирует нагрузку повторений по дням для текущих карточек и настроек SM-2'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Горизонт моделирования в днях')
+        parser.add_argument('--quality-dist', default=DEFAULT_QUALITY_DIST,
+                            help=f'Распределение оценок, по умолчанию {DEFAULT_QUALITY_DIST}')
+        parser.add_argument('--new-cards-per-day', type=int, default=0,
+                            help='Сколько новых карточек добавляется в день (рост базы)')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Не читать БД, а сгенерировать столько новых карточек')
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Число пользователей для --synthetic и новых карточек')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--csv', dest='csv_path', default=None, help='Сохранить результат в CSV')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days <= 0:
+            raise CommandError('--days должно быть положительным')
+        qualities, weights = parse_quality_dist(options['quality_dist'])
+        rng = np.random.default_rng(options['seed'])
+        now = timezone.now()
+
+        if options['synthetic']:
+            state = self.synthetic_snapshot(options['synthetic'], options['users'], rng)
+        else:
+            state = self.snapshot(now)
+        self.stdout.write(f"Карточек в снимке: {len(state['interval'])}, пользователей: {len(state['params']['first_interval'])}")
+
+        state = self.add_growth(state, options['new_cards_per_day'], options['users'], days, rng)
+        started = timezone.now()
+        reviews, users, lapses = simulate(state, days, qualities, weights, rng)
+        elapsed = (timezone.now() - started).total_seconds()
+
+        self.report(now, reviews, users, lapses)
+        self.stdout.write(self.style.SUCCESS(f"Моделирование {days} дн. заняло {elapsed:.2f} с"))
+
+        if options['csv_path']:
+            with open(options['csv_path'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['day', 'date', 'reviews', 'users', 'lapses'])
+                for d in range(days):
+                    writer.writerow([d, (now + timedelta(days=d)).date(), reviews[d], users[d], lapses[d]])
+
+    # === СНИМОК СОСТОЯНИЯ ===
+
+    def snapshot(self, now):
+        """Текущие Repetition -> массивы (без создания объектов моделей)."""
+        rows = Repetition.objects.values_list(
+            'owner_id', 'interval', 'easiness', 'repetitions', 'next_review'
+        ).order_by().iterator(chunk_size=CHUNK_SIZE)
+
+        owner, interval, easiness, repetitions, due_day = [], [], [], [], []
+        now_ts = now.timestamp()
+        for owner_id, ivl, ease, reps, next_review in rows:
+            owner.append(owner_id or 0)
+            interval.append(ivl)
+            easiness.append(ease)
+            repetitions.append(reps)
+            due_day.append((next_review.timestamp() - now_ts) / 86400)
+
+        owner_ids, owner_idx = np.unique(np.array(owner, dtype=np.int64), return_inverse=True)
+        found = {
+            row['user_id']: row
+            for row in UserSettings.objects.filter(user_id__in=owner_ids.tolist()).values('user_id', *PARAM_FIELDS)
+        }
+        defaults = SM2Params()
+        params = {
+            field: np.array([found.get(o, {}).get(field, getattr(defaults, field)) for o in owner_ids.tolist()],
+                            dtype=np.float64)
+            for field in PARAM_FIELDS
+        }
+        return {
+            'owner': owner_idx.astype(np.int64),
+            'interval': np.array(interval, dtype=np.float64),
+            'easiness': np.array(easiness, dtype=np.float64),
+            'repetitions': np.array(repetitions, dtype=np.int64),
+            'due_day': np.maximum(np.floor(np.array(due_day, dtype=np.float64)), 0).astype(np.int64),
+            'params': params,
+        }
+
+    def synthetic_snapshot(self, cards, users, rng):
+        """Новые карточки (как сразу после добавления) с настройками по умолчанию."""
+        defaults = SM2Params()
+        users = max(users, 1)
+        return {
+            'owner': rng.integers(0, users, size=cards),
+            'interval': np.zeros(cards, dtype=np.float64),
+            'easiness': np.full(cards, 2.5),
+            'repetitions': np.zeros(cards, dtype=np.int64),
+            'due_day': np.zeros(cards, dtype=np.int64),
+            'params': {field: np.full(users, float(getattr(defaults, field))) for field in PARAM_FIELDS},
+        }
+
+    def add_growth(self, state, per_day, users, days, rng):
+        """Дописывает карточки, которые появятся за горизонт (станут доступны в свой день)."""
+        total = per_day * days
+        if total <= 0:
+            return state
+        defaults = SM2Params()
+        base_users = len(state['params']['first_interval'])
+        users = max(users, 1)
+        # Новые карточки — у новых пользователей с настройками по умолчанию
+        state['owner'] = np.concatenate([state['owner'], base_users + rng.integers(0, users, size=total)])
+        state['interval'] = np.concatenate([state['interval'], np.zeros(total)])
+        state['easiness'] = np.concatenate([state['easiness'], np.full(total, 2.5)])
+        state['repetitions'] = np.concatenate([state['repetitions'], np.zeros(total, dtype=np.int64)])
+        state['due_day'] = np.concatenate([state['due_day'], np.repeat(np.arange(days), per_day)])
+        for field in PARAM_FIELDS:
+            state['params'][field] = np.concatenate(
+                [state['params'][field], np.full(users, float(getattr(defaults, field)))]
+            )
+        return state
+
+    # === ОТЧЁТ ===
+
+    def report(self, now, reviews, users, lapses):
+        peak = int(reviews.max()) if len(reviews) else 0
+        width = 40
+        self.stdout.write(f"{'день':>5} {'дата':>10} {'повторений':>11} {'польз.':>8} {'ошибок':>8}")
+        for d in range(len(reviews)):
+            bar = '#' * (int(round(reviews[d] / peak * width)) if peak else 0)
+            self.stdout.write(
+                f"{d:>5} {(now + timedelta(days=d)).strftime('%d.%m.%Y'):>10} "
+                f"{reviews[d]:>11} {users[d]:>8} {lapses[d]:>8} {bar}"
+            )
+        self.stdout.write(
+            f"Пик: {peak} повторений/день (~{peak / 86400:.2f} сообщ./с в среднем), "
+            f"в среднем {reviews.mean():.0f}/день, уведомлений в пик: {int(users.max()) if len(users) else 0}"
+        )
+
+
+def simulate(state, days, qualities, weights, rng):
+    """
+    Моделирует days дней: каждый день все карточки к повторению получают
+    случайную оценку и переносятся по SM-2. Возвращает массивы по дням:
+    число повторений, число пользователей с повторениями и число ошибок.
+    """
+    owner = state['owner']
+    interval = state['interval']
+    easiness = state['easiness']
+    repetitions = state['repetitions']
+    due_day = state['due_day']
+    params = state['params']
+
+    reviews = np.zeros(days, dtype=np.int64)
+    users = np.zeros(days, dtype=np.int64)
+    lapses = np.zeros(days, dtype=np.int64)
+    for d in range(days):
+        idx = np.flatnonzero(due_day == d)
+        if not idx.size:
+            continue
+        quality = rng.choice(qualities, size=idx.size, p=weights)
+        card_owner = owner[idx]
+        new_interval, new_easiness, new_repetitions, passed = sm2_next_state(
+            interval[idx], easiness[idx], repetitions[idx], quality,
+            **{field: params[field][card_owner] for field in PARAM_FIELDS},
+        )
+        interval[idx] = new_interval
+        easiness[idx] = new_easiness
+        repetitions[idx] = new_repetitions
+        # Интервал 0 означает «сегодня ещё раз» — считаем следующим днём
+        due_day[idx] = d + np.maximum(new_interval, 1)
+
+        reviews[d] = idx.size
+        users[d] = np.unique(card_owner).size
+        lapses[d] = idx.size - int(passed.sum())
+    return reviews, users, lapses
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_repetition_owner(apps, schema_editor):
+    """Repetition.owner = Card.owner для уже существующих записей."""
+    Card = apps.get_model('vocab', 'Card')
+    Repetition = apps.get_model('vocab', 'Repetition')
+    Repetition.objects.filter(owner__isnull=True).update(
+        owner_id=Subquery(
+            Card.objects.filter(pk=OuterRef('card_id')).values('owner_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0003_alter_telegramuser_telegram_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repetition',
+            name='owner',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='repetitions',
+                to='vocab.telegramuser',
+            ),
+        ),
+        migrations.RunPython(backfill_repetition_owner, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='repetition',
+            index=models.Index(fields=['owner', 'next_review'], name='rep_owner_next_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['owner', 'difficulty'], name='card_owner_difficulty_idx'),
+        ),
+    ]
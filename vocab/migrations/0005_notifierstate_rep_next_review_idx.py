@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0004_repetition_owner_and_due_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotifierState',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='repetition',
+            index=models.Index(fields=['next_review'], name='rep_next_review_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0005_notifierstate_rep_next_review_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedTranslation',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('source_lang', models.CharField(max_length=10)),
+                ('target_lang', models.CharField(max_length=10)),
+                ('text', models.CharField(max_length=255)),
+                ('translation', models.CharField(max_length=500)),
+                ('hits', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('source_lang', 'target_lang', 'text')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0006_cachedtranslation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramFile',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('bot_id', models.BigIntegerField()),
+                ('media_key', models.CharField(max_length=255)),
+                ('file_id', models.CharField(max_length=255)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('bot_id', 'media_key')},
+            },
+        ),
+    ]
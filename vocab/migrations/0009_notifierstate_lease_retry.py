@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0008_imageasset_card_image_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notifierstate',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notifierstate',
+            name='retry_chat_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0009_notifierstate_lease_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
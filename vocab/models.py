@@ -1,16 +1,11 @@
 # vocab/models.py
 
 from django.contrib.auth.models import User
-from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from bot.image_generator import fetch_image_for_word
-from vocab.models import Repetition
-from words.models import Word
-
 
 class SomeModel(models.Model):
     """
@@ -59,6 +54,76 @@ class UserSettings(models.Model):
         return f"Настройки {self.user}"
 
 
+class NotifierState(models.Model):
+    """
+    Отметка последнего запуска периодической рассылки (по имени задачи).
+    last_run_at сдвигается только после рассылки; пока она идёт, окно
+    занято до lease_until. retry_chat_ids — чаты, которым не удалось
+    отправить из-за временной ошибки, их дайджест войдёт в следующее окно.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    retry_chat_ids = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_run_at}"
+
+
+class CachedTranslation(models.Model):
+    """
+    Кэш переводов GoogleTranslator: (язык, язык, нормализованный текст) -> перевод.
+    """
+    source_lang = models.CharField(max_length=10)
+    target_lang = models.CharField(max_length=10)
+    text = models.CharField(max_length=255)
+    translation = models.CharField(max_length=500)
+    hits = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['source_lang', 'target_lang', 'text']
+
+    def __str__(self):
+        return f"{self.text} ({self.source_lang}→{self.target_lang}): {self.translation}"
+
+
+class TelegramFile(models.Model):
+    """
+    file_id, выданный Telegram при первой загрузке нашего файла.
+    file_id действителен только для того бота, который его получил.
+    """
+    bot_id = models.BigIntegerField()
+    media_key = models.CharField(max_length=255)  # "image:<путь в MEDIA_ROOT>" или "tts:<хэш>"
+    file_id = models.CharField(max_length=255)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['bot_id', 'media_key']
+
+    def __str__(self):
+        return f"{self.media_key} -> {self.file_id}"
+
+
+class ImageAsset(models.Model):
+    """
+    Картинка в общем хранилище (vocab/image_store.py): одна на нормализованный
+    промпт (слово + перевод), файл адресуется хэшем содержимого.
+    ref_count — число Word и Card, которые на неё ссылаются, variants —
+    построенные производные (image_store.VARIANTS).
+    """
+    prompt_key = models.CharField(max_length=64, unique=True)
+    prompt = models.CharField(max_length=600)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    file = models.CharField(max_length=255)  # имя в default_storage: images/ab/cd/<hash>.jpg
+    ref_count = models.PositiveIntegerField(default=0)
+    variants = models.JSONField(default=list, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.prompt} -> {self.file} ({self.ref_count})"
+
+
 class BotLog(models.Model):
     """
     Лог запросов/ответов бота.
@@ -97,8 +162,17 @@ class Card(models.Model):
     note = models.TextField(blank=True, null=True)
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES, default='beginner')
     image = models.ImageField(upload_to=card_image_upload_path, null=True, blank=True)
+    image_asset = models.ForeignKey(
+        ImageAsset, on_delete=models.SET_NULL, null=True, blank=True, related_name='cards'
+    )
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Статистика по уровням на странице прогресса
+            models.Index(fields=['owner', 'difficulty'], name='card_owner_difficulty_idx'),
+        ]
+
     def __str__(self):
         return f"{self.word} → {self.translation}"
 
@@ -108,6 +182,15 @@ class Repetition(models.Model):
     Параметры интервального повторения для карточки.
     """
     card = models.OneToOneField(Card, on_delete=models.CASCADE, related_name="repetition")
+    # Денормализованный владелец карточки (= card.owner), чтобы очередь
+    # повторений читалась по индексу без JOIN через Card
+    owner = models.ForeignKey(
+        TelegramUser,
+        on_delete=models.CASCADE,
+        related_name="repetitions",
+        null=True,
+        blank=True,
+    )
     next_review = models.DateTimeField()
     interval = models.IntegerField(default=0)
     easiness = models.FloatField(default=2.5)
@@ -116,36 +199,23 @@ class Repetition(models.Model):
     last_result = models.BooleanField(default=True)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'next_review'], name='rep_owner_next_review_idx'),
+            # Глобальный индекс сроков: упорядоченная по next_review очередь,
+            # которую schedule_review поддерживает при каждом переносе карточки.
+            # Уведомления читают из неё только окно (прошлый запуск, сейчас].
+            models.Index(fields=['next_review'], name='rep_next_review_idx'),
+        ]
+
     def schedule_review(self, quality: int):
         """
         Обновляет параметры интервального повторения по оценке quality (0–5).
+        Расчёт — в vocab.scheduling (общий движок SM-2 для пакетной обработки).
         """
-        try:
-            settings_obj = self.card.owner.settings
-        except ObjectDoesNotExist:
-            settings_obj = UserSettings.objects.create(user=self.card.owner)
-
-        if quality < 3:
-            self.interval = settings_obj.first_interval
-            self.repetitions = 0
-        else:
-            if self.repetitions == 0:
-                self.interval = settings_obj.first_interval
-            elif self.repetitions == 1:
-                self.interval = settings_obj.second_interval
-            else:
-                self.interval = int(self.interval * self.easiness * settings_obj.interval_multiplier)
-            self.interval = min(self.interval, settings_obj.max_interval)
-            self.repetitions += 1
-
-        self.easiness = max(
-            settings_obj.min_easiness,
-            self.easiness + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-        )
-        self.next_review = timezone.now() + timezone.timedelta(days=self.interval)
-        self.review_count += 1
-        self.last_result = quality >= 3
-        self.save()
+        from vocab.scheduling import schedule_repetitions
+
+        schedule_repetitions([self], [quality])
 
     def __str__(self):
         return f"{self.card.word}: след. повторение {self.next_review}"
@@ -153,64 +223,53 @@ class Repetition(models.Model):
 
 # === СИГНАЛЫ ===
 
-@receiver(post_save, sender=Card)
-def create_repetition_and_card_image(sender, instance: Card, created: bool, **kwargs):
-    """
-    1) При создании новой карточки создаём запись Repetition.
-    2) Если у карточки ещё нет изображения — генерируем его и сохраняем в Card.image.
-    """
-    if not created:
-        return
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+def invalidate_user_settings_cache(sender, instance: UserSettings, **kwargs):
+    """Сбрасывает закэшированные настройки (сохранение из веба, бота, админки)."""
+    from vocab.cache import invalidate_user_settings
 
-    # 1. Repetition
-    Repetition.objects.get_or_create(
-        card=instance,
-        defaults={
-            'next_review': timezone.now(),
-            'interval': 0,
-            'easiness': 2.5,
-            'repetitions': 0,
-            'review_count': 0,
-            'last_result': True,
-        }
-    )
+    invalidate_user_settings(instance.user_id)
 
-    # 2. Картинка для карточки
-    if instance.image:
-        return
 
-    django_file = fetch_image_for_word(instance.word, instance.translation)
-    if django_file is None:
-        return
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def invalidate_telegram_user_cache(sender, instance: TelegramUser, **kwargs):
+    """Сбрасывает закэшированного пользователя бота (настройки сбросит их собственный сигнал)."""
+    from vocab.cache import invalidate_telegram_user
 
-    instance.image.save(django_file.name, django_file, save=True)
+    invalidate_telegram_user(instance.telegram_id)
 
 
+@receiver(post_delete, sender=Card)
+def release_card_image(sender, instance: Card, **kwargs):
+    """Снимает ссылку удалённой карточки с картинки в общем хранилище."""
+    if instance.image_asset_id:
+        from vocab.image_store import release_image
 
-@receiver(post_save, sender=Word)
-def create_cards_for_all_users(sender, instance: Word, created: bool, **kwargs):
-    """При создании слова — создаёт карточку ТОЛЬКО для владельца."""
+        release_image(instance.image_asset_id)
 
-    if not created:
-        return
-    from vocab.models import Card
 
-    # ⚠️ Если у слова нет пользователя — ничего не делаем!
-    if not instance.user:
-        print(f"⚠️ СЛОВО БЕЗ ПОЛЬЗОВАТЕЛЯ: {instance.text}")
+@receiver(post_save, sender=Card)
+def create_repetition_and_card_image(sender, instance: Card, created: bool, **kwargs):
+    """
+    При создании новой карточки создаём запись Repetition.
+    При изменении карточки синхронизируем Repetition.owner с Card.owner.
+    Картинка генерируется не здесь, а фоновой задачей (words.services).
+    """
+    if not created:
+        Repetition.objects.filter(card=instance).exclude(
+            owner_id=instance.owner_id
+        ).update(owner_id=instance.owner_id)
         return
 
-    # ✅ Создаём ОДНУ карточку ДЛЯ ВЛАДЕЛЬЦА
-    card, _ = Card.objects.get_or_create(
-        owner=instance.user,  # ← Владелец из формы
-        word=instance.text,
-        defaults={
-            'translation': instance.translation,
-            'difficulty': 'beginner',
-        }
+    Repetition.objects.create(
+        card=instance,
+        owner_id=instance.owner_id,
+        next_review=timezone.now(),
+        interval=0,
+        easiness=2.5,
+        repetitions=0,
+        review_count=0,
+        last_result=True,
     )
-
-    if _:
-        print(f"✅ Карточка создана для {instance.user.username} — {instance.text}")
-    else:
-        print(f"ℹ️ Карточка уже существовала: {instance.text}")
\ No newline at end of file
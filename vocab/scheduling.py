@@ -0,0 +1,242 @@
+# vocab/scheduling.py
+"""
+Единый движок интервального повторения (SM-2).
+
+Считает новое состояние сразу для массива карточек на NumPy и сохраняет
+результат одним bulk_update. Repetition.schedule_review и
+words.intervals.sm2_algorithm — тонкие обёртки над этим модулем.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+# Поля, которые меняет движок (для bulk_update)
+REPETITION_FIELDS = ['interval', 'easiness', 'repetitions', 'review_count',
+                     'last_result', 'next_review', 'updated']
+WORD_FIELDS = ['interval', 'repetitions', 'ease_factor', 'next_review']
+
+
+@dataclass(frozen=True)
+class SM2Params:
+    """Параметры SM-2 (совпадают с полями UserSettings)."""
+    first_interval: int = 1
+    second_interval: int = 6
+    interval_multiplier: float = 1.0
+    max_interval: int | None = 365
+    min_easiness: float = 1.3
+
+    @classmethod
+    def from_settings(cls, settings_obj) -> 'SM2Params':
+        return cls(
+            first_interval=settings_obj.first_interval,
+            second_interval=settings_obj.second_interval,
+            interval_multiplier=settings_obj.interval_multiplier,
+            max_interval=settings_obj.max_interval,
+            min_easiness=settings_obj.min_easiness,
+        )
+
+
+# Слова (words.Word) всегда считались по классическому SM-2 без ограничения интервала
+WORD_PARAMS = SM2Params(max_interval=None)
+
+
+def sm2_next_state(interval, easiness, repetitions, quality,
+                   first_interval=1, second_interval=6, interval_multiplier=1.0,
+                   max_interval=None, min_easiness=1.3, rounding='trunc'):
+    """
+    Векторный шаг SM-2. Все аргументы — числа или массивы одинаковой длины
+    (параметры пользователя можно передавать массивами, по одному на карточку).
+
+    rounding: 'trunc' — как int() в Repetition, 'round' — как round() в Word.
+    Возвращает (interval, easiness, repetitions, passed) в виде массивов.
+    """
+    interval = np.asarray(interval, dtype=np.float64)
+    easiness = np.asarray(easiness, dtype=np.float64)
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    quality = np.asarray(quality, dtype=np.int64)
+    first_interval = np.asarray(first_interval, dtype=np.float64)
+    second_interval = np.asarray(second_interval, dtype=np.float64)
+
+    passed = quality >= 3
+
+    # Интервал считается по СТАРОМУ easiness
+    grown = interval * easiness * np.asarray(interval_multiplier, dtype=np.float64)
+    grown = np.trunc(grown) if rounding == 'trunc' else np.round(grown)
+    new_interval = np.where(
+        repetitions == 0, first_interval,
+        np.where(repetitions == 1, second_interval, grown),
+    )
+    if max_interval is not None:
+        new_interval = np.minimum(new_interval, np.asarray(max_interval, dtype=np.float64))
+    # Неудачный ответ — всегда первый интервал (без ограничения max_interval)
+    new_interval = np.where(passed, new_interval, first_interval)
+    new_repetitions = np.where(passed, repetitions + 1, 0)
+
+    penalty = 5 - quality
+    new_easiness = np.maximum(
+        np.asarray(min_easiness, dtype=np.float64),
+        easiness + (0.1 - penalty * (0.08 + penalty * 0.02)),
+    )
+    return new_interval.astype(np.int64), new_easiness, new_repetitions, passed
+
+
+def _review_times(now, count):
+    """Время ответа: одно на всех или своё для каждой карточки."""
+    if now is None:
+        now = timezone.now()
+    if isinstance(now, (list, tuple)):
+        return list(now)
+    return [now] * count
+
+
+def _settings_columns(owner_ids, settings_by_owner):
+    """Раскладывает параметры пользователей в массивы по карточкам."""
+    params = [settings_by_owner[owner_id] for owner_id in owner_ids]
+    return {
+        'first_interval': [p.first_interval for p in params],
+        'second_interval': [p.second_interval for p in params],
+        'interval_multiplier': [p.interval_multiplier for p in params],
+        'max_interval': [p.max_interval for p in params],
+        'min_easiness': [p.min_easiness for p in params],
+    }
+
+
+def load_settings_for_owners(owner_ids) -> dict:
+    """
+    Настройки SM-2 для набора TelegramUser (через процессный кэш UserSettings).
+    """
+    from vocab.cache import get_user_settings_many
+
+    return {
+        owner_id: SM2Params.from_settings(settings_obj)
+        for owner_id, settings_obj in get_user_settings_many(owner_ids).items()
+    }
+
+
+def schedule_repetitions(repetitions, qualities, now=None, settings_by_owner=None, commit=True):
+    """
+    Применяет оценки (0–5) к списку Repetition и сохраняет их одним bulk_update.
+
+    settings_by_owner: {owner_id: SM2Params}; если не передан — загружается.
+    commit=False только пересчитывает объекты в памяти.
+    Каждая карточка должна встречаться в списке не более одного раза.
+    """
+    repetitions = list(repetitions)
+    if not repetitions:
+        return repetitions
+
+    owner_ids = [rep.owner_id or rep.card.owner_id for rep in repetitions]
+    if settings_by_owner is None:
+        settings_by_owner = load_settings_for_owners(owner_ids)
+
+    interval, easiness, reps, passed = sm2_next_state(
+        [rep.interval for rep in repetitions],
+        [rep.easiness for rep in repetitions],
+        [rep.repetitions for rep in repetitions],
+        list(qualities),
+        **_settings_columns(owner_ids, settings_by_owner),
+    )
+
+    reviewed_at = _review_times(now, len(repetitions))
+    for i, rep in enumerate(repetitions):
+        rep.interval = int(interval[i])
+        rep.easiness = float(easiness[i])
+        rep.repetitions = int(reps[i])
+        rep.review_count += 1
+        rep.last_result = bool(passed[i])
+        rep.next_review = reviewed_at[i] + timedelta(days=rep.interval)
+        rep.updated = reviewed_at[i]  # bulk_update не трогает auto_now
+
+    if commit:
+        type(repetitions[0]).objects.bulk_update(repetitions, REPETITION_FIELDS)
+    return repetitions
+
+
+def _answered_at(grade, now):
+    """Время ответа из оценки; без него или из будущего — now."""
+    return min(grade.get('answered_at') or now, now)
+
+
+def _is_stale(grade, repetition, now) -> bool:
+    return repetition.updated is not None and _answered_at(grade, now) < repetition.updated
+
+
+def apply_grades(repetitions_by_card: dict, grades, now=None, settings_by_owner=None) -> list:
+    """
+    Применяет пачку оценок [{card_id, quality, answered_at}] и сохраняет
+    затронутые Repetition одним bulk_update.
+
+    Оценки обрабатываются по времени ответа; если одна карточка оценена
+    несколько раз, каждая следующая оценка применяется отдельным векторным
+    шагом поверх предыдущей. Оценка, данная раньше последнего изменения
+    карточки (rep.updated), устарела и пропускается — иначе опоздавший
+    офлайн-ответ откатил бы более новое расписание.
+    """
+    if now is None:
+        now = timezone.now()
+    ordered = sorted(
+        (g for g in grades if not _is_stale(g, repetitions_by_card[g['card_id']], now)),
+        key=lambda g: _answered_at(g, now),
+    )
+
+    rounds = []  # rounds[k] — k-я по счёту оценка каждой карточки
+    seen = {}
+    for grade in ordered:
+        k = seen.get(grade['card_id'], 0)
+        seen[grade['card_id']] = k + 1
+        if k == len(rounds):
+            rounds.append([])
+        rounds[k].append(grade)
+
+    if settings_by_owner is None:
+        settings_by_owner = load_settings_for_owners(
+            rep.owner_id or rep.card.owner_id for rep in repetitions_by_card.values()
+        )
+    for round_grades in rounds:
+        schedule_repetitions(
+            [repetitions_by_card[g['card_id']] for g in round_grades],
+            [g['quality'] for g in round_grades],
+            now=[_answered_at(g, now) for g in round_grades],
+            settings_by_owner=settings_by_owner,
+            commit=False,
+        )
+
+    touched = [repetitions_by_card[card_id] for card_id in seen]
+    if touched:
+        type(touched[0]).objects.bulk_update(touched, REPETITION_FIELDS)
+    return touched
+
+
+def schedule_words(words, grades, now=None, commit=True):
+    """
+    То же самое для words.Word (классический SM-2 с фиксированными параметрами).
+    """
+    words = list(words)
+    if not words:
+        return words
+
+    interval, easiness, reps, _ = sm2_next_state(
+        [w.interval for w in words],
+        [w.ease_factor for w in words],
+        [w.repetitions for w in words],
+        list(grades),
+        first_interval=WORD_PARAMS.first_interval,
+        second_interval=WORD_PARAMS.second_interval,
+        interval_multiplier=WORD_PARAMS.interval_multiplier,
+        max_interval=WORD_PARAMS.max_interval,
+        min_easiness=WORD_PARAMS.min_easiness,
+        rounding='round',
+    )
+
+    reviewed_at = _review_times(now, len(words))
+    for i, word in enumerate(words):
+        word.interval = int(interval[i])
+        word.ease_factor = float(easiness[i])
+        word.repetitions = int(reps[i])
+        word.next_review = reviewed_at[i] + timedelta(days=word.interval)
+
+    if commit:
+        type(words[0]).objects.bulk_update(words, WORD_FIELDS)
+    return words
@@ -19,3 +19,10 @@ class RepetitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Repetition
         fields = '__all__'
+
+
+class GradeSerializer(serializers.Serializer):
+    """Одна оценка из пакета: карточка, качество ответа (0–5) и время ответа."""
+    card_id = serializers.IntegerField()
+    quality = serializers.IntegerField(min_value=0, max_value=5)
+    answered_at = serializers.DateTimeField(required=False)
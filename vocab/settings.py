@@ -144,6 +144,44 @@ MEDIA_ROOT = BASE_DIR / "media"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Процессный кэш UserSettings (vocab/cache.py). Сигналы сбрасывают его
+# только в процессе, где сохранили настройки: изменения с сайта бот и
+# Celery видят не позже TTL. Промах — один запрос по первичному ключу
+USER_SETTINGS_CACHE_TTL = 30  # секунд
+USER_SETTINGS_CACHE_SIZE = 10000
+
+# Процессный кэш TelegramUser по telegram_id (vocab/cache.py, бот);
+# изменения из других процессов — с той же задержкой
+TELEGRAM_USER_CACHE_TTL = 30
+TELEGRAM_USER_CACHE_SIZE = 10000
+
+# Кэш переводов (vocab/translation.py)
+TRANSLATION_CACHE_SIZE = 5000  # записей в памяти процесса
+TRANSLATION_MEMORY_TTL = 3600  # секунд в памяти
+TRANSLATION_CACHE_TTL_DAYS = 30  # срок жизни записи в БД
+
+# Рассылка напоминаний о повторении (vocab/tasks.py)
+NOTIFY_CONCURRENCY = 20  # одновременных запросов к Telegram
+NOTIFY_LEASE_SECONDS = 900  # после падения рассылки окно повторится не раньше
+
+# Общий лимит отправки в Telegram (bot/send_scheduler.py).
+# С Redis бот и Celery делят один token bucket; без него Celery получает
+# TELEGRAM_CELERY_SHARE лимита, бот — остальное (поровну между воркерами)
+TELEGRAM_RATE_REDIS = os.getenv('TELEGRAM_RATE_REDIS')
+TELEGRAM_CELERY_SHARE = 0.2
+
+# Без брокера Celery картинка слова генерируется синхронно, прямо в
+# запросе (words/services.py); по умолчанию — откладывается: слово остаётся
+# в pending, и words.tasks.requeue_word_images (django_celery_beat) ставит
+# его в очередь заново спустя WORD_IMAGE_REQUEUE_AFTER секунд
+WORD_IMAGE_SYNC_FALLBACK = False
+WORD_IMAGE_REQUEUE_AFTER = 600
+
+# Дисковый кэш озвучки, общий для веба и бота (bot/voice.py)
+TTS_CACHE_DIR = BASE_DIR / 'tts_cache'
+TTS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
 # Celery settings
 
 # Устанавливаем модуль настроек по умолчанию
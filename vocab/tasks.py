@@ -1,15 +1,150 @@
 #vocab/tasks.py:
-import requests
-from django.utils import timezone
+import asyncio
+import logging
+import os
+from datetime import timedelta
 
+import aiohttp
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
 from celery import shared_task
-from .models import Repetition
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from bot.task_sender import sender
+from .models import NotifierState, Repetition
+
+logger = logging.getLogger(__name__)
+
+NOTIFIER_NAME = 'review_notifications'
+
+
+def digest_text(due: int) -> str:
+    return (
+        f"🔁 Пора повторить слова: {due} нов. карт. ждут повторения.\n"
+        "Нажмите /review, чтобы начать."
+    )
+
+
+def collect_digests(since, now, retry_chat_ids=()):
+    """
+    Число карточек, ставших доступными к повторению в окне (since, now],
+    по каждому пользователю — одним GROUP BY по индексу next_review.
+    since=None — первый запуск: все карточки к повторению.
+    retry_chat_ids — чаты, не получившие прошлый дайджест: для них
+    считаются все карточки к повторению.
+    """
+    reps = Repetition.objects.filter(next_review__lte=now, owner__isnull=False)
+    window = reps.filter(next_review__gt=since) if since is not None else reps
+    digests = {
+        row['owner__telegram_id']: row
+        for row in window.values('owner__telegram_id').annotate(due=Count('id')).order_by()
+    }
+    if retry_chat_ids:
+        retried = (
+            reps.filter(owner__telegram_id__in=list(retry_chat_ids))
+            .values('owner__telegram_id').annotate(due=Count('id')).order_by()
+        )
+        digests.update({row['owner__telegram_id']: row for row in retried})
+    return list(digests.values())
+
+
+def claim_window(now):
+    """
+    Занимает окно рассылки до now: возвращает (since, retry_chat_ids) или
+    None, если окно пустое или его уже рассылает другой воркер.
+    Отметка last_run_at не сдвигается до complete_window — если рассылка
+    упала или воркер убит, после истечения аренды окно будет разослано снова.
+    """
+    lease = getattr(settings, 'NOTIFY_LEASE_SECONDS', 900)
+    with transaction.atomic():
+        state, _ = NotifierState.objects.select_for_update().get_or_create(name=NOTIFIER_NAME)
+        if state.lease_until is not None and state.lease_until > now:
+            return None
+        since = state.last_run_at
+        if since is not None and since >= now:
+            return None
+        state.lease_until = now + timedelta(seconds=lease)
+        state.save(update_fields=['lease_until'])
+    return since, list(state.retry_chat_ids)
+
+
+def complete_window(now, failed_chat_ids):
+    """Окно разослано: сдвигает отметку на now и запоминает чаты для повтора."""
+    with transaction.atomic():
+        state = NotifierState.objects.select_for_update().get(name=NOTIFIER_NAME)
+        state.last_run_at = now
+        state.lease_until = None
+        state.retry_chat_ids = sorted(set(failed_chat_ids))
+        state.save(update_fields=['last_run_at', 'lease_until', 'retry_chat_ids'])
+
+
+def release_window():
+    """Рассылка не удалась целиком: снимаем аренду, окно разошлёт следующий запуск."""
+    NotifierState.objects.filter(name=NOTIFIER_NAME).update(lease_until=None)
+
+
+async def send_digests(bot, digests, concurrency: int) -> tuple[int, list]:
+    """
+    Рассылает по одному сообщению на пользователя через Bot воркера Celery
+    (bot.task_sender: планировщик отправки с долей общего лимита Telegram,
+    retry_after, общий пул соединений); одновременно в работе не больше
+    concurrency сообщений. Возвращает (число отправленных, чаты для повтора).
+    Бот заблокирован или чат не найден — не повторяем.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(digest) -> str:
+        async with semaphore:
+            chat_id = digest['owner__telegram_id']
+            try:
+                await bot.send_message(chat_id=chat_id, text=digest_text(digest['due']))
+                return 'sent'
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.warning("Notification to %s dropped: %s", chat_id, e)
+                return 'dropped'
+            except (TelegramAPIError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Notification to %s failed, will retry: %s", chat_id, e)
+                return 'failed'
+
+    results = await asyncio.gather(*(send(digest) for digest in digests))
+    logger.info("Send scheduler: %s", sender.scheduler.stats())
+    failed = [d['owner__telegram_id'] for d, result in zip(digests, results) if result == 'failed']
+    return results.count('sent'), failed
 
 
 @shared_task
 def send_review_notifications():
     now = timezone.now()
-    reps = Repetition.objects.filter(next_review__lte=now)
-    for rep in reps:
-        tg_id = rep.card.owner.telegram_id
-        requests.post('http://localhost:8000/bot/send_notification/', json={'telegram_id': tg_id, 'card_id': rep.card.id})
+    if not os.getenv('BOT_TOKEN'):
+        logger.error("BOT_TOKEN не задан — уведомления не отправлены")
+        return 0
+    # Только карточки, ставшие доступными после прошлого запуска:
+    # стоимость O(новых), повторных уведомлений по старым карточкам нет
+    claimed = claim_window(now)
+    if claimed is None:
+        return 0
+    since, retry_chat_ids = claimed
+    try:
+        digests = collect_digests(since, now, retry_chat_ids)
+        sent, failed = 0, []
+        if digests:
+            concurrency = getattr(settings, 'NOTIFY_CONCURRENCY', 20)
+            sent, failed = sender.run(lambda bot: send_digests(bot, digests, concurrency))
+    except Exception:
+        release_window()
+        raise
+    complete_window(now, failed)
+    logger.info("Review digests sent: %s of %s, to retry: %s", sent, len(digests), len(failed))
+    return sent
+
+
+@shared_task
+def collect_image_garbage():
+    """Удаляет файлы картинок без ImageAsset (периодически, через django_celery_beat)."""
+    from vocab.image_store import collect_garbage
+
+    removed = collect_garbage()
+    logger.info("Image garbage collected: %s files", removed)
+    return removed
@@ -0,0 +1,55 @@
+# vocab/templatetags/image_tags.py
+"""
+Производные картинок в шаблонах (фильтры принимают Word или Card):
+
+    {% load image_tags %}
+    <img src="{{ word|image_variant:'thumb' }}"
+         srcset="{{ word|image_srcset }}" sizes="80px" loading="lazy">
+
+Ссылки даются только на построенные производные — их список берётся из
+word.image_asset.variants, поэтому queryset страницы должен делать
+select_related('image_asset') (иначе — запрос на каждую строку). Если
+нужной производной нет или картинка не из общего хранилища — отдаётся
+оригинал, а srcset собирается из того, что есть (пустой, если ничего нет).
+"""
+from django import template
+from django.core.files.storage import default_storage
+
+from vocab.image_store import SRCSET_VARIANTS, VARIANTS, variant_name
+
+register = template.Library()
+
+
+def _name(obj) -> str:
+    image = getattr(obj, 'image', None)
+    return getattr(image, 'name', None) or ''
+
+
+def _variants(obj, name: str) -> frozenset:
+    asset = obj.image_asset if getattr(obj, 'image_asset_id', None) else None
+    # Картинку могли заменить загрузкой — тогда запись к ней не относится
+    if asset is None or asset.file != name:
+        return frozenset()
+    return frozenset(v for v in asset.variants or () if v in VARIANTS)
+
+
+@register.filter
+def image_variant(obj, variant):
+    name = _name(obj)
+    if not name:
+        return ''
+    if variant in _variants(obj, name):
+        return default_storage.url(variant_name(name, variant))
+    return default_storage.url(name)
+
+
+@register.filter
+def image_srcset(obj):
+    name = _name(obj)
+    if not name:
+        return ''
+    built = _variants(obj, name)
+    return ', '.join(
+        f"{default_storage.url(variant_name(name, variant))} {VARIANTS[variant][0]}w"
+        for variant in SRCSET_VARIANTS if variant in built
+    )
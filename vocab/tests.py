@@ -0,0 +1,240 @@
+# vocab/tests.py
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from vocab import translation
+from vocab.models import CachedTranslation, Card, ImageAsset, Repetition, TelegramUser
+from vocab.scheduling import WORD_PARAMS, SM2Params, apply_grades, sm2_next_state
+from words.models import Word
+
+
+def scalar_repetition_step(interval, easiness, repetitions, quality, params: SM2Params):
+    """Прежний Repetition.schedule_review (по одной карточке)."""
+    if quality < 3:
+        interval = params.first_interval
+        repetitions = 0
+    else:
+        if repetitions == 0:
+            interval = params.first_interval
+        elif repetitions == 1:
+            interval = params.second_interval
+        else:
+            interval = int(interval * easiness * params.interval_multiplier)
+        interval = min(interval, params.max_interval)
+        repetitions += 1
+    easiness = max(params.min_easiness, easiness + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    return interval, easiness, repetitions
+
+
+def scalar_word_step(interval, ease_factor, repetitions, grade):
+    """Прежний words.intervals.sm2_algorithm."""
+    if grade < 3:
+        repetitions = 0
+        interval = 1
+    else:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+        repetitions += 1
+    ease_factor = max(1.3, ease_factor + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return interval, ease_factor, repetitions
+
+
+class SM2ParityTests(SimpleTestCase):
+    """Векторный шаг совпадает с прежними скалярными реализациями."""
+
+    def run_sequences(self, params, rounding, reference, cards=200, steps=15):
+        rng = random.Random(42)
+        # Карточки задаются столбцами, как в schedule_repetitions
+        interval = [1] * cards
+        easiness = [2.5] * cards
+        repetitions = [0] * cards
+        expected = list(zip(interval, easiness, repetitions))
+        for _ in range(steps):
+            qualities = [rng.randint(0, 5) for _ in range(cards)]
+            new_interval, new_easiness, new_repetitions, passed = sm2_next_state(
+                interval, easiness, repetitions, qualities,
+                first_interval=params.first_interval,
+                second_interval=params.second_interval,
+                interval_multiplier=params.interval_multiplier,
+                max_interval=params.max_interval,
+                min_easiness=params.min_easiness,
+                rounding=rounding,
+            )
+            expected = [reference(*state, q) for state, q in zip(expected, qualities)]
+            for i, (exp_interval, exp_easiness, exp_repetitions) in enumerate(expected):
+                self.assertEqual(int(new_interval[i]), exp_interval)
+                self.assertAlmostEqual(float(new_easiness[i]), exp_easiness, places=9)
+                self.assertEqual(int(new_repetitions[i]), exp_repetitions)
+                self.assertEqual(bool(passed[i]), qualities[i] >= 3)
+            interval = [int(v) for v in new_interval]
+            easiness = [float(v) for v in new_easiness]
+            repetitions = [int(v) for v in new_repetitions]
+
+    def test_repetition_default_settings(self):
+        params = SM2Params()
+        self.run_sequences(params, 'trunc', lambda i, e, r, q: scalar_repetition_step(i, e, r, q, params))
+
+    def test_repetition_custom_settings(self):
+        params = SM2Params(first_interval=2, second_interval=4, interval_multiplier=1.3,
+                           max_interval=60, min_easiness=1.5)
+        self.run_sequences(params, 'trunc', lambda i, e, r, q: scalar_repetition_step(i, e, r, q, params))
+
+    def test_word_classic_sm2(self):
+        self.run_sequences(WORD_PARAMS, 'round', scalar_word_step)
+
+    def test_per_card_settings_arrays(self):
+        slow = SM2Params(first_interval=3, max_interval=10)
+        fast = SM2Params(interval_multiplier=2.0)
+        interval, easiness, repetitions, _ = sm2_next_state(
+            [10, 10], [2.5, 2.5], [3, 3], [4, 4],
+            first_interval=[slow.first_interval, fast.first_interval],
+            second_interval=[slow.second_interval, fast.second_interval],
+            interval_multiplier=[slow.interval_multiplier, fast.interval_multiplier],
+            max_interval=[slow.max_interval, fast.max_interval],
+            min_easiness=[slow.min_easiness, fast.min_easiness],
+        )
+        self.assertEqual(list(interval), [10, 50])
+        self.assertEqual(list(repetitions), [4, 4])
+
+
+class ApplyGradesTests(TestCase):
+    def setUp(self):
+        self.user = TelegramUser.objects.create(telegram_id='1001', username='tester')
+        self.card = Card.objects.create(owner=self.user, word='cat', translation='кошка')
+        self.now = timezone.now()
+        # Карточку последний раз меняли час назад
+        Repetition.objects.filter(card=self.card).update(updated=self.now - timedelta(hours=1))
+        self.settings = {self.user.id: SM2Params()}
+
+    def repetitions(self):
+        return {self.card.id: Repetition.objects.get(card=self.card)}
+
+    def test_grades_applied_in_answer_order(self):
+        early, late = self.now - timedelta(minutes=20), self.now - timedelta(minutes=10)
+        grades = [
+            {'card_id': self.card.id, 'quality': 1, 'answered_at': late},
+            {'card_id': self.card.id, 'quality': 5, 'answered_at': early},
+        ]
+        touched = apply_grades(self.repetitions(), grades, now=self.now, settings_by_owner=self.settings)
+
+        self.assertEqual(len(touched), 1)
+        repetition = Repetition.objects.get(card=self.card)
+        # Сначала «5», потом «1»: итог — провал с последним временем ответа
+        self.assertFalse(repetition.last_result)
+        self.assertEqual(repetition.repetitions, 0)
+        self.assertEqual(repetition.review_count, 2)
+        self.assertEqual(repetition.updated, late)
+        self.assertEqual(repetition.next_review, late + timedelta(days=1))
+
+    def test_stale_grade_skipped(self):
+        before = Repetition.objects.get(card=self.card)
+        grades = [{'card_id': self.card.id, 'quality': 5, 'answered_at': self.now - timedelta(hours=2)}]
+        touched = apply_grades(self.repetitions(), grades, now=self.now, settings_by_owner=self.settings)
+
+        self.assertEqual(touched, [])
+        repetition = Repetition.objects.get(card=self.card)
+        self.assertEqual(repetition.review_count, before.review_count)
+        self.assertEqual(repetition.next_review, before.next_review)
+
+    def test_only_fresh_grades_of_batch_applied(self):
+        grades = [
+            {'card_id': self.card.id, 'quality': 5, 'answered_at': self.now - timedelta(hours=2)},
+            {'card_id': self.card.id, 'quality': 4, 'answered_at': self.now - timedelta(minutes=5)},
+        ]
+        apply_grades(self.repetitions(), grades, now=self.now, settings_by_owner=self.settings)
+
+        repetition = Repetition.objects.get(card=self.card)
+        self.assertEqual(repetition.review_count, 1)
+        self.assertEqual(repetition.repetitions, 1)
+
+    def test_answer_time_from_future_clamped_to_now(self):
+        grades = [{'card_id': self.card.id, 'quality': 4, 'answered_at': self.now + timedelta(days=3)}]
+        apply_grades(self.repetitions(), grades, now=self.now, settings_by_owner=self.settings)
+
+        repetition = Repetition.objects.get(card=self.card)
+        self.assertEqual(repetition.updated, self.now)
+        self.assertEqual(repetition.next_review, self.now + timedelta(days=1))
+
+
+class FakeTranslateProvider:
+    """Вместо Google: переводит построчно в «t:<строка>» и запоминает запросы."""
+
+    def __init__(self):
+        self.requests = []
+
+    def call(self, fn, text):
+        self.requests.append(text)
+        return '\n'.join(f"t:{line}" for line in text.split('\n'))
+
+
+class TranslateManyTests(TestCase):
+    def setUp(self):
+        translation.translation_memory.clear()
+        self.provider = FakeTranslateProvider()
+        patcher = mock.patch.object(translation, 'translate_provider', self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_originals_sent_upstream_once_per_key(self):
+        result = translation.translate_many(['Hello  World', ' hello world', 'Paris', ''], source='en', target='ru')
+
+        self.assertEqual(self.provider.requests, ['Hello World\nParis'])
+        self.assertEqual(result, ['t:Hello World', 't:Hello World', 't:Paris', ''])
+
+    def test_cached_under_normalized_key(self):
+        translation.translate_many(['New York'], source='en', target='ru')
+
+        self.assertTrue(CachedTranslation.objects.filter(source_lang='en', target_lang='ru', text='new york').exists())
+        self.assertEqual(translation.translate_many(['NEW  york'], source='en', target='ru'), ['t:New York'])
+        translation.translation_memory.clear()
+        self.assertEqual(translation.translate_many(['new york'], source='en', target='ru'), ['t:New York'])
+        self.assertEqual(len(self.provider.requests), 1)
+
+    def test_only_missing_keys_sent(self):
+        translation.translate_many(['Cat'], source='en', target='ru')
+        result = translation.translate_many(['cat', 'Dog'], source='en', target='ru')
+
+        self.assertEqual(self.provider.requests, ['Cat', 'Dog'])
+        self.assertEqual(result, ['t:Cat', 't:Dog'])
+
+
+class ImageTagsTests(TestCase):
+    template = Template(
+        "{% load image_tags %}{% for word in words %}"
+        "{{ word|image_variant:'thumb' }}|{{ word|image_srcset }}\n{% endfor %}"
+    )
+
+    def setUp(self):
+        user = TelegramUser.objects.create(telegram_id='3001', username='pictures')
+        asset = ImageAsset.objects.create(prompt_key='k', prompt='cat', content_hash='ab' * 32,
+                                          file='images/ab/ab/cat.jpg', variants=['thumb', 'medium'])
+        # bulk_create — без сигналов, чтобы не ставить задачу картинки
+        Word.objects.bulk_create([
+            Word(user=user, text='cat', translation='кошка', image=asset.file, image_asset=asset),
+            Word(user=user, text='dog', translation='собака', image='words/dog.jpg'),
+            Word(user=user, text='fish', translation='рыба', image='images/ab/ab/old.jpg', image_asset=asset),
+            Word(user=user, text='owl', translation='сова'),
+        ])
+
+    def test_variants_read_from_selected_asset(self):
+        words = list(Word.objects.select_related('image_asset').order_by('id'))
+        with self.assertNumQueries(0):
+            lines = self.template.render(Context({'words': words})).splitlines()
+
+        self.assertEqual(lines, [
+            '/media/images/ab/ab/cat.thumb.webp|'
+            '/media/images/ab/ab/cat.thumb.webp 160w, /media/images/ab/ab/cat.medium.webp 640w',
+            '/media/words/dog.jpg|',
+            # Файл слова не совпадает с записью — её производные не подходят
+            '/media/images/ab/ab/old.jpg|',
+            '|',
+        ])
@@ -0,0 +1,208 @@
+# vocab/translation.py
+"""
+Двухуровневый кэш переводов перед GoogleTranslator.
+
+1) процессный LRU (vocab.cache.TTLCache);
+2) таблица CachedTranslation в БД, общая для веба и бота.
+Записи старше TRANSLATION_CACHE_TTL считаются устаревшими и
+переводятся заново. Тексты и переводы, не влезающие в поля
+CachedTranslation, в БД не пишутся (обрезанный ключ не найдётся и может
+совпасть с другим текстом) — они живут только в процессном кэше.
+Запросы к Google идут через translate_provider (bot/resilience.py): при
+деградации сразу ProviderUnavailable.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from deep_translator import GoogleTranslator
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from bot.resilience import translate_provider
+from vocab.cache import TTLCache
+from vocab.models import CachedTranslation
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_TTL = timedelta(days=getattr(settings, 'TRANSLATION_CACHE_TTL_DAYS', 30))
+
+translation_memory = TTLCache(
+    maxsize=getattr(settings, 'TRANSLATION_CACHE_SIZE', 5000),
+    ttl=getattr(settings, 'TRANSLATION_MEMORY_TTL', 3600),
+)
+# Счётчики второго уровня и обращений к Google (первый уровень считает TTLCache)
+counters = {'db_hits': 0, 'db_misses': 0, 'upstream_errors': 0}
+_counters_lock = threading.Lock()
+
+MAX_TEXT_LENGTH = CachedTranslation._meta.get_field('text').max_length
+MAX_TRANSLATION_LENGTH = CachedTranslation._meta.get_field('translation').max_length
+
+
+def _count(name: str, n: int = 1):
+    # translate вызывается из потоков веба и бота
+    with _counters_lock:
+        counters[name] += n
+
+
+def normalize(text: str) -> str:
+    """Ключ кэша: без лишних пробелов и без учёта регистра."""
+    return ' '.join(text.split()).casefold()
+
+
+def translate(text: str, source: str = 'auto', target: str = 'ru') -> str:
+    """
+    Перевод с кэшированием. Ошибки GoogleTranslator пробрасываются наружу,
+    пустой результат не кэшируется.
+    """
+    key_text = normalize(text)
+    if not key_text:
+        return ''
+    key = (source, target, key_text)
+
+    cached = translation_memory.get(key)
+    if cached is not None:
+        return cached
+
+    cached = lookup_db(source, target, [key_text]).get(key_text)
+    if cached is not None:
+        translation_memory.set(key, cached)
+        return cached
+
+    try:
+        # Breaker, адаптивный таймаут и hedged-повтор — bot/resilience.py
+        translated = translate_provider.call(GoogleTranslator(source=source, target=target).translate, text.strip())
+    except Exception:
+        _count('upstream_errors')
+        raise
+    translated = str(translated).strip() if translated else ''
+    if translated:
+        store(source, target, {key_text: translated})
+    return translated
+
+
+def translate_many(texts, source: str = 'auto', target: str = 'ru') -> list:
+    """
+    Пакетный перевод для одной языковой пары. Повторы схлопываются,
+    найденное берётся из кэша, остальное уходит в Google одним запросом
+    (на каждые UPSTREAM_BATCH_CHARS символов). Результат — в порядке texts.
+    В Google уходит первый встретившийся исходный текст для ключа (регистр
+    влияет на перевод), в кэш перевод ложится под нормализованным ключом.
+    """
+    keys = [normalize(text) for text in texts]
+    originals = {}
+    for key, text in zip(keys, texts):
+        # Пробелы схлопываются: перевод склеивается построчно
+        originals.setdefault(key, ' '.join(text.split()))
+    result = {}
+    missing = []
+    for key in originals:
+        if not key:
+            result[key] = ''
+            continue
+        cached = translation_memory.get((source, target, key))
+        if cached is None:
+            missing.append(key)
+        else:
+            result[key] = cached
+
+    if missing:
+        from_db = lookup_db(source, target, missing)
+        for key, translation in from_db.items():
+            translation_memory.set((source, target, key), translation)
+        result.update(from_db)
+        missing = [key for key in missing if key not in from_db]
+
+    if missing:
+        translated = _translate_upstream([originals[key] for key in missing], source, target)
+        translated = {key: translated[originals[key]] for key in missing}
+        store(source, target, {key: value for key, value in translated.items() if value})
+        result.update(translated)
+
+    return [result[key] for key in keys]
+
+
+UPSTREAM_BATCH_CHARS = 4500  # лимит Google — 5000 символов на запрос
+
+
+def _translate_upstream(texts: list, source: str, target: str) -> dict:
+    """
+    Переводит тексты, склеивая их построчно в один запрос. Если Google
+    вернул другое число строк — переводим этот кусок по одному.
+    """
+    translator = GoogleTranslator(source=source, target=target)
+    chunks, chunk, size = [], [], 0
+    for text in texts:
+        if chunk and size + len(text) + 1 > UPSTREAM_BATCH_CHARS:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(text)
+        size += len(text) + 1
+    if chunk:
+        chunks.append(chunk)
+
+    result = {}
+    for chunk in chunks:
+        try:
+            joined = translate_provider.call(translator.translate, '\n'.join(chunk))
+            lines = str(joined).split('\n') if joined else []
+            if len(lines) != len(chunk):
+                lines = [translate_provider.call(translator.translate, text) for text in chunk]
+        except Exception:
+            _count('upstream_errors')
+            raise
+        result.update({text: str(line).strip() if line else '' for text, line in zip(chunk, lines)})
+    return result
+
+
+def lookup_db(source: str, target: str, texts) -> dict:
+    """Свежие переводы из БД для набора нормализованных текстов (длинные в БД не хранятся)."""
+    texts = set(texts)
+    found = {}
+    fits = [text for text in texts if len(text) <= MAX_TEXT_LENGTH]
+    if fits:
+        rows = CachedTranslation.objects.filter(
+            source_lang=source,
+            target_lang=target,
+            text__in=fits,
+            created__gte=timezone.now() - TRANSLATION_TTL,
+        ).values_list('id', 'text', 'translation')
+        ids = []
+        for row_id, text, translation in rows:
+            found[text] = translation
+            ids.append(row_id)
+        if ids:
+            CachedTranslation.objects.filter(id__in=ids).update(hits=F('hits') + 1)
+    _count('db_hits', len(found))
+    _count('db_misses', len(texts) - len(found))
+    return found
+
+
+def store(source: str, target: str, translations: dict):
+    """
+    Сохраняет переводы {нормализованный текст: перевод} в процессный кэш и,
+    если они влезают в поля CachedTranslation, в БД.
+    """
+    now = timezone.now()
+    for text, translation in translations.items():
+        translation_memory.set((source, target, text), translation)
+    rows = [
+        CachedTranslation(source_lang=source, target_lang=target, text=text,
+                          translation=translation, created=now)
+        for text, translation in translations.items()
+        if len(text) <= MAX_TEXT_LENGTH and len(translation) <= MAX_TRANSLATION_LENGTH
+    ]
+    if not rows:
+        return
+    CachedTranslation.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['source_lang', 'target_lang', 'text'],
+        update_fields=['translation', 'created'],
+    )
+
+
+def translation_stats() -> dict:
+    with _counters_lock:
+        return {'memory': translation_memory.stats(), **counters}
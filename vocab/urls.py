@@ -14,6 +14,7 @@ urlpatterns = [
     path('start-test', views.test_view, name='start_test'),
     path('test/', views.test_view, name='test'),
     path('register/', views.register_user, name='register'),
+    path('api/review/batch/', views.review_batch_view, name='review-batch'),
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='words/')),  # Главная страница
     path('progress/', views.progress_view, name='progress'),
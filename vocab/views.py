@@ -3,6 +3,7 @@ import logging
 import re
 from random import choice
 
+from django.db import transaction
 from django.db.models import Count
 from django.http import HttpResponseRedirect, HttpRequest
 from django.urls import reverse
@@ -13,6 +14,8 @@ from rest_framework.response import Response
 
 from words.models import Word
 from .models import TelegramUser, Card, Repetition, UserSettings
+from .scheduling import apply_grades
+from .serializers import GradeSerializer, RepetitionSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -78,8 +81,8 @@ def review_view(request: HttpRequest) -> HttpResponse:
 
     due_repetitions = (
         Repetition.objects
-        .filter(card__owner=tg_user, next_review__lte=timezone.now())
-        .select_related('card')
+        .filter(owner=tg_user, next_review__lte=timezone.now())
+        .select_related('card__image_asset')
         .order_by('next_review')
     )
 
@@ -133,7 +136,7 @@ def progress_view(request: HttpRequest) -> HttpResponse:
     }
 
     due_count = Repetition.objects.filter(
-        card__owner=tg_user,
+        owner=tg_user,
         next_review__lte=timezone.now()
     ).count()
 
@@ -181,7 +184,7 @@ def test_view(request: HttpRequest) -> HttpResponse:
     - GET: показывает случайное слово и его картинку (если есть).
     - POST: проверяет перевод пользователя, показывает результат и новое слово.
     """
-    words = Word.objects.all()
+    words = Word.objects.select_related('image_asset')
     if not words.exists():
         return render(request, 'test_page.html', {
             'word': None,
@@ -245,3 +248,48 @@ def register_user(request):
     else:
         return Response({'status': 'exists'}, status=status.HTTP_200_OK)
 
+
+# === API ДЛЯ ПАКЕТНОЙ ОЦЕНКИ КАРТОЧЕК ===
+
+MAX_GRADES_PER_REQUEST = 1000
+
+
+@api_view(['POST'])
+def review_batch_view(request):
+    """
+    Пакетная отправка оценок (офлайн-повторение, мини-приложение, бот).
+    Тело запроса: [{"card_id": 1, "quality": 4, "answered_at": "..."}, ...].
+    Возвращает обновлённое расписание затронутых карточек. Оценки старше
+    последнего изменения карточки не применяются.
+    """
+    tg_user = get_tg_user(request)
+    if not tg_user:
+        return Response({'error': 'telegram session is required'}, status=status.HTTP_403_FORBIDDEN)
+
+    # Размер проверяем до валидации: её стоимость растёт с длиной пакета
+    if isinstance(request.data, list) and len(request.data) > MAX_GRADES_PER_REQUEST:
+        return Response(
+            {'error': f'too many grades (max {MAX_GRADES_PER_REQUEST})'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    serializer = GradeSerializer(data=request.data, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    grades = serializer.validated_data
+
+    card_ids = {grade['card_id'] for grade in grades}
+    with transaction.atomic():
+        # Проверка владельца и загрузка состояния — одним запросом
+        repetitions = {
+            rep.card_id: rep
+            for rep in Repetition.objects.select_for_update().filter(owner=tg_user, card_id__in=card_ids)
+        }
+        unknown = card_ids - repetitions.keys()
+        if unknown:
+            return Response(
+                {'error': 'cards not found', 'card_ids': sorted(unknown)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        updated = apply_grades(repetitions, grades)
+
+    return Response(RepetitionSerializer(updated, many=True).data, status=status.HTTP_200_OK)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    Word = apps.get_model('words', 'Word')
+    Word.objects.exclude(image='').exclude(image__isnull=True).update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('words', '0002_word_user_next_review_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='word',
+            name='image_status',
+            field=models.CharField(
+                choices=[
+                    ('none', 'Нет'),
+                    ('pending', 'Генерируется'),
+                    ('ready', 'Готова'),
+                    ('failed', 'Ошибка'),
+                ],
+                default='none',
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(mark_existing_images_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocab', '0008_imageasset_card_image_asset'),
+        ('words', '0003_word_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='word',
+            name='image_asset',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='words',
+                to='vocab.imageasset',
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('words', '0004_word_image_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='word',
+            name='image_requested',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,11 +1,10 @@
 #words/models.py:
 
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
-from bot.image_generator import fetch_image_for_word
 from vocab.models import TelegramUser
 
 
@@ -20,6 +19,13 @@ class Meta:
 
 
 class Word(models.Model):
+    IMAGE_STATUS_CHOICES = (
+        ('none', 'Нет'),
+        ('pending', 'Генерируется'),
+        ('ready', 'Готова'),
+        ('failed', 'Ошибка'),
+    )
+
     user = models.ForeignKey(
         'vocab.TelegramUser',
         on_delete=models.CASCADE,
@@ -34,9 +40,20 @@ class Word(models.Model):
     interval = models.IntegerField(default=1)
     repetitions = models.IntegerField(default=0)
     ease_factor = models.FloatField(default=2.5)
+    # Заполняется фоновой задачей words.tasks.attach_word_image
+    image = models.ImageField(upload_to=word_image_upload_path, null=True, blank=True)
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default='none')
+    # Когда картинку последний раз ставили в очередь (words.tasks.requeue_word_images)
+    image_requested = models.DateTimeField(null=True, blank=True)
+    image_asset = models.ForeignKey(
+        'vocab.ImageAsset', on_delete=models.SET_NULL, null=True, blank=True, related_name='words'
+    )
 
     class Meta:
         unique_together = ['user', 'text']  # ← Защита от дублей
+        indexes = [
+            models.Index(fields=['user', 'next_review'], name='word_user_next_review_idx'),
+        ]
 
     def __str__(self):
         return f"{self.text} ({self.user.username if self.user else 'No User'})"
@@ -53,20 +70,10 @@ class Word(models.Model):
         super().save(*args, **kwargs)
 
 
+@receiver(post_delete, sender=Word)
+def release_word_image(sender, instance: Word, **kwargs):
+    """Снимает ссылку удалённого слова с картинки в общем хранилище."""
+    if instance.image_asset_id:
+        from vocab.image_store import release_image
 
-@receiver(post_save, sender=Word)
-def add_image_to_word(sender, instance: Word, created: bool, **kwargs):
-    if not created:
-        return
-    if instance.image:
-        return
-
-    prompt = f"{instance.text} ({instance.translation})"
-    django_file = fetch_image_for_word(instance.text, instance.translation)
-    if django_file is None:
-        return
-
-    save = instance.image.save(django_file.name, django_file, save=True)
-
-
-
+        release_image(instance.image_asset_id)
@@ -0,0 +1,100 @@
+# words/services.py
+"""
+Единая точка добавления слов для веб-форм, бота и админки.
+
+Word, Card и Repetition создаются в одной транзакции фиксированным
+числом запросов; медленные побочные эффекты (картинка) уходят в Celery
+после коммита.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from vocab.models import Card
+from vocab.translation import translate
+from words.models import Word
+
+logger = logging.getLogger(__name__)
+
+
+def translate_text(text: str, source: str = 'auto', target: str = 'ru') -> str:
+    """Перевод через кэш переводов; пустая строка при ошибке."""
+    try:
+        return translate(text, source=source, target=target)
+    except Exception as e:
+        logger.warning("Translation error for %r: %s", text, e)
+        return ''
+
+
+def enqueue_word_image(word_id: int, notify_chat_id=None):
+    """
+    Ставит генерацию картинки в очередь Celery и помечает слово как
+    ожидающее картинку. Если брокер недоступен, слово остаётся в pending
+    и его заново ставит в очередь периодическая задача
+    words.tasks.requeue_word_images; с WORD_IMAGE_SYNC_FALLBACK = True
+    картинка сначала пробуется синхронно, здесь же (для разработки без Celery).
+    notify_chat_id — куда бот пришлёт картинку, когда она будет готова.
+    """
+    from words.tasks import attach_word_image
+
+    Word.objects.filter(pk=word_id, image_status__in=['none', 'failed']).update(
+        image_status='pending', image_requested=timezone.now(),
+    )
+    try:
+        attach_word_image.delay(word_id, notify_chat_id)
+        return
+    except Exception:
+        logger.exception("Celery недоступен, картинка для слова %s будет поставлена в очередь позже", word_id)
+    if getattr(settings, 'WORD_IMAGE_SYNC_FALLBACK', False):
+        try:
+            attach_word_image(word_id, notify_chat_id)
+        except Exception:
+            logger.exception("Синхронная генерация картинки для слова %s не удалась", word_id)
+
+
+def ensure_card(word: Word) -> Card:
+    """Карточка владельца для слова (Repetition создаёт сигнал Card)."""
+    card, _ = Card.objects.get_or_create(
+        owner=word.user,
+        word=word.text,
+        defaults={
+            'translation': word.translation,
+            'difficulty': 'beginner',
+        }
+    )
+    return card
+
+
+def ingest_word(user, text: str, translation: str = '', source_lang: str = 'en',
+                next_review=None, with_image: bool = True, notify_chat_id=None) -> tuple[Word, bool]:
+    """
+    Добавляет слово пользователю: Word + Card + Repetition в одной транзакции.
+    Возвращает (word, created); если слово у пользователя уже есть — (word, False).
+
+    with_image=False — картинку вызывающий код запросит сам (attach_word_image).
+    notify_chat_id — чат Telegram, куда прислать картинку после генерации.
+    """
+    text = text.strip()
+    translation = (translation or '').strip()
+    if not translation:
+        target = 'en' if source_lang == 'ru' else 'ru'
+        translation = translate_text(text, source='auto', target=target)
+
+    with transaction.atomic():
+        word, created = Word.objects.get_or_create(
+            user=user,
+            text=text,
+            defaults={
+                'translation': translation,
+                'source_lang': source_lang,
+                'next_review': next_review or timezone.now(),
+            }
+        )
+        if not created:
+            return word, False
+        ensure_card(word)
+        if with_image:
+            transaction.on_commit(lambda: enqueue_word_image(word.id, notify_chat_id))
+    return word, True
@@ -1,7 +1,95 @@
 #words/tasks.py:
-#
-# from celery import shared_task
-#
-# @shared_task
-# def my_background_task():
-#     print("Работаю в фоне!")
\ No newline at end of file
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from vocab.image_store import get_or_fetch_image, link_image, telegram_image_path
+from vocab.models import Card
+from words.models import Word
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def attach_word_image(word_id, notify_chat_id=None):
+    """
+    Берёт картинку для слова из общего хранилища (при промахе — из
+    Pollinations) и привязывает её к слову и карточке владельца.
+    Статус пишется в Word.image_status.
+    notify_chat_id — чат в Telegram, куда отправить готовую картинку.
+    Возвращает имя файла или None.
+    """
+    word = Word.objects.filter(pk=word_id).first()
+    if word is None:
+        return None
+    if word.image:
+        return word.image.name
+
+    # Общее хранилище: одно и то же слово у разных пользователей скачивается один раз
+    asset = get_or_fetch_image(word.text, word.translation)
+    linked = None
+    if asset is not None:
+        linked = link_image(asset, *_image_targets(word))
+        if linked is None:
+            # Запись удалили между поиском и привязкой — сохраняем картинку заново
+            asset = get_or_fetch_image(word.text, word.translation)
+            linked = link_image(asset, *_image_targets(word)) if asset else None
+    if linked is None:
+        Word.objects.filter(pk=word.pk).update(image_status='failed')
+        return None
+    Word.objects.filter(pk=word.pk).update(image_status='ready')
+
+    if notify_chat_id:
+        notify_image_ready(notify_chat_id, asset.file, word.text)
+    return asset.file
+
+
+@shared_task
+def requeue_word_images(batch_size=500):
+    """
+    Заново ставит в очередь картинки слов, застрявших в pending дольше
+    WORD_IMAGE_REQUEUE_AFTER секунд: брокер был недоступен при добавлении
+    слова (enqueue_word_image) или задача потерялась. Запускается
+    периодически, через django_celery_beat (например, раз в 10 минут).
+    Уведомление в чат при повторной постановке не отправляется.
+    Возвращает число поставленных слов.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'WORD_IMAGE_REQUEUE_AFTER', 600))
+    word_ids = list(
+        Word.objects.filter(Q(image_requested__lt=cutoff) | Q(image_requested__isnull=True), image_status='pending')
+        .order_by('image_requested').values_list('id', flat=True)[:batch_size]
+    )
+    # Отметка до постановки: следующий запуск не возьмёт их повторно раньше срока
+    Word.objects.filter(pk__in=word_ids, image_status='pending').update(image_requested=now)
+    for word_id in word_ids:
+        attach_word_image.delay(word_id)
+    if word_ids:
+        logger.info("Requeued images for %s words", len(word_ids))
+    return len(word_ids)
+
+
+def _image_targets(word):
+    """Слово и карточки владельца с тем же текстом, у которых ещё нет картинки."""
+    no_image = Q(image='') | Q(image__isnull=True)
+    return (
+        Word.objects.filter(no_image, pk=word.pk),
+        Card.objects.filter(no_image, owner_id=word.user_id, word=word.text),
+    )
+
+
+def notify_image_ready(chat_id, image_name, word_text):
+    """Отправляет пользователю готовую картинку (Bot воркера Celery, доля общего лимита)."""
+    from bot.media import send_media
+    from bot.task_sender import sender
+
+    path = telegram_image_path(image_name)
+    caption = f"🖼 Картинка для слова «{word_text}» готова"
+    try:
+        sender.run(lambda bot: send_media(bot, chat_id, 'photo', path, caption=caption))
+    except Exception as e:
+        logger.warning("Не удалось отправить картинку в чат %s: %s", chat_id, e)
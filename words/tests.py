@@ -1 +1,154 @@
-# Create your tests here.
+# words/tests.py
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bot.voice import tts_cache_key, tts_cache_path
+from vocab.models import TelegramUser
+from words import tasks
+from words.models import Word
+from words.services import enqueue_word_image
+from words.views import parse_byte_range, serve_tts_audio
+
+
+class ParseByteRangeTests(SimpleTestCase):
+    size = 100
+
+    def test_ranges(self):
+        cases = {
+            'bytes=0-': (0, 99),
+            'bytes=10-19': (10, 19),
+            'bytes=90-500': (90, 99),   # конец за пределами файла обрезается
+            'bytes=-10': (90, 99),
+            'bytes=-500': (0, 99),      # суффикс длиннее файла — весь файл
+            'Bytes = 5-5': (5, 5),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_byte_range(header, self.size), expected)
+
+    def test_unsupported_header_ignored(self):
+        for header in ('items=0-10', 'bytes=0-1,5-6', 'bytes=10', 'bytes=a-b', 'bytes=-x', 'bytes=1-x'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_byte_range(header, self.size))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=-0', 'bytes=100-', 'bytes=150-200', 'bytes=20-10'):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_byte_range(header, self.size)
+
+    def test_suffix_of_empty_file_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=-10', 0)
+
+
+class ServeTtsAudioTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(TTS_CACHE_DIR=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.factory = RequestFactory()
+
+    def cache_audio(self, content: bytes):
+        # Файл уже в кэше TTS — synthesize_text_to_mp3 его не пересоздаёт
+        path = tts_cache_path(tts_cache_key('cat', 'en'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.part')
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+
+    def get(self, **headers):
+        return serve_tts_audio(self.factory.get('/audio', **headers), 'cat', 'en')
+
+    def test_etag_is_content_hash(self):
+        self.cache_audio(b'mp3 one')
+        etag = self.get()['ETag']
+        self.assertEqual(etag, f'"{hashlib.sha256(b"mp3 one").hexdigest()}"')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_resynthesized_file_gets_new_etag(self):
+        self.cache_audio(b'mp3 one')
+        old = self.get()['ETag']
+        self.cache_audio(b'mp3 two!')
+
+        response = self.get(HTTP_IF_NONE_MATCH=old)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old)
+        # Диапазон по старому If-Range не отдаётся: байты уже другие
+        response = self.get(HTTP_RANGE='bytes=0-2', HTTP_IF_RANGE=old)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'mp3 two!')
+
+    def test_range_with_matching_if_range(self):
+        self.cache_audio(b'mp3 one')
+        etag = self.get()['ETag']
+        response = self.get(HTTP_RANGE='bytes=4-', HTTP_IF_RANGE=etag)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 4-6/7')
+        self.assertEqual(b''.join(response.streaming_content), b'one')
+
+
+class WordImageStatusTests(TestCase):
+    def setUp(self):
+        self.account = User.objects.create_user('owner')
+        owner = TelegramUser.objects.create(telegram_id='4001', username='owner', user=self.account)
+        other = TelegramUser.objects.create(telegram_id='4002', username='other')
+        self.word = Word.objects.create(user=owner, text='cat', translation='кошка', image_status='pending')
+        self.foreign = Word.objects.create(user=other, text='dog', translation='собака', image_status='ready')
+
+    def status(self, word):
+        return self.client.get(reverse('word-image-status', args=[word.pk]))
+
+    def test_own_word(self):
+        self.client.force_login(self.account)
+        response = self.status(self.word)
+        self.assertEqual(response.json(), {'status': 'pending', 'url': None})
+
+    def test_foreign_word_hidden(self):
+        self.client.force_login(self.account)
+        self.assertEqual(self.status(self.foreign).status_code, 404)
+
+    def test_account_without_telegram_user_sees_nothing(self):
+        self.client.force_login(User.objects.create_user('stranger'))
+        self.assertEqual(self.status(self.word).status_code, 404)
+        self.assertEqual(self.status(self.foreign).status_code, 404)
+
+
+class RequeueWordImagesTests(TestCase):
+    def setUp(self):
+        user = TelegramUser.objects.create(telegram_id='5001', username='offline')
+        self.word = Word.objects.create(user=user, text='cat', translation='кошка')
+
+    @override_settings(WORD_IMAGE_SYNC_FALLBACK=False)
+    def test_word_skipped_while_broker_down_is_requeued(self):
+        with mock.patch.object(tasks.attach_word_image, 'delay', side_effect=ConnectionError('broker down')):
+            enqueue_word_image(self.word.id)
+        self.word.refresh_from_db()
+        self.assertEqual(self.word.image_status, 'pending')
+        self.assertIsNotNone(self.word.image_requested)
+
+        delay = mock.Mock()
+        with mock.patch.object(tasks.attach_word_image, 'delay', delay):
+            # Ещё рано: задача могла быть в очереди
+            self.assertEqual(tasks.requeue_word_images(), 0)
+            Word.objects.filter(pk=self.word.pk).update(image_requested=timezone.now() - timedelta(hours=1))
+            self.assertEqual(tasks.requeue_word_images(), 1)
+            self.assertEqual(tasks.requeue_word_images(), 0)
+        delay.assert_called_once_with(self.word.id)
+
+    def test_ready_and_failed_words_not_requeued(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        Word.objects.filter(pk=self.word.pk).update(image_status='failed', image_requested=long_ago)
+        with mock.patch.object(tasks.attach_word_image, 'delay') as delay:
+            self.assertEqual(tasks.requeue_word_images(), 0)
+        delay.assert_not_called()
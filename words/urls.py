@@ -19,6 +19,7 @@ urlpatterns = [
     path('<int:pk>/audio/', views.generate_audio, {'text_type': 'word'}, name='word-audio'),
     path('<int:pk>/audio-translation/', views.generate_audio, {'text_type': 'translation'}, name='word-translation-audio'),
     path('speak/', views.speak_text, name='speak_text'),
+    path('<int:pk>/image-status/', views.word_image_status, name='word-image-status'),
 
     # Новые маршруты
     path('progress/', views.progress_view, name='progress'),
@@ -1,20 +1,23 @@
 # words/views.py
-import io
+import hashlib
 import json
 import logging
+import os
 import random
-from io import BytesIO
 
-from deep_translator import GoogleTranslator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import FileResponse
+from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
 from django.http import JsonResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 from django.urls import reverse_lazy
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (
     UpdateView,
@@ -22,16 +25,21 @@ from django.views.generic import (
 )
 from django.views.generic.edit import CreateView
 from django.views.generic.list import ListView
-from gtts import gTTS
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from bot.resilience import ProviderUnavailable
+from bot.voice import synthesize_text_to_mp3
+from vocab.cache import TTLCache
 from vocab.models import Repetition
 from vocab.models import TelegramUser, Card
 from vocab.models import UserSettings
+from vocab.templatetags.image_tags import image_variant
+from vocab.translation import translate, translate_many
 from vocab.utils import get_tg_user
 from words.models import Word
+from words.services import ensure_card, ingest_word
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +63,7 @@ def register_user(request):
 
 def test_view(request):
     # Получаем все слова
-    words = Word.objects.all()
+    words = Word.objects.select_related('image_asset')
     if not words.exists():
         return render(request, 'test_page.html', {'message': 'No words available. Please add words first.'})
 
@@ -137,11 +145,12 @@ class WordListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         tg_user = get_tg_user(self.request)
         if tg_user:
-            qs = Word.objects.filter(user=tg_user).order_by('-id')
+            # image_asset — для списка производных картинки в шаблоне (image_tags)
+            qs = Word.objects.filter(user=tg_user).select_related('image_asset').order_by('-id')
 
             return qs
         # Если нет пользователя — показываем все слова
-        return Word.objects.all().order_by('-id')
+        return Word.objects.select_related('image_asset').order_by('-id')
 
 
 class WordCreateView(LoginRequiredMixin, CreateView):
@@ -159,33 +168,18 @@ class WordCreateView(LoginRequiredMixin, CreateView):
             messages.error(self.request, 'Ошибка авторизации. Войдите через бота.')
             return redirect('word-list')
 
-        # ПРИВЯЗЫВАЕМ К ПОЛЬЗОВАТЕЛЮ ДО СОХРАНЕНИЯ
-        form.instance.user = tg_user
-        form.instance.source_lang = 'en'
-
-        # Автоперевод
-        if not form.instance.translation and form.instance.text:
-            try:
-                from deep_translator import GoogleTranslator
-                translated = GoogleTranslator(source='auto', target='ru').translate(form.instance.text)
-                if translated:
-                    form.instance.translation = str(translated)
-            except Exception as e:
-                print(f"Translation error: {e}")
-
-        response = super().form_valid(form)
-
-        # Создаём карточку
-        Card.objects.get_or_create(
-            owner=tg_user,
-            word=form.instance.text,
-            defaults={
-                'translation': form.instance.translation,
-                'difficulty': 'beginner',
-            }
+        # Word + Card + Repetition одной транзакцией, картинка — в фоне
+        word, created = ingest_word(
+            tg_user,
+            form.cleaned_data['text'],
+            form.cleaned_data.get('translation', ''),
+            source_lang='en',
         )
-
-        return response
+        if not created:
+            from django.contrib import messages
+            messages.warning(self.request, f'Слово "{word.text}" уже есть в вашем словаре.')
+        self.object = word
+        return HttpResponseRedirect(self.get_success_url())
 
 # --- Добавляем UpdateView ---
 class WordUpdateView(LoginRequiredMixin, UpdateView):
@@ -222,8 +216,7 @@ class WordUpdateView(LoginRequiredMixin, UpdateView):
         # 5. Автоперевод если не указан
         if not translation and text:
             try:
-                from deep_translator import GoogleTranslator
-                translated = GoogleTranslator(source='auto', target='ru').translate(text)
+                translated = translate(text, source='auto', target='ru')
                 if translated:
                     form.instance.translation = str(translated)
                     print(f"✅ Автоперевод для '{text}': {translated}")
@@ -233,15 +226,9 @@ class WordUpdateView(LoginRequiredMixin, UpdateView):
         # 6. Сохраняем слово в БД
         response = super().form_valid(form)
 
-        # 7. Создаём карточку ТОЛЬКО для владельца
+        # 7. Карточка владельца (создаётся, только если её ещё нет)
         try:
-            Card.objects.create(
-                owner=tg_user,
-                word=form.instance.text,
-                translation=form.instance.translation,
-                difficulty='beginner',
-            )
-            print(f"✅ Карточка создана для '{form.instance.text}'")
+            ensure_card(form.instance)
         except Exception as e:
             print(f"⚠️ Ошибка создания карточки: {e}")
 
@@ -257,7 +244,7 @@ def progress_view(request):
     total_cards = Card.objects.filter(owner=tg_user).count()
 
     # Средняя частота повторений
-    avg_repeats = Repetition.objects.filter(card__owner=tg_user).aggregate(Avg('repeats'))['repeats__avg']
+    avg_repeats = Repetition.objects.filter(owner=tg_user).aggregate(Avg('repeats'))['repeats__avg']
 
     # Статистика по уровням сложности
     levels_stats = Card.objects.filter(owner=tg_user).values('difficulty').annotate(count=Count('id'))
@@ -289,29 +276,21 @@ def translate_word(request):
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
+    # Пакетный режим: {"texts": ["hello", "мир", ...]}
+    if 'texts' in data:
+        return translate_batch(data.get('texts'))
+
     text = data.get('text', '').strip()
     if not text:
         return JsonResponse({'error': 'Text is required'}, status=400)
 
-    def has_cyrillic(t):
-        return any('а' <= c.lower() <= 'я' or c.lower() == 'ё' for c in t)
-
-    def has_latin(t):
-        return any('a' <= c.lower() <= 'z' for c in t)
-
-    is_cyrillic = has_cyrillic(text)
-    is_latin = has_latin(text)
-
-    if is_cyrillic and not is_latin:
-        src, dest = 'ru', 'en'
-    elif is_latin and not is_cyrillic:
-        src, dest = 'en', 'ru'
-    else:
-        src, dest = 'en', 'ru'
+    src, dest = detect_translation_pair(text)
 
     try:
-        # Используем GoogleTranslator вместо гигачата
-        translated = GoogleTranslator(source=src, target=dest).translate(text)
+        # GoogleTranslator через кэш переводов
+        translated = translate(text, source=src, target=dest)
+    except ProviderUnavailable:
+        return JsonResponse({'error': 'Translation service is temporarily unavailable'}, status=503)
     except Exception as e:
         logger.exception("Deep Translate failed")
         return JsonResponse({'error': f'Translation failed: {e}'}, status=500)
@@ -324,6 +303,178 @@ def translate_word(request):
     })
 
 
+MAX_BATCH_TEXTS = 500
+
+
+def detect_translation_pair(text):
+    """Кириллица -> (ru, en), иначе (en, ru)."""
+    is_cyrillic = any('а' <= c.lower() <= 'я' or c.lower() == 'ё' for c in text)
+    is_latin = any('a' <= c.lower() <= 'z' for c in text)
+
+    if is_cyrillic and not is_latin:
+        return 'ru', 'en'
+    return 'en', 'ru'
+
+
+def translate_batch(texts):
+    """
+    Перевод списка текстов: язык определяется для каждого, повторы
+    схлопываются, промахи кэша уходят одним запросом на языковую пару.
+    Результаты возвращаются в порядке входа.
+    """
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return JsonResponse({'error': 'texts must be a list of strings'}, status=400)
+    if len(texts) > MAX_BATCH_TEXTS:
+        return JsonResponse({'error': f'Too many texts (max {MAX_BATCH_TEXTS})'}, status=400)
+
+    texts = [t.strip() for t in texts]
+    pairs = [detect_translation_pair(t) for t in texts]
+
+    # Индексы входа по языковым парам
+    by_pair = {}
+    for i, (text, pair) in enumerate(zip(texts, pairs)):
+        if text:
+            by_pair.setdefault(pair, []).append(i)
+
+    translations = [''] * len(texts)
+    errors = {}
+    for (src, dest), indexes in by_pair.items():
+        try:
+            translated = translate_many([texts[i] for i in indexes], source=src, target=dest)
+        except Exception as e:
+            logger.exception("Deep Translate batch failed (%s -> %s)", src, dest)
+            for i in indexes:
+                errors[i] = f'Translation failed: {e}'
+            continue
+        for i, value in zip(indexes, translated):
+            translations[i] = value
+
+    results = []
+    for i, (text, (src, dest)) in enumerate(zip(texts, pairs)):
+        item = {'text': text, 'translation': translations[i], 'source_lang': src, 'dest_lang': dest}
+        if i in errors:
+            item['error'] = errors[i]
+        results.append(item)
+    return JsonResponse({'results': results})
+
+
+
+
+AUDIO_WORD_MAX_AGE = 24 * 3600
+AUDIO_TEXT_MAX_AGE = 365 * 24 * 3600
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+# (путь, inode, размер) -> ETag содержимого. Файл кэша TTS меняется только
+# заменой (os.replace при новом синтезе), то есть вместе с inode
+audio_etags = TTLCache(maxsize=10000, ttl=24 * 3600)
+
+
+def parse_byte_range(header, size):
+    """
+    Разбирает заголовок Range для одного диапазона байт.
+    Возвращает (start, end) включительно, None — если заголовок не
+    поддерживается (отдаём файл целиком), ValueError — если диапазон
+    неудовлетворим.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            length = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if not first:
+        # bytes=-N — последние N байт; bytes=-0 и пустой файл — неудовлетворимо
+        if length <= 0 or size <= 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(AUDIO_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def audio_etag(path) -> tuple[str, int]:
+    """
+    Сильный ETag файла — sha256 содержимого (Range-ответы обещают
+    побайтовое совпадение, а повторный синтез того же текста может дать
+    другие байты). Считается один раз на версию файла. Возвращает (ETag, размер).
+    """
+    stat = os.stat(path)
+    key = (str(path), stat.st_ino, stat.st_size)
+    etag = audio_etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(AUDIO_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+        audio_etags.set(key, etag)
+    return etag, stat.st_size
+
+
+def serve_tts_audio(request, text, lang, filename=None, max_age=AUDIO_WORD_MAX_AGE, immutable=False):
+    """
+    Отдаёт озвучку из кэша TTS потоком. ETag — хэш содержимого файла
+    (audio_etag); при попадании в кэш TTS ответ 304 не читает файл.
+    Поддерживает один диапазон Range/If-Range.
+    """
+    cache_control = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+    audio_path = synthesize_text_to_mp3(text, lang=lang)
+    etag, size = audio_etag(audio_path)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(audio_path, 'rb'), content_type='audio/mpeg')
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_file_range(audio_path, start, end - start + 1),
+            status=206,
+            content_type='audio/mpeg',
+        )
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Content-Disposition'] = f'inline; filename="{filename}"' if filename else 'inline'
+    return response
 
 
 def generate_audio(request, pk, text_type='word'):
@@ -351,14 +502,10 @@ def generate_audio(request, pk, text_type='word'):
     lang = detect_language(text)
 
     try:
-        tts = gTTS(text=text, lang=lang)
-        audio_io = BytesIO()
-        tts.write_to_fp(audio_io)
-        audio_io.seek(0)
-
-        response = HttpResponse(audio_io.read(), content_type='audio/mpeg')
-        response['Content-Disposition'] = f'inline; filename="{text_type}.mp3"'
-        return response
+        # Текст слова может измениться — кэшируем на сутки, дальше сверка по ETag
+        return serve_tts_audio(request, text, lang, f"{text_type}.mp3", max_age=AUDIO_WORD_MAX_AGE)
+    except ProviderUnavailable:
+        return HttpResponse("Озвучка временно недоступна", status=503, headers={'Retry-After': '30'})
     except Exception as e:
         logger.error(f"TTS error: {e}")
         return HttpResponse(f"Ошибка TTS: {e}", status=500)
@@ -381,20 +528,31 @@ def speak_text(request):
         lang = 'ru' if any('а' <= c.lower() <= 'я' or c.lower() == 'ё' for c in text) else 'en'
 
     try:
-        # Создаём аудио
-        tts = gTTS(text=text, lang=lang)
-        audio_io = io.BytesIO()
-        tts.write_to_fp(audio_io)
-        audio_io.seek(0)
-
-        # Отправляем как MP3
-        response = HttpResponse(audio_io, content_type='audio/mpeg')
-        response['Content-Disposition'] = 'inline'
-        return response
+        # URL однозначно задаёт текст и язык — ответ не меняется
+        return serve_tts_audio(request, text, lang, max_age=AUDIO_TEXT_MAX_AGE, immutable=True)
+    except ProviderUnavailable:
+        return HttpResponse(status=503, headers={'Retry-After': '30'})
     except Exception as e:
         return HttpResponse(status=500)
 
 
+@login_required
+def word_image_status(request, pk):
+    """Статус фоновой генерации картинки слова (для заглушки в списке слов)."""
+    tg_user = get_tg_user(request)
+    if not tg_user:
+        # Без привязки к Telegram своих слов нет — чужие не показываем
+        raise Http404
+    words = Word.objects.filter(user=tg_user).select_related('image_asset').only(
+        'image', 'image_status', 'image_asset__file', 'image_asset__variants',
+    )
+    word = get_object_or_404(words, pk=pk)
+    return JsonResponse({
+        'status': word.image_status,
+        'url': image_variant(word, 'thumb') or None,
+    })
+
+
 @login_required  # ← Обязательно требуем авторизацию
 def settings_view(request):
     # ✅ Берём РЕАЛЬНОГО пользователя из запроса